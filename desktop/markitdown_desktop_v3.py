@@ -29,8 +29,11 @@ Developer: Rudolf Wagner
 Kindergarten Project: https://www.paypal.com/donate/?hosted_button_id=PAGH54TWEXP54
 """
 
-import tkinter as tk
-from tkinter import ttk, filedialog, messagebox, scrolledtext
+try:
+    import tkinter as tk
+    from tkinter import ttk, filedialog, messagebox, scrolledtext
+except ImportError:  # Servers without Tk can still use --headless
+    tk = None
 import os
 import sys
 import subprocess
@@ -41,86 +44,4099 @@ import platform
 import zipfile
 from datetime import datetime
 import json
+import argparse
+import glob
+import fnmatch
+import re
+import importlib.util
+import time
+import hashlib
+import mmap
+import sqlite3
+import zlib
+import io
+import shutil
+import itertools
+import heapq
+import bisect
+import cProfile
+import math
+import random
+import queue
+import contextlib
+from collections import OrderedDict, Counter, deque, namedtuple
+import multiprocessing
+import multiprocessing.connection
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
+
+try:
+    import psutil  # Optional: measures worker memory where /proc is not available
+except ImportError:
+    psutil = None
+
+_PROCESS_START = time.perf_counter()  # For the time-to-interactive message
 
 # App Constants
 APP_NAME = "MarkItDown Desktop"
 APP_VERSION = "3.0"
 
-def check_and_install_dependencies():
-    """Check and install dependencies before GUI start"""
-    print("Checking MarkItDown installation...")
-    
+# Conversion engine
+ENGINE_MODES = ('auto', 'process', 'thread', 'serial')
+DEFAULT_WORKERS = os.cpu_count() or 1
+# Timeout: killed by the watchdog (time/memory limit); Unsupported: rejected by the pre-flight check
+FAILED_STATUSES = ("Error", "Timeout", "Unsupported")
+DONE_STATUSES = ("Completed", "Unchanged") + FAILED_STATUSES
+WORKER_MAX_TASKS = 500  # Worker processes are replaced after this many files (0 = never)
+WORKER_READY = "ready"  # Sent by a worker process once it is warm; task time limits start then
+WORKER_START_TIMEOUT = 300  # Seconds a worker process may take to start and warm up
+
+# Pre-flight check: inputs are classified from their first bytes before conversion
+SNIFF_BYTES = 8192
+PREFLIGHT_THREADS = 8
+PDF_FONT_SAMPLE_PAGES = 8  # Pages checked for a text layer; enough to tell a scan from a text PDF
+
+# Duplicate detection: files of equal size are hashed (in the background, on
+# the pre-flight threads) and identical contents are converted once. Outcomes are remembered
+# for files that arrive later in the same run, up to this many files.
+DEDUPE_MAX_FILES = 100000
+
+# Micro-batching: files up to BATCH_FILE_BYTES are converted together, up to
+# DEFAULT_BATCH_BYTES / BATCH_MAX_FILES per worker task
+BATCH_FILE_BYTES = 16 * 1024
+DEFAULT_BATCH_BYTES = 256 * 1024
+BATCH_MAX_FILES = 64
+
+# Parser stacks imported when a worker starts, for the formats in the queue.
+# MarkItDown versions that import converters lazily would otherwise pay this on the first file.
+WARMUP_MODULES = {
+    '.pdf': ('pdfminer.high_level', 'pdfplumber'),
+    '.docx': ('mammoth',),
+    '.xlsx': ('pandas', 'openpyxl'),
+    '.xls': ('pandas', 'xlrd'),
+    '.pptx': ('pptx',),
+    '.html': ('bs4', 'markdownify'),
+    '.htm': ('bs4', 'markdownify'),
+    '.epub': ('bs4', 'markdownify'),
+}
+
+# GUI refresh interval while processing (worker progress is batched per tick)
+UI_REFRESH_MS = 200
+
+# Conversion cache
+DEFAULT_CACHE_BYTES = 1024 * 1024 * 1024  # 1 GB
+CACHE_FILENAME = "conversion_cache.sqlite3"
+COST_MODEL_FILENAME = "conversion_costs.json"  # Learned per-format conversion times
+
+# Resumable jobs: <job dir>/journal.jsonl + <job dir>/spool/, locked by <job dir>/job.lock
+# while in use. GUI windows use <app data>/jobs/gui, gui-2, gui-3, ...
+JOBS_DIRNAME = "jobs"
+JOURNAL_FILENAME = "journal.jsonl"
+JOB_LOCK_FILENAME = "job.lock"
+JOURNAL_SYNC_SECONDS = 1.0  # fsync interval of the journal (every line is flushed)
+
+# Order in which pending files are handed to workers (by estimated cost)
+SCHEDULE_ORDERS = ('largest', 'smallest', 'queue')
+
+# Per-file timing spans (FileItem.timings): engine queue wait, worker stages
+# (read = hashing/cache lookup, convert, post_process = cache store, write =
+# spool file), dispatch = pool/IPC overhead, export = writing into the export
+TIMING_STAGES = ("queue_wait", "read", "convert", "post_process", "write", "dispatch", "export")
+METRICS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+METRICS_WRITE_SECONDS = 10  # Rewrite interval of --metrics-file
+
+# Optional profiling of slow conversions; profiles are exported under profiles/
+PROFILE_MODES = ('off', 'cprofile', 'sample')
+PROFILE_SUFFIXES = {'cprofile': '.prof', 'sample': '.collapsed.txt'}
+
+# Long PDFs can be converted in page-range chunks (0 = off); finished chunks
+# are appended in page order to <spool file>.partial, which can be previewed
+PARTIAL_SPOOL_SUFFIX = ".partial"
+PDF_TEXT_SUFFIX = ".text"  # pdfminer text of a chunk, next to its pdfplumber output
+
+# The preview loads a window of the stored Markdown, never the whole result
+PREVIEW_WINDOW_BYTES = 256 * 1024
+PREVIEW_SCAN_BLOCK = 1024 * 1024  # Read size of line lookups and search
+
+# Background folder scans hand files to the queue in chunks (or at least this often)
+SCAN_CHUNK_SIZE = 256
+SCAN_FLUSH_SECONDS = 0.25
+
+# Converted Markdown kept in RAM (recently previewed files); the rest is spooled to disk
+DEFAULT_MEMORY_BUDGET = 64 * 1024 * 1024
+
+# Local HTTP conversion service (--serve)
+SERVICE_PORT = 8765
+SERVICE_IO_CHUNK = 64 * 1024  # Upload/download block size
+SERVICE_IDLE_SECONDS = 15  # Keep-alive connections idle longer than this are closed
+SERVICE_MAX_HEADERS = 100
+SERVICE_RESULT_TTL = 3600  # Finished jobs are dropped after this many seconds
+SERVICE_MAX_WAIT = 60  # Longest ?wait= of a status request
+
+# Export
+SUMMARY_FILENAME = "conversion_summary.json"  # Also the manifest for incremental sync
+DEFAULT_COMPRESSION_LEVEL = 6  # ZIP deflate level, 0 = store only
+ZIP_COMPRESSION_LEVELS = {"Store (fastest)": 0, "Fast": 1, "Normal": 6, "Best": 9}
+LIVE_EXPORT_MODES = ("Off", "ZIP file", "Folder")
+
+# Formats whose parsers are CPU-bound (converted in worker processes in 'auto' mode)
+CPU_BOUND_EXTENSIONS = {
+    '.pdf', '.docx', '.doc', '.xlsx', '.xls', '.pptx', '.ppt',
+    '.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tiff',
+    '.mp3', '.wav', '.m4a', '.flac',
+    '.zip', '.epub'
+}
+
+def check_and_install_dependencies():
+    """Check and install dependencies before GUI start"""
+    print("Checking MarkItDown installation...")
+    
+    # Only locate the package - it is imported in the background once the window is up
+    if importlib.util.find_spec('markitdown') is not None:
+        print("✅ MarkItDown is already installed!")
+        return True
+    else:
+        print("❌ MarkItDown not found.")
+        
+        # Ask user in terminal
+        response = input("\nShould MarkItDown be installed automatically? (y/n): ").lower().strip()
+        
+        if response in ['y', 'yes', 'j', 'ja', '']:
+            print("\nInstalling MarkItDown...")
+            try:
+                # Installation with visible output
+                cmd = [sys.executable, "-m", "pip", "install", "--upgrade", "markitdown[all]"]
+                print(f"Running: {' '.join(cmd)}")
+                
+                subprocess.run(cmd, check=True, text=True)
+                
+                print("✅ Installation completed!")
+                print("Testing installation...")
+                
+                # Test import
+                importlib.invalidate_caches()
+                if importlib.util.find_spec('markitdown') is None:
+                    raise ImportError("markitdown")
+                print("✅ MarkItDown successfully installed and tested!")
+                return True
+                
+            except subprocess.CalledProcessError as e:
+                print(f"❌ Installation failed: {e}")
+                print("Try manually: pip install 'markitdown[all]'")
+                return False
+            except ImportError:
+                print("❌ Installation was successful, but import fails.")
+                print("Please restart the application.")
+                return False
+        else:
+            print("❌ Installation cancelled.")
+            print("The app cannot function without MarkItDown.")
+            print("   Install it manually with: pip install 'markitdown[all]'")
+            return False
+
+_file_ids = itertools.count(1)
+
+def reserve_file_ids(max_id):
+    """Make new FileItems use ids above max_id (ids restored from a job journal)"""
+    global _file_ids
+    _file_ids = itertools.count(max(next(_file_ids), max_id + 1))
+
+class FileItem:
+    """Represents a file in the processing queue
+
+    Converted Markdown is not kept on the item: it lives in the shared
+    ResultStore (spooled to disk) and is loaded on access.
+    """
+    result_store = None  # Shared ResultStore, set by the app / headless runner
+    
+    def __init__(self, filepath, stat=None):
+        self.id = next(_file_ids)
+        self.queue = None  # FileQueue this item belongs to
+        self.filepath = filepath
+        self.filename = os.path.basename(filepath)
+        self._status = "Pending"  # Pending, Processing, Completed, Unchanged, Error
+        self._markdown_content = ""  # Only used without a ResultStore
+        self.markdown_size = 0  # Characters of converted Markdown
+        self.line_count = None  # Lines / words of the Markdown, None if unknown
+        self.word_count = None
+        self.error_message = ""
+        self.from_cache = False
+        self.content_hash = None  # SHA-256, when known
+        self.markdown_path = None  # Relative output path in the last folder export
+        self.cost = 1.0  # Estimated conversion seconds, set by the FileQueue
+        self.timings = {}  # Stage -> seconds of the last conversion (see TIMING_STAGES)
+        self.profile_path = None  # Profile of the last conversion (profiling mode only)
+        self.detected_type = None  # Format sniffed by the pre-flight check (see preflight_file)
+        self.page_count = None  # PDF pages, PPTX slides or DOCX pages, when known
+        self.encrypted = False
+        self.needs_ocr = False  # PDF without a text layer
+        self.duplicate_of = None  # FileItem with the same content that was converted instead
+        try:
+            if stat is None:
+                stat = os.stat(filepath)
+            self.filesize = stat.st_size
+            self.mtime_ns = stat.st_mtime_ns
+        except OSError:
+            self.filesize = 0
+            self.mtime_ns = 0
+    
+    @classmethod
+    def from_manifest(cls, entry):
+        """Recreate an already exported file from its manifest entry"""
+        file_item = cls(entry["original_filepath"])
+        file_item.status = "Unchanged"
+        file_item.filesize = entry.get("original_size", 0)
+        file_item.mtime_ns = entry.get("mtime_ns", 0)
+        file_item.content_hash = entry.get("sha256")
+        file_item.markdown_path = entry["markdown_path"]
+        return file_item
+    
+    @property
+    def file_type(self):
+        """Lower-case extension without the dot, used as metrics label"""
+        return os.path.splitext(self.filename)[1][1:].lower() or "none"
+    
+    @property
+    def status(self):
+        return self._status
+    
+    @status.setter
+    def status(self, status):
+        old_status, self._status = self._status, status
+        if self.queue is not None and old_status != status:
+            self.queue.status_changed(self, old_status, status)
+    
+    @property
+    def markdown_content(self):
+        """Converted Markdown (loaded lazily from the result store)"""
+        if self.result_store is not None and self.result_store.contains(self.id):
+            return self.result_store.get(self.id)
+        return self._markdown_content
+    
+    @markdown_content.setter
+    def markdown_content(self, content):
+        self.markdown_size = len(content)
+        self.line_count, self.word_count = markdown_stats(content)
+        if self.result_store is not None:
+            self.result_store.put(self.id, content)
+            self._markdown_content = ""
+        else:
+            self._markdown_content = content
+    
+    def set_result(self, result):
+        """Take over the Markdown of a successful ConversionResult"""
+        primary = self.duplicate_of
+        if primary is not None and self.result_store is not None:
+            # Raises if the primary's spool file is gone; the engine converts such duplicates themselves
+            self.result_store.link(self.id, primary.id)
+            self.markdown_size = result.markdown_size
+            self.line_count, self.word_count = result.line_count, result.word_count
+        elif primary is not None:
+            self.markdown_content = primary.markdown_content
+        elif result.spool_path and self.result_store is not None:
+            self.result_store.adopt(self.id, result.spool_path)
+            self.markdown_size = result.markdown_size
+            self.line_count, self.word_count = result.line_count, result.word_count
+        else:
+            self.markdown_content = result.markdown_content
+        self.profile_path = result.profile_path
+    
+    def spool_path(self):
+        """File holding the converted Markdown, or None if it is only kept in memory"""
+        if self.result_store is not None and self.result_store.contains(self.id):
+            return self.result_store.path_for(self.id)
+        return None
+    
+    def open_markdown(self):
+        """Binary (UTF-8) stream of the converted Markdown, without loading it into memory"""
+        if self.result_store is not None and self.result_store.contains(self.id):
+            return self.result_store.open(self.id)
+        return io.BytesIO(self._markdown_content.encode('utf-8'))
+    
+    def release(self):
+        """Drop the stored Markdown (file removed from queue)"""
+        if self.result_store is not None:
+            self.result_store.discard(self.id)
+        self._markdown_content = ""
+        if self.profile_path:
+            try:
+                os.remove(self.profile_path)
+            except OSError:
+                pass
+            self.profile_path = None
+
+class FileQueue:
+    """Ordered processing queue with O(1) lookup by path and by id
+
+    Items keep their id as a stable handle. Per-status counters (files and
+    estimated cost) are updated on every FileItem.status transition, so
+    statistics never rescan the queue. Positional access (used by the queue
+    view) is served from an order list that is rebuilt lazily after removals.
+    """
+    
+    def __init__(self, cost_model=None):
+        self.cost_model = cost_model  # Sets FileItem.cost when files are added
+        self._items = {}  # id -> FileItem, in insertion order
+        self._by_path = {}  # filepath -> FileItem
+        self._order = []
+        self._order_valid = True
+        self._counts = Counter()
+        self._costs = Counter()
+        self.total_cost = 0.0
+        self._added = None  # Files added while a feed is open
+        self.journal = None  # JobJournal recording additions and status changes
+        self._lock = threading.RLock()
+    
+    def __len__(self):
+        return len(self._items)
+    
+    def __bool__(self):
+        return bool(self._items)
+    
+    def __iter__(self):
+        # Snapshot, so other threads may add files while we iterate
+        with self._lock:
+            return iter(list(self._items.values()))
+    
+    def __contains__(self, filepath):
+        return filepath in self._by_path
+    
+    def __getitem__(self, position):
+        with self._lock:
+            if not self._order_valid:
+                self._order = list(self._items.values())
+                self._order_valid = True
+            return self._order[position]
+    
+    def add(self, file_item):
+        """Append a file; returns False if its path is already queued"""
+        with self._lock:
+            if file_item.filepath in self._by_path:
+                return False
+            self._items[file_item.id] = file_item
+            self._by_path[file_item.filepath] = file_item
+            if self._order_valid:
+                self._order.append(file_item)
+            if self.cost_model is not None:
+                file_item.cost = self.cost_model.estimate(file_item.filepath, file_item.filesize)
+            self._counts[file_item.status] += 1
+            self._costs[file_item.status] += file_item.cost
+            self.total_cost += file_item.cost
+            file_item.queue = self
+            if self._added is not None:
+                self._added.append(file_item)
+            if self.journal is not None:
+                self.journal.record_item("add", file_item)
+            return True
+    
+    def add_many(self, file_items):
+        """Append files under one lock; returns the ones that were not queued yet"""
+        with self._lock:
+            return [file_item for file_item in file_items if self.add(file_item)]
+    
+    def get(self, item_id):
+        """FileItem by id, or None"""
+        return self._items.get(item_id)
+    
+    def by_path(self, filepath):
+        """FileItem by path, or None"""
+        return self._by_path.get(filepath)
+    
+    def remove(self, file_items):
+        """Remove files from the queue"""
+        with self._lock:
+            for file_item in file_items:
+                if self._items.pop(file_item.id, None) is None:
+                    continue
+                del self._by_path[file_item.filepath]
+                self._counts[file_item.status] -= 1
+                self._costs[file_item.status] -= file_item.cost
+                self.total_cost -= file_item.cost
+                file_item.queue = None
+                if self.journal is not None:
+                    self.journal.record("remove", id=file_item.id)
+            self._order_valid = False
+    
+    def clear(self):
+        with self._lock:
+            for file_item in self._items.values():
+                file_item.queue = None
+            self._items.clear()
+            self._by_path.clear()
+            self._order = []
+            self._order_valid = True
+            self._counts.clear()
+            self._costs.clear()
+            self.total_cost = 0.0
+            if self.journal is not None:
+                self.journal.record("clear")
+    
+    def reestimate(self, file_item, extension):
+        """Re-estimate a file's cost as the format it really is (pre-flight check)"""
+        if self.cost_model is None:
+            return
+        with self._lock:
+            if self._items.get(file_item.id) is not file_item:
+                return
+            cost = self.cost_model.estimate(file_item.filepath, file_item.filesize, extension)
+            self._costs[file_item.status] += cost - file_item.cost
+            self.total_cost += cost - file_item.cost
+            file_item.cost = cost
+    
+    def bulk_update(self):
+        """Context for reporting many results at once (the journal is flushed once)"""
+        journal = self.journal
+        return journal.hold() if journal is not None else contextlib.nullcontext()
+    
+    def attach_journal(self, journal, settings):
+        """Snapshot the queue into a job journal and record every change from now on"""
+        with self._lock:
+            journal.start(settings, self._items.values())
+            self.journal = journal
+    
+    def count(self, status):
+        """Number of files with a status"""
+        return self._counts[status]
+    
+    def cost(self, *statuses):
+        """Estimated conversion cost of the files with any of these statuses"""
+        return sum(self._costs[status] for status in statuses)
+    
+    def progress(self):
+        """Finished share of the queue, weighted by estimated cost (0..1)"""
+        if self.total_cost <= 0:
+            return 0.0
+        return min(1.0, self.cost(*DONE_STATUSES) / self.total_cost)
+    
+    def open_feed(self):
+        """Pending files now; files added from here on are collected for take_added()"""
+        with self._lock:
+            self._added = []
+            return [file_item for file_item in self._items.values() if file_item.status == "Pending"]
+    
+    def take_added(self):
+        """Files added since the last call (while a feed is open)"""
+        with self._lock:
+            if not self._added:
+                return []
+            added, self._added = self._added, []
+            return added
+    
+    def close_feed(self):
+        with self._lock:
+            self._added = None
+    
+    def status_changed(self, file_item, old_status, new_status):
+        """Called by FileItem on every status transition"""
+        with self._lock:
+            self._counts[old_status] -= 1
+            self._counts[new_status] += 1
+            self._costs[old_status] -= file_item.cost
+            self._costs[new_status] += file_item.cost
+            if self.journal is not None and new_status != "Processing":
+                self.journal.record_item("status", file_item)
+
+class ResultStore:
+    """Spool of converted Markdown on disk with a small in-memory LRU
+
+    Each result is one UTF-8 file in spool_dir, written as soon as the
+    conversion finishes (usually directly by the worker). Recently used
+    results stay in memory up to memory_budget bytes, so RAM use does not
+    grow with the batch size.
+    """
+    
+    def __init__(self, spool_dir=None, memory_budget=DEFAULT_MEMORY_BUDGET):
+        self.owns_spool_dir = spool_dir is None
+        self.spool_dir = spool_dir or tempfile.mkdtemp(prefix="markitdown_spool_")
+        os.makedirs(self.spool_dir, exist_ok=True)
+        self.memory_budget = memory_budget
+        self._stored = set()
+        self._lru = OrderedDict()  # key -> markdown
+        self._lru_bytes = 0
+        self._lock = threading.Lock()
+    
+    def path_for(self, key):
+        """Spool file for a key"""
+        return os.path.join(self.spool_dir, f"{key}.md")
+    
+    def partial_path_for(self, key):
+        """Pages converted so far of a chunked conversion that is still running"""
+        return self.path_for(key) + PARTIAL_SPOOL_SUFFIX
+    
+    def contains(self, key):
+        return key in self._stored
+    
+    def put(self, key, markdown_content):
+        """Spool a result produced in this process"""
+        write_spool_file(self.path_for(key), markdown_content)
+        with self._lock:
+            self._forget(key)
+            self._stored.add(key)
+    
+    def adopt(self, key, spool_path):
+        """Register a result a worker already wrote to spool_path"""
+        target = self.path_for(key)
+        if os.path.abspath(spool_path) != os.path.abspath(target):
+            os.replace(spool_path, target)
+        with self._lock:
+            self._forget(key)
+            self._stored.add(key)
+    
+    def link(self, key, source_key):
+        """Store the result of source_key under key as well (hardlinked when possible)
+
+        Spool files are only ever replaced, never rewritten, so both keys can
+        share one file.
+        """
+        link_or_copy(self.path_for(source_key), self.path_for(key))
+        with self._lock:
+            self._forget(key)
+            self._stored.add(key)
+    
+    def get(self, key):
+        """Markdown for a key (served from the LRU when possible)"""
+        with self._lock:
+            if key in self._lru:
+                self._lru.move_to_end(key)
+                return self._lru[key]
+        
+        with open(self.path_for(key), 'r', encoding='utf-8', newline='') as f:
+            markdown_content = f.read()
+        
+        size = len(markdown_content)
+        with self._lock:
+            if size <= self.memory_budget:
+                self._forget(key)
+                self._lru[key] = markdown_content
+                self._lru_bytes += size
+                while self._lru_bytes > self.memory_budget:
+                    _, evicted = self._lru.popitem(last=False)
+                    self._lru_bytes -= len(evicted)
+        return markdown_content
+    
+    def open(self, key):
+        """Binary file object of a stored result"""
+        return open(self.path_for(key), 'rb')
+    
+    def discard(self, key):
+        """Delete a stored result"""
+        with self._lock:
+            self._forget(key)
+            self._stored.discard(key)
+        try:
+            os.remove(self.path_for(key))
+        except OSError:
+            pass
+    
+    def _forget(self, key):
+        markdown_content = self._lru.pop(key, None)
+        if markdown_content is not None:
+            self._lru_bytes -= len(markdown_content)
+    
+    def cleanup(self):
+        """Remove the spool directory (if this store created it)"""
+        with self._lock:
+            self._lru.clear()
+            self._lru_bytes = 0
+            self._stored.clear()
+        if self.owns_spool_dir:
+            shutil.rmtree(self.spool_dir, ignore_errors=True)
+
+def link_or_copy(source, target):
+    """Make target a hardlink of source, or a copy where links are not possible"""
+    remove_file(target)
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copyfile(source, target)
+
+def remove_file(filepath):
+    """Delete a file if it exists
+
+    Exports remove a file before writing it again: it may be hardlinked to
+    the output of a duplicate, which must not change along with it.
+    """
+    try:
+        os.remove(filepath)
+    except FileNotFoundError:
+        pass
+
+def write_spool_file(spool_path, markdown_content):
+    """Write Markdown to a spool file atomically"""
+    temp_path = f"{spool_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temp_path, 'w', encoding='utf-8', newline='') as f:
+        f.write(markdown_content)
+    os.replace(temp_path, spool_path)
+
+class JobJournal:
+    """Append-only JSONL write-ahead journal of a batch job
+
+    The job folder holds journal.jsonl and the spool of converted Markdown.
+    Every queue addition/removal and every status change is appended (and
+    flushed) as it happens; a result is journaled as Completed only after its
+    spool file is in place. Replaying the journal restores the queue of an
+    interrupted job without converting finished files again.
+    """
+    
+    def __init__(self, job_dir):
+        self.job_dir = job_dir
+        self.path = os.path.join(job_dir, JOURNAL_FILENAME)
+        self.spool_dir = os.path.join(job_dir, "spool")
+        os.makedirs(self.spool_dir, exist_ok=True)
+        self._file = None
+        self._synced = 0.0
+        self._held = 0  # Open hold() contexts; records are flushed when the last one ends
+        self._lock = threading.Lock()
+        self._lock_file = None  # Open job.lock while this process owns the job
+    
+    def acquire(self):
+        """Lock the job folder for this process; returns False if another process uses it
+
+        The OS lock is released when the process ends, even after a crash, so
+        an interrupted job can be resumed by the next process.
+        """
+        if self._lock_file is not None:
+            return True
+        lock_file = open(os.path.join(self.job_dir, JOB_LOCK_FILENAME), 'a+')
+        try:
+            if os.name == 'nt':
+                import msvcrt
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_NBLCK, 1)
+            else:
+                import fcntl
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        return True
+    
+    def release(self):
+        """Unlock the job folder"""
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+    
+    def exists(self):
+        return os.path.exists(self.path)
+    
+    def load(self):
+        """Replay the journal: (job settings, {item id: file entry} in queue order)"""
+        settings, entries = {}, OrderedDict()
+        try:
+            f = open(self.path, 'r', encoding='utf-8')
+        except FileNotFoundError:
+            return settings, entries
+        with f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # Torn last line of an interrupted write
+                op = record.pop("op", None)
+                if op == "job":
+                    settings = record
+                elif op == "add":
+                    entries[record["id"]] = record
+                elif op == "status":
+                    entry = entries.get(record["id"])
+                    if entry is not None:
+                        entry.update(record)
+                elif op == "remove":
+                    entries.pop(record["id"], None)
+                elif op == "clear":
+                    entries.clear()
+        return settings, entries
+    
+    def start(self, settings, file_items):
+        """Rewrite the journal as a snapshot (job settings + files) and keep appending to it"""
+        with self._lock:
+            self._close()
+            temp_path = f"{self.path}.tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                f.write(self._line("job", settings))
+                for file_item in file_items:
+                    f.write(self._line("add", self.entry(file_item)))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, self.path)
+            self._file = open(self.path, 'a', encoding='utf-8')
+            self._synced = time.monotonic()
+    
+    @staticmethod
+    def entry(file_item):
+        """Journal fields of a file"""
+        entry = {"id": file_item.id, "path": file_item.filepath, "size": file_item.filesize,
+                 "mtime_ns": file_item.mtime_ns, "status": file_item.status}
+        if file_item.status == "Completed":
+            entry["markdown_size"] = file_item.markdown_size
+            entry["lines"] = file_item.line_count
+            entry["words"] = file_item.word_count
+            entry["hash"] = file_item.content_hash
+        elif file_item.status in FAILED_STATUSES:
+            entry["error"] = file_item.error_message
+        return entry
+    
+    @staticmethod
+    def _line(op, fields):
+        record = {"op": op}
+        record.update(fields)
+        return json.dumps(record, ensure_ascii=False) + "\n"
+    
+    def record(self, op, **fields):
+        """Append one record (flushed now, fsynced at most every JOURNAL_SYNC_SECONDS)"""
+        with self._lock:
+            if self._file is None:
+                return
+            try:
+                self._file.write(self._line(op, fields))
+                if not self._held:
+                    self._flush()
+            except OSError as e:
+                print(f"⚠️ Job journal disabled, cannot write {self.path}: {e}")
+                self._file = None
+    
+    def _flush(self):
+        self._file.flush()
+        now = time.monotonic()
+        if now - self._synced >= JOURNAL_SYNC_SECONDS:
+            os.fsync(self._file.fileno())
+            self._synced = now
+    
+    @contextlib.contextmanager
+    def hold(self):
+        """Write the records of a bulk update with one flush at the end"""
+        with self._lock:
+            self._held += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._held -= 1
+                if not self._held and self._file is not None:
+                    try:
+                        self._flush()
+                    except OSError as e:
+                        print(f"⚠️ Job journal disabled, cannot write {self.path}: {e}")
+                        self._file = None
+    
+    def record_item(self, op, file_item):
+        self.record(op, **self.entry(file_item))
+    
+    def _close(self):
+        if self._file is not None:
+            try:
+                self._file.flush()
+                os.fsync(self._file.fileno())
+                self._file.close()
+            except OSError:
+                pass
+            self._file = None
+    
+    def close(self):
+        with self._lock:
+            self._close()
+    
+    def delete(self):
+        """Remove the journal and the spooled results of the job (the lock file stays)"""
+        self.close()
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+        shutil.rmtree(self.spool_dir, ignore_errors=True)
+        os.makedirs(self.spool_dir, exist_ok=True)
+
+def open_gui_journal(jobs_dir):
+    """Job journal of a GUI window, locked for as long as the window is open
+
+    Spool files are named by item ids, which every process numbers from 1,
+    so each window needs its own job folder: gui, gui-2, gui-3, ... A free
+    folder with a journal left by an interrupted session is taken first, so
+    its job can be resumed.
+    """
+    os.makedirs(jobs_dir, exist_ok=True)
+    numbers = sorted(int(name[4:]) for name in os.listdir(jobs_dir) if re.fullmatch(r"gui-\d+", name))
+    names = ["gui"] + [f"gui-{number}" for number in numbers]
+    names.sort(key=lambda name: not os.path.exists(os.path.join(jobs_dir, name, JOURNAL_FILENAME)))
+    for name in names:
+        journal = JobJournal(os.path.join(jobs_dir, name))
+        if journal.acquire():
+            return journal
+    number = max(numbers, default=1)
+    while True:
+        number += 1
+        journal = JobJournal(os.path.join(jobs_dir, f"gui-{number}"))
+        if journal.acquire():
+            return journal
+
+def restore_job(journal, file_queue, result_store):
+    """Re-queue the files of a journaled job; returns (job settings, Counter of statuses)
+
+    Completed files whose source is unchanged and whose spool file survived
+    keep their result and failed files keep their error. Everything else,
+    including files that were being converted, is queued as Pending again.
+    """
+    settings, entries = journal.load()
+    restored = Counter()
+    for entry in entries.values():
+        file_item = FileItem(entry["path"])
+        file_item.id = entry["id"]
+        status = entry.get("status", "Pending")
+        source_unchanged = (file_item.filesize == entry.get("size")
+                            and file_item.mtime_ns == entry.get("mtime_ns"))
+        spool_path = result_store.path_for(file_item.id)
+        if (source_unchanged and status == "Completed" and os.path.exists(spool_path)
+                and os.path.getsize(spool_path) >= entry.get("markdown_size", 0)):
+            result_store.adopt(file_item.id, spool_path)
+            file_item.markdown_size = entry.get("markdown_size", 0)
+            file_item.line_count = entry.get("lines")
+            file_item.word_count = entry.get("words")
+            file_item.content_hash = entry.get("hash")
+            file_item.status = status
+        elif source_unchanged and status in FAILED_STATUSES:
+            file_item.error_message = entry.get("error", "")
+            file_item.status = status
+        if file_queue.add(file_item):
+            restored[file_item.status] += 1
+    reserve_file_ids(max(entries, default=0))
+    return settings, restored
+
+def get_app_data_dir():
+    """Per-user directory for caches and learned settings"""
+    if platform.system() == 'Windows':
+        base = os.environ.get('LOCALAPPDATA') or os.path.expanduser('~')
+    elif platform.system() == 'Darwin':
+        base = os.path.expanduser('~/Library/Caches')
+    else:
+        base = os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache')
+    return os.path.join(base, 'markitdown-desktop')
+
+def get_markitdown_version():
+    """Installed MarkItDown version (part of every cache key)"""
+    try:
+        import markitdown
+        return getattr(markitdown, '__version__', 'unknown')
+    except ImportError:
+        return 'missing'
+
+class ConversionCache:
+    """Persistent, content-addressed cache of conversion results
+
+    Entries are keyed by SHA-256 of the input file plus MarkItDown version and
+    converter options, stored zlib-compressed in SQLite and evicted
+    least-recently-used once the cache exceeds max_bytes. File hashes are
+    memoized by (path, size, mtime) so unchanged files are never re-read.
+    Safe to share between worker threads and processes (one connection each).
+    """
+
+    EVICT_EVERY = 32  # Writes between size checks
+
+    def __init__(self, path, max_bytes=DEFAULT_CACHE_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self._writes = 0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+        conn = self.connect()
+        with conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS entries ("
+                         "key TEXT PRIMARY KEY, content BLOB NOT NULL, "
+                         "size INTEGER NOT NULL, last_access REAL NOT NULL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_lru ON entries (last_access)")
+            conn.execute("CREATE TABLE IF NOT EXISTS file_hashes ("
+                         "path TEXT PRIMARY KEY, size INTEGER NOT NULL, "
+                         "mtime_ns INTEGER NOT NULL, hash TEXT NOT NULL)")
+
+    def connect(self):
+        """SQLite connection owned by the current thread"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def file_hash(self, filepath, source=None):
+        """SHA-256 of a file, reusing the stored hash if size and mtime are unchanged
+
+        source, a MappedInput of the file, is hashed instead of reading the file again.
+        """
+        stat = os.stat(filepath)
+        conn = self.connect()
+        row = conn.execute("SELECT size, mtime_ns, hash FROM file_hashes WHERE path = ?",
+                           (filepath,)).fetchone()
+        if row and row[0] == stat.st_size and row[1] == stat.st_mtime_ns:
+            return row[2]
+
+        content_hash = source.sha256() if source is not None else hash_file(filepath)
+        with conn:
+            conn.execute("INSERT OR REPLACE INTO file_hashes VALUES (?, ?, ?, ?)",
+                         (filepath, stat.st_size, stat.st_mtime_ns, content_hash))
+        return content_hash
+
+    def make_key(self, content_hash, options_key=""):
+        """Cache key for a content hash under the current MarkItDown version and options"""
+        return f"{content_hash}:{get_markitdown_version()}:{options_key}"
+
+    def contains(self, key):
+        """Whether a result is cached for a key (without loading or touching it)"""
+        return self.connect().execute("SELECT 1 FROM entries WHERE key = ? LIMIT 1", (key,)).fetchone() is not None
+
+    def get(self, key):
+        """Cached markdown for a key, or None"""
+        conn = self.connect()
+        row = conn.execute("SELECT content FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        with conn:
+            conn.execute("UPDATE entries SET last_access = ? WHERE key = ?", (time.time(), key))
+        return zlib.decompress(row[0]).decode('utf-8')
+
+    def put(self, key, markdown_content):
+        """Store a conversion result"""
+        blob = zlib.compress(markdown_content.encode('utf-8'))
+        if len(blob) > self.max_bytes:
+            return  # Would evict everything else
+        self._insert(key, blob)
+
+    def put_file(self, key, path, chunk_size=1024 * 1024):
+        """Store a conversion result from a spool file, compressed block by block"""
+        compressor = zlib.compressobj()
+        blob = bytearray()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                blob += compressor.compress(chunk)
+                if len(blob) > self.max_bytes:
+                    return  # Would evict everything else
+        blob += compressor.flush()
+        if len(blob) <= self.max_bytes:
+            self._insert(key, bytes(blob))
+
+    def _insert(self, key, blob):
+        conn = self.connect()
+        with conn:
+            conn.execute("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?)",
+                         (key, blob, len(blob), time.time()))
+
+        self._writes += 1
+        if self._writes % self.EVICT_EVERY == 1:
+            self.evict()
+
+    def evict(self):
+        """Drop least-recently-used entries until the cache fits max_bytes"""
+        conn = self.connect()
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        excess = total - self.max_bytes
+        victims = []
+        for key, size in conn.execute("SELECT key, size FROM entries ORDER BY last_access"):
+            victims.append((key,))
+            excess -= size
+            if excess <= 0:
+                break
+        with conn:
+            conn.executemany("DELETE FROM entries WHERE key = ?", victims)
+
+    def clear(self):
+        """Remove all cached results"""
+        conn = self.connect()
+        with conn:
+            conn.execute("DELETE FROM entries")
+            conn.execute("DELETE FROM file_hashes")
+
+def hash_file(filepath, chunk_size=1024 * 1024):
+    """Streaming SHA-256 of a file"""
+    digest = hashlib.sha256()
+    with open(filepath, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class MappedStream(io.BufferedIOBase):
+    """Seekable binary stream over a memory mapping
+
+    Reads return slices of the mapping, so converters that read only parts
+    of a file (ZIP-based formats, pdfplumber on PDF chunks) never pull in the
+    rest. MarkItDown's PdfConverter reads the whole stream into a BytesIO,
+    so a whole-file PDF conversion still holds one copy of the file.
+    """
+    
+    def __init__(self, mapping):
+        super().__init__()
+        self._mapping = mapping
+        self._position = 0
+    
+    def readable(self):
+        return True
+    
+    def seekable(self):
+        return True
+    
+    def tell(self):
+        return self._position
+    
+    def seek(self, offset, whence=io.SEEK_SET):
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self._position, io.SEEK_END: len(self._mapping)}[whence]
+        self._position = max(0, base + offset)
+        return self._position
+    
+    def read(self, size=-1):
+        end = len(self._mapping) if size is None or size < 0 else min(len(self._mapping), self._position + size)
+        data = self._mapping[self._position:end] if end > self._position else b""
+        self._position = max(self._position, end)
+        return data
+    
+    def read1(self, size=-1):
+        return self.read(size)
+    
+    def readinto(self, buffer):
+        data = self.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+    
+    def readline(self, size=-1):
+        newline = self._mapping.find(b'\n', self._position)
+        end = len(self._mapping) if newline < 0 else newline + 1
+        if size is not None and size >= 0:
+            end = min(end, self._position + size)
+        return self.read(end - self._position)
+
+class MappedInput:
+    """An input file opened once and memory-mapped read-only
+
+    Hashing (cache key) and conversion share the mapping, so each input is
+    read through the page cache once, without a separate read per consumer.
+    Converters that read the whole stream (PDF, text formats) still copy it
+    into their own buffer.
+    Where a file cannot be mapped (empty files, some network shares) the
+    plain file handle is used instead.
+    """
+    
+    def __init__(self, filepath):
+        self.filepath = filepath
+        self._file = open(filepath, 'rb')
+        try:
+            self.mapping = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (ValueError, OSError):
+            self.mapping = None
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+    
+    def sha256(self):
+        """Hex SHA-256 of the file content"""
+        if self.mapping is None:
+            self._file.seek(0)
+            digest = hashlib.sha256()
+            for chunk in iter(lambda: self._file.read(1024 * 1024), b''):
+                digest.update(chunk)
+            return digest.hexdigest()
+        with memoryview(self.mapping) as view:
+            return hashlib.sha256(view).hexdigest()
+    
+    def stream(self):
+        """Seekable binary stream over the file, positioned at the start"""
+        if self.mapping is None:
+            self._file.seek(0)
+            return self._file
+        return MappedStream(self.mapping)
+    
+    def close(self):
+        if self.mapping is not None:
+            self.mapping.close()
+        self._file.close()
+
+def convert_input(markitdown, source):
+    """Convert a MappedInput with MarkItDown's stream API (same hints as convert(path))"""
+    try:
+        from markitdown import StreamInfo
+    except ImportError:  # MarkItDown before the stream API
+        return markitdown.convert(source.filepath)
+    stream_info = StreamInfo(local_path=source.filepath, extension=os.path.splitext(source.filepath)[1],
+                             filename=os.path.basename(source.filepath))
+    return markitdown.convert_stream(source.stream(), stream_info=stream_info)
+
+class CostModel:
+    """Per-format conversion time estimates, learned from previous runs
+
+    Conversion time is modelled as overhead + rate * megabytes per file
+    extension, fitted by exponentially weighted least squares and stored as
+    JSON next to the conversion cache.
+    """
+    DECAY = 0.98  # Weight of older samples, per new sample
+    MIN_SAMPLES = 3  # Below this the built-in defaults are used
+    
+    def __init__(self, path=None):
+        self.path = path
+        self.stats = {}  # extension -> [weight, sum_mb, sum_s, sum_mb2, sum_mb_s]
+        self._lock = threading.Lock()
+        self._dirty = False
+        if path:
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    self.stats = {ext: list(values) for ext, values in json.load(f).items()
+                                  if len(values) == 5}
+            except (OSError, ValueError, AttributeError, TypeError):
+                pass  # No history yet (or unreadable) - start from the defaults
+    
+    def coefficients(self, extension):
+        """(overhead seconds, seconds per MB) for a file extension"""
+        # Defaults: parsers of CPU-bound formats are much slower per byte
+        default_rate = 2.0 if extension in CPU_BOUND_EXTENSIONS else 0.2
+        default_overhead = 0.5 if extension in CPU_BOUND_EXTENSIONS else 0.02
+        with self._lock:
+            stats = self.stats.get(extension)
+            if stats is None or stats[0] < self.MIN_SAMPLES:
+                return default_overhead, default_rate
+            weight, sum_mb, sum_s, sum_mb2, sum_mb_s = stats
+        mean_mb, mean_s = sum_mb / weight, sum_s / weight
+        variance = sum_mb2 / weight - mean_mb * mean_mb
+        if variance > 1e-6:
+            rate = max(0.0, (sum_mb_s / weight - mean_mb * mean_s) / variance)
+        else:
+            rate = default_rate  # All samples had the same size
+        return max(0.0, mean_s - rate * mean_mb), rate
+    
+    def estimate(self, filepath, filesize, extension=None):
+        """Estimated conversion time of a file in seconds (as extension, if given)"""
+        overhead, rate = self.coefficients(extension or os.path.splitext(filepath)[1].lower())
+        return overhead + rate * filesize / (1024 * 1024)
+    
+    def record(self, filepath, filesize, seconds):
+        """Learn from one measured conversion"""
+        extension = os.path.splitext(filepath)[1].lower()
+        size_mb = filesize / (1024 * 1024)
+        with self._lock:
+            stats = self.stats.setdefault(extension, [0.0] * 5)
+            for i, sample in enumerate((1.0, size_mb, seconds, size_mb * size_mb, size_mb * seconds)):
+                stats[i] = stats[i] * self.DECAY + sample
+            self._dirty = True
+    
+    def save(self):
+        """Persist the learned estimates (if anything changed)"""
+        if not self.path or not self._dirty:
+            return
+        with self._lock:
+            content = json.dumps(self.stats)
+            self._dirty = False
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            write_spool_file(self.path, content)
+        except OSError as e:
+            print(f"⚠️ Could not save conversion cost estimates: {e}")
+
+def markdown_stats(markdown_content):
+    """(lines, words) of a result, computed once by the worker that produced it"""
+    if not markdown_content:
+        return 0, 0
+    return markdown_content.count('\n') + 1, len(markdown_content.split())
+
+class ConversionResult:
+    """Outcome of one conversion, passed from a worker back to the engine
+
+    With a spool path the Markdown is written to disk by the worker and only
+    spool_path/markdown_size cross the process boundary.
+    """
+    def __init__(self, markdown_content="", error_message="", cached=False, content_hash=None):
+        self.markdown_content = markdown_content
+        self.error_message = error_message
+        self.cached = cached
+        self.content_hash = content_hash
+        self.spool_path = None
+        self.markdown_size = len(markdown_content)
+        self.line_count, self.word_count = markdown_stats(markdown_content)
+        self.duration = 0.0  # Seconds spent converting in the worker
+        self.timings = {}  # Worker stage durations (read, convert, post_process, write)
+        self.profile_path = None  # Written by the worker in profiling mode
+        self.timed_out = False  # Killed for exceeding the per-file time limit
+        self.unsupported = False  # Rejected by the pre-flight check, never converted
+        self.cancelled = False  # Aborted by Stop - the file stays pending
+    
+    @property
+    def failed_status(self):
+        """Status of a file whose conversion ended with this (error) result"""
+        if self.unsupported:
+            return "Unsupported"
+        return "Timeout" if self.timed_out else "Error"
+    
+    def for_duplicate(self):
+        """This outcome, as reported for a file with the same content
+
+        The Markdown itself is not copied; FileItem.set_result links it from
+        the converted file.
+        """
+        result = ConversionResult(error_message=self.error_message, cached=self.cached,
+                                  content_hash=self.content_hash)
+        result.markdown_size = self.markdown_size
+        result.line_count, result.word_count = self.line_count, self.word_count
+        result.timed_out = self.timed_out
+        result.unsupported = self.unsupported
+        return result
+    
+    @classmethod
+    def cancelled_result(cls):
+        result = cls(error_message="Cancelled")
+        result.cancelled = True
+        return result
+
+class WorkerOptions:
+    """Settings sent to the workers with every task"""
+    def __init__(self, cache_path=None, cache_max_bytes=DEFAULT_CACHE_BYTES, options_key="",
+                 profile_mode=None, profile_threshold=0.0):
+        self.cache_path = cache_path
+        self.cache_max_bytes = cache_max_bytes
+        self.options_key = options_key
+        self.profile_mode = profile_mode  # 'cprofile' or 'sample', None = off
+        self.profile_threshold = profile_threshold  # Keep profiles of slower files only
+
+# Per-worker state (one MarkItDown instance per worker thread or process)
+_worker_state = threading.local()
+
+def get_worker_markitdown():
+    """Return the MarkItDown instance owned by the current worker"""
+    markitdown = getattr(_worker_state, 'markitdown', None)
+    if markitdown is None:
+        from markitdown import MarkItDown
+        markitdown = MarkItDown()
+        _worker_state.markitdown = markitdown
+    return markitdown
+
+def warm_worker(extensions=()):
+    """Create the worker's MarkItDown and import the parsers for these extensions"""
+    try:
+        get_worker_markitdown()
+    except Exception:
+        return  # Reported by the first conversion
+    modules = {module for extension in extensions for module in WARMUP_MODULES.get(extension, ())}
+    for module in sorted(modules):
+        try:
+            importlib.import_module(module)
+        except Exception:
+            pass  # Optional dependency missing: MarkItDown reports it per file
+
+_worker_caches = {}
+_worker_caches_lock = threading.Lock()
+
+def get_worker_cache(cache_path, max_bytes):
+    """Return the ConversionCache shared by all workers of this process"""
+    with _worker_caches_lock:
+        cache = _worker_caches.get(cache_path)
+        if cache is None:
+            cache = _worker_caches[cache_path] = ConversionCache(cache_path, max_bytes)
+        return cache
+
+def convert_with_cache(filepath, options, timings=None):
+    """Convert one file, consulting the conversion cache first
+
+    Returns (markdown_content, cached, content_hash). Stage durations are
+    stored in timings if given.
+    """
+    timings = {} if timings is None else timings
+    mark = time.perf_counter()
+    cache = cache_key = content_hash = None
+    with MappedInput(filepath) as source:
+        if options.cache_path:
+            try:
+                cache = get_worker_cache(options.cache_path, options.cache_max_bytes)
+                content_hash = cache.file_hash(filepath, source)
+                cache_key = cache.make_key(content_hash, options.options_key)
+                markdown_content = cache.get(cache_key)
+                if markdown_content is not None:
+                    timings["read"] = time.perf_counter() - mark
+                    return markdown_content, True, content_hash
+            except (OSError, sqlite3.Error) as e:
+                print(f"Cache unavailable for {filepath}: {e}")
+                cache = None
+            timings["read"] = time.perf_counter() - mark
+            mark = time.perf_counter()
+
+        # Format detection happens inside MarkItDown and is part of "convert"
+        result = convert_input(get_worker_markitdown(), source)
+        markdown_content = result.text_content
+        timings["convert"] = time.perf_counter() - mark
+
+    if not markdown_content:
+        raise Exception("No content extracted")
+
+    if cache is not None:
+        mark = time.perf_counter()
+        try:
+            cache.put(cache_key, markdown_content)
+        except sqlite3.Error as e:
+            print(f"Could not cache {filepath}: {e}")
+        timings["post_process"] = time.perf_counter() - mark
+
+    return markdown_content, False, content_hash
+
+class StackSampler(threading.Thread):
+    """Low-overhead sampling profiler for one thread (collapsed-stack output)
+
+    Polls the target thread's current frame every interval seconds and counts
+    identical stacks, in the format used by flamegraph.pl and speedscope.
+    """
+    
+    def __init__(self, thread_id, root_code=None, interval=0.005):
+        super().__init__(name='markitdown-sampler', daemon=True)
+        self.thread_id = thread_id
+        self.root_code = root_code  # Stacks are cut below this function
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop_event = threading.Event()
+    
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None and frame.f_code is not self.root_code:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+    
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+    
+    def write_collapsed(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+def run_profiled(fn, mode, threshold, profile_base):
+    """Run fn() under cProfile or the stack sampler; returns (fn(), profile path or None)
+
+    The profile is only written if fn() took at least threshold seconds.
+    """
+    started = time.perf_counter()
+    if mode == 'cprofile':
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Python 3.12+ allows one active cProfile per process (thread engine)
+            print("⚠️ cProfile busy in another worker thread - not profiled (use --engine process)")
+            return fn(), None
+        try:
+            result = fn()
+        finally:
+            profiler.disable()
+        if time.perf_counter() - started < threshold:
+            return result, None
+        profile_path = profile_base + PROFILE_SUFFIXES['cprofile']
+        profiler.dump_stats(profile_path)
+        return result, profile_path
+    
+    sampler = StackSampler(threading.get_ident(), root_code=sys._getframe().f_code)
+    sampler.start()
+    try:
+        result = fn()
+    finally:
+        sampler.stop()
+    if time.perf_counter() - started < threshold:
+        return result, None
+    profile_path = profile_base + PROFILE_SUFFIXES['sample']
+    sampler.write_collapsed(profile_path)
+    return result, profile_path
+
+def convert_task(filepath, spool_path=None, options=None):
+    """Convert one file inside a worker, spooling the Markdown to spool_path if given"""
+    try:
+        started = time.perf_counter()
+        options = options or WorkerOptions()
+        timings = {}
+        profile_path = None
+        if options.profile_mode:
+            profile_base = spool_path[:-len(".md")] if spool_path else os.path.join(
+                tempfile.gettempdir(), f"markitdown_profile_{os.getpid()}_{time.time_ns()}")
+            (markdown_content, cached, content_hash), profile_path = run_profiled(
+                lambda: convert_with_cache(filepath, options, timings),
+                options.profile_mode, options.profile_threshold, profile_base)
+            if cached and profile_path:
+                os.remove(profile_path)  # Nothing to learn from a cache hit
+                profile_path = None
+        else:
+            markdown_content, cached, content_hash = convert_with_cache(filepath, options, timings)
+
+        if spool_path:
+            mark = time.perf_counter()
+            write_spool_file(spool_path, markdown_content)
+            timings["write"] = time.perf_counter() - mark
+            result = ConversionResult(cached=cached, content_hash=content_hash)
+            result.spool_path = spool_path
+            result.markdown_size = len(markdown_content)
+            result.line_count, result.word_count = markdown_stats(markdown_content)
+        else:
+            result = ConversionResult(markdown_content, cached=cached, content_hash=content_hash)
+        result.duration = time.perf_counter() - started
+        result.timings = timings
+        result.profile_path = profile_path
+        return result
+    except Exception as e:
+        # Only plain strings cross the process boundary - converter exceptions may not pickle
+        return ConversionResult(error_message=str(e))
+
+def convert_batch_task(tasks, options=None):
+    """Convert several small files in one worker call; tasks are (filepath, spool_path) pairs"""
+    return [convert_task(filepath, spool_path, options) for filepath, spool_path in tasks]
+
+def count_pdf_pages(filepath):
+    """Page count from a PDF's page tree, or None if it cannot be read"""
+    try:
+        from pdfminer.pdfparser import PDFParser
+        from pdfminer.pdfdocument import PDFDocument
+        from pdfminer.pdftypes import resolve1
+        with open(filepath, 'rb') as f:
+            document = PDFDocument(PDFParser(f))
+            return int(resolve1(resolve1(document.catalog['Pages'])['Count']))
+    except Exception:
+        return None
+
+# Leading bytes of binary formats (the PDF header may follow up to 1 KB of junk)
+MAGIC_NUMBERS = (
+    (b'PK\x03\x04', 'zip'), (b'PK\x05\x06', 'zip'),
+    (b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1', 'ole'),  # Legacy Office, or encrypted OOXML
+    (b'\x89PNG\r\n\x1a\n', 'png'), (b'\xff\xd8\xff', 'jpeg'), (b'GIF87a', 'gif'), (b'GIF89a', 'gif'),
+    (b'II*\x00', 'tiff'), (b'MM\x00*', 'tiff'),
+    (b'ID3', 'mp3'), (b'fLaC', 'flac'), (b'OggS', 'ogg'), (b'{\\rtf', 'rtf'),
+)
+WEAK_MAGIC_NUMBERS = ((b'BM', 'bmp'), (b'\xff\xfb', 'mp3'), (b'\xff\xf3', 'mp3'), (b'\xff\xf2', 'mp3'))
+# Declared extensions whose content must be exactly this format
+EXPECTED_KINDS = {'.pdf': {'pdf'}, '.docx': {'docx'}, '.xlsx': {'xlsx'}, '.pptx': {'pptx'},
+                  '.epub': {'epub'}, '.zip': {'zip', 'docx', 'xlsx', 'pptx', 'epub'}}
+# Media whose signatures we may not know: unrecognized binary content is left to MarkItDown
+MEDIA_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tiff',
+                    '.mp3', '.wav', '.m4a', '.flac', '.xls'}
+
+Preflight = namedtuple('Preflight', 'kind page_count encrypted needs_ocr problem')
+
+def sniff_kind(head):
+    """Format of a file from its first bytes"""
+    # The PDF header must open the file; only a BOM or whitespace may precede it
+    body = head[3:] if head.startswith(b'\xef\xbb\xbf') else head
+    if body.lstrip(b' \t\r\n\x0c').startswith(b'%PDF-'):
+        return 'pdf'
+    for magic, kind in MAGIC_NUMBERS:
+        if head.startswith(magic):
+            return kind
+    if head[:4] == b'RIFF' and head[8:12] == b'WAVE':
+        return 'wav'
+    if head[4:8] == b'ftyp':
+        return 'mp4'  # Also .m4a
+    if head.startswith((b'\xff\xfe', b'\xfe\xff')) or b'\x00' not in head:
+        text = head.lstrip(b'\xef\xbb\xbf\xff\xfe \t\r\n\x00')[:1]
+        return {b'<': 'markup', b'{': 'json', b'[': 'json'}.get(text, 'text')
+    for magic, kind in WEAK_MAGIC_NUMBERS:
+        if head.startswith(magic):
+            return kind
+    return 'binary'
+
+def inspect_zip(filepath):
+    """(kind, page_count, problem) of a ZIP container: docx/xlsx/pptx/epub or plain zip"""
+    try:
+        with zipfile.ZipFile(filepath) as zf:
+            names = set(zf.namelist())
+            if 'word/document.xml' in names:
+                page_count = None
+                if 'docProps/app.xml' in names:
+                    match = re.search(rb'<Pages>(\d+)</Pages>', zf.read('docProps/app.xml'))
+                    page_count = int(match.group(1)) if match else None
+                return 'docx', page_count, None
+            if 'xl/workbook.xml' in names:
+                return 'xlsx', None, None
+            if 'ppt/presentation.xml' in names:
+                slides = sum(1 for name in names if re.match(r'ppt/slides/slide\d+\.xml$', name))
+                return 'pptx', slides, None
+            if 'mimetype' in names and zf.read('mimetype').startswith(b'application/epub'):
+                return 'epub', None, None
+            return 'zip', None, None
+    except (zipfile.BadZipFile, OSError, KeyError, ValueError) as e:
+        return 'zip', None, f"Damaged ZIP container: {e}"
+
+def pdf_resources_have_fonts(resources, depth=0):
+    """Whether page resources (or the form XObjects they use) define fonts, i.e. may draw text"""
+    from pdfminer.pdftypes import resolve1
+    resources = resolve1(resources) or {}
+    if resolve1(resources.get('Font')):
+        return True
+    if depth < 2:
+        for xobject in (resolve1(resources.get('XObject')) or {}).values():
+            xobject = resolve1(xobject)
+            if (getattr(xobject.get('Subtype'), 'name', None) == 'Form'
+                    and pdf_resources_have_fonts(xobject.get('Resources'), depth + 1)):
+                return True
+    return False
+
+def inspect_pdf(filepath):
+    """(page_count, encrypted, needs_ocr, problem) from the PDF's document structure
+
+    Only the page tree and the resources of the first PDF_FONT_SAMPLE_PAGES
+    pages are read, no page content. needs_ocr is set when none of them uses
+    a font: such a PDF has little or no text layer for MarkItDown to extract.
+    """
+    from pdfminer.pdfparser import PDFParser
+    from pdfminer.pdfdocument import PDFDocument, PDFPasswordIncorrect, PDFEncryptionError
+    from pdfminer.pdfpage import PDFPage
+    from pdfminer.pdftypes import resolve1
+    try:
+        with open(filepath, 'rb') as f:
+            try:
+                document = PDFDocument(PDFParser(f))
+            except PDFPasswordIncorrect:
+                return None, True, False, "Password-protected PDF"
+            except PDFEncryptionError as e:
+                return None, True, False, f"Unsupported PDF encryption: {e}"
+            encrypted = document.encryption is not None
+            page_count = int(resolve1(resolve1(document.catalog['Pages'])['Count']))
+            if not page_count:
+                return page_count, encrypted, False, "PDF has no pages"
+            for page in itertools.islice(PDFPage.create_pages(document), PDF_FONT_SAMPLE_PAGES):
+                if pdf_resources_have_fonts(page.resources):
+                    return page_count, encrypted, False, None
+            return page_count, encrypted, True, None
+    except Exception:
+        return None, False, False, None  # Unusual structure: let the converter decide
+
+def preflight_file(filepath):
+    """Classify an input from its first bytes and container metadata; returns a Preflight
+
+    problem is set for files no converter can handle (empty, damaged,
+    password-protected, wrong content for the extension); they are rejected
+    without a conversion attempt. Scanned PDFs are only flagged (needs_ocr).
+    """
+    extension = os.path.splitext(filepath)[1].lower()
+    try:
+        with open(filepath, 'rb') as f:
+            head = f.read(SNIFF_BYTES)
+    except OSError as e:
+        return Preflight(None, None, False, False, f"Cannot read file: {e.strerror or e}")
+    if not head:
+        return Preflight('empty', None, False, False, "Empty file")
+    
+    kind = sniff_kind(head)
+    page_count, encrypted, needs_ocr, problem = None, False, False, None
+    if kind == 'zip':
+        kind, page_count, problem = inspect_zip(filepath)
+    elif kind == 'pdf':
+        page_count, encrypted, needs_ocr, problem = inspect_pdf(filepath)
+    
+    if problem is None:
+        expected = EXPECTED_KINDS.get(extension)
+        if kind == 'ole' and extension in ('.docx', '.xlsx', '.pptx'):
+            problem, encrypted = "Password-protected Office document", True
+        elif kind == 'ole' and extension in ('.doc', '.ppt'):
+            problem = f"Legacy {extension} files are not supported by MarkItDown (save as {extension}x)"
+        elif expected is not None and kind not in expected:
+            problem = f"Not a {extension[1:].upper()} file (content looks like {kind})"
+        elif kind == 'binary' and extension not in MEDIA_EXTENSIONS:
+            problem = "Unrecognized binary content"
+    return Preflight(kind, page_count, encrypted, needs_ocr, problem)
+
+# Extension whose cost estimate applies to a sniffed format
+KIND_EXTENSIONS = {'pdf': '.pdf', 'docx': '.docx', 'xlsx': '.xlsx', 'pptx': '.pptx', 'epub': '.epub',
+                   'zip': '.zip', 'markup': '.html', 'json': '.json', 'text': '.txt',
+                   'png': '.png', 'jpeg': '.jpg', 'gif': '.gif', 'tiff': '.tiff', 'bmp': '.bmp',
+                   'mp3': '.mp3', 'wav': '.wav', 'flac': '.flac', 'mp4': '.m4a'}
+
+def pdf_converter_module():
+    """MarkItDown's PDF converter module, whose page helpers chunked conversion reuses
+
+    None if this MarkItDown version has no such module, or its PDF
+    dependencies are missing; long PDFs are then converted whole.
+    """
+    try:
+        from markitdown.converters import _pdf_converter
+    except ImportError:
+        return None
+    if (getattr(_pdf_converter, "_dependency_exc_info", True) is not None
+            or not hasattr(_pdf_converter, "_extract_form_content_from_words")
+            or not hasattr(_pdf_converter, "_merge_partial_numbering_lines")
+            or not hasattr(_pdf_converter, "PARTIAL_NUMBERING_PATTERN")):
+        return None
+    return _pdf_converter
+
+def merge_numbering_lines(pieces, pdf_converter):
+    """PdfConverter's _merge_partial_numbering_lines over text that arrives in pieces
+
+    Yields lists of lines. Text is merged up to the last line that is neither
+    empty nor a partial number: no merge reaches across such a line, so the
+    parts merge to the same lines as the whole text would.
+    """
+    carry = ""
+    for piece in pieces:
+        lines = (carry + piece).split("\n")
+        cut = len(lines) - 1  # The last line may continue in the next piece
+        while cut:
+            stripped = lines[cut - 1].strip()
+            if stripped and not pdf_converter.PARTIAL_NUMBERING_PATTERN.match(stripped):
+                break
+            cut -= 1
+        if cut:
+            yield pdf_converter._merge_partial_numbering_lines("\n".join(lines[:cut])).split("\n")
+        carry = "\n".join(lines[cut:])
+    yield pdf_converter._merge_partial_numbering_lines(carry).split("\n")
+
+def strip_pieces(pieces):
+    """The pieces of "".join(pieces).strip(), without joining them"""
+    pending, started = "", False
+    for piece in pieces:
+        body = piece.rstrip()
+        if not body:
+            pending += piece
+            continue
+        text = pending + body
+        if not started:
+            text, started = text.lstrip(), True
+        yield text
+        pending = piece[len(body):]
+
+def write_normalized_markdown(spool_path, line_groups):
+    """Write lines to a spool file with the clean-up MarkItDown applies to every converter's output
+
+    Trailing whitespace is stripped and runs of three or more newlines become
+    two. Returns (markdown_size, line_count, word_count).
+    """
+    temp_path = f"{spool_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    size = newlines_written = words = 0
+    newlines = -1  # Newlines before the next non-empty line
+    with open(temp_path, 'w', encoding='utf-8', newline='') as f:
+        for lines in line_groups:
+            for line in lines:
+                newlines += 1
+                line = line.rstrip()
+                if line:
+                    newlines = 2 if newlines >= 3 else newlines
+                    f.write("\n" * newlines + line)
+                    size += newlines + len(line)
+                    newlines_written += newlines
+                    words += len(line.split())
+                    newlines = 0
+        if newlines > 0:
+            newlines = 2 if newlines >= 3 else newlines
+            f.write("\n" * newlines)
+            size += newlines
+            newlines_written += newlines
+    os.replace(temp_path, spool_path)
+    return size, (newlines_written + 1 if size else 0), words
+
+def extract_pdf_text(filepath, first_page, last_page):
+    """pdfminer text of pages [first_page, last_page), as in a whole-file extract_text()"""
+    from pdfminer.high_level import extract_text
+    with MappedInput(filepath) as source:
+        return extract_text(source.stream(), page_numbers=range(first_page, last_page), maxpages=last_page)
+
+class PdfChunkResult(ConversionResult):
+    """Outcome of one page range of a chunked PDF
+
+    MarkItDown's PdfConverter decides per document whether the pdfplumber
+    page texts or pdfminer's text layer become the Markdown, so a chunk
+    provides both: the pdfplumber pages in spool_path and, unless the range
+    has form pages, the pdfminer text in text_path. ChunkedFile decides.
+    """
+    def __init__(self):
+        super().__init__()
+        self.form_pages = 0  # Pages with form/table content
+        self.plumber_failed = False  # pdfplumber raised; MarkItDown then uses pdfminer
+        self.text_path = None
+
+def convert_pdf_pages(filepath, chunk_path, first_page, last_page):
+    """Extract pages [first_page, last_page) the way MarkItDown's PdfConverter does"""
+    pdf_converter = pdf_converter_module()
+    result = PdfChunkResult()
+    page_texts = []
+    try:
+        with MappedInput(filepath) as source:
+            with pdf_converter.pdfplumber.open(source.stream(),
+                                               pages=list(range(first_page + 1, last_page + 1))) as pdf:
+                for page in pdf.pages:
+                    page_content = pdf_converter._extract_form_content_from_words(page)
+                    if page_content is not None:
+                        result.form_pages += 1
+                        if page_content.strip():
+                            page_texts.append(page_content)
+                    else:
+                        text = page.extract_text()
+                        if text and text.strip():
+                            page_texts.append(text.strip())
+                    page.close()
+    except Exception:
+        result.plumber_failed = True
+        page_texts = []
+    write_spool_file(chunk_path, "\n\n".join(page_texts))
+    result.spool_path = chunk_path
+    if not result.form_pages or result.plumber_failed:
+        result.text_path = chunk_path + PDF_TEXT_SUFFIX
+        write_spool_file(result.text_path, extract_pdf_text(filepath, first_page, last_page))
+    return result
+
+def convert_pdf_chunk_task(filepath, chunk_path, first_page, last_page, options=None):
+    """Convert pages [first_page, last_page) of a PDF inside a worker, into chunk_path"""
+    try:
+        started = time.perf_counter()
+        options = options or WorkerOptions()
+        profile_path = None
+        if options.profile_mode:
+            result, profile_path = run_profiled(
+                lambda: convert_pdf_pages(filepath, chunk_path, first_page, last_page),
+                options.profile_mode, options.profile_threshold, chunk_path[:-len(".chunk")])
+        else:
+            result = convert_pdf_pages(filepath, chunk_path, first_page, last_page)
+        result.duration = time.perf_counter() - started
+        result.timings = {"convert": result.duration}
+        result.profile_path = profile_path
+        return result
+    except Exception as e:
+        return ConversionResult(error_message=str(e))
+
+def read_spool_file(path):
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        return f.read()
+
+def assemble_pdf_chunks(filepath, spool_path, chunks, use_pages, options):
+    """Markdown of a chunked PDF, chosen and post-processed like PdfConverter.convert()
+
+    chunks lists (first_page, last_page, chunk_path, text_path) in page order;
+    text_path is None where the worker skipped pdfminer. The pdfplumber page
+    texts are used if use_pages, unless they are empty; otherwise pdfminer's
+    text layer. Only one chunk's text is in memory at a time.
+    """
+    pdf_converter = pdf_converter_module()
+    size = 0
+    if use_pages:
+        pages = (read_spool_file(chunk_path) for _, _, chunk_path, _ in chunks)
+        pieces = strip_pieces(("\n\n" if index else "") + text
+                              for index, text in enumerate(text for text in pages if text))
+        size, line_count, word_count = write_normalized_markdown(
+            spool_path, merge_numbering_lines(pieces, pdf_converter))
+    if not size:  # No form pages, pdfplumber failed, or nothing extracted
+        pieces = (read_spool_file(text_path) if text_path else extract_pdf_text(filepath, first_page, last_page)
+                  for first_page, last_page, _, text_path in chunks)
+        size, line_count, word_count = write_normalized_markdown(
+            spool_path, merge_numbering_lines(pieces, pdf_converter))
+    return size, line_count, word_count
+
+def assemble_pdf_chunks_task(filepath, spool_path, chunks, use_pages, options=None):
+    """Assemble the chunks of a PDF into spool_path inside a worker, and cache the result"""
+    try:
+        started = time.perf_counter()
+        options = options or WorkerOptions()
+        size, line_count, word_count = assemble_pdf_chunks(filepath, spool_path, chunks, use_pages, options)
+        if not size:
+            remove_file(spool_path)
+            return ConversionResult(error_message="No content extracted")
+        content_hash = None
+        if options.cache_path:
+            try:
+                cache = get_worker_cache(options.cache_path, options.cache_max_bytes)
+                content_hash = cache.file_hash(filepath)
+                cache.put_file(cache.make_key(content_hash, options.options_key), spool_path)
+            except (OSError, sqlite3.Error) as e:
+                print(f"Could not cache {filepath}: {e}")
+        result = ConversionResult(content_hash=content_hash)
+        result.spool_path = spool_path
+        result.markdown_size = size
+        result.line_count, result.word_count = line_count, word_count
+        result.timings = {"post_process": time.perf_counter() - started}
+        return result
+    except Exception as e:
+        return ConversionResult(error_message=f"Could not assemble chunks: {e}")
+
+class ChunkedFile:
+    """A long PDF converted as page-range chunks and reassembled in page order
+
+    Chunks are independent worker tasks, so one document can use several
+    workers. A finished chunk is appended to the partial spool file (for the
+    preview) as soon as all earlier pages are there. Once every chunk is in,
+    a worker assembles the Markdown exactly as MarkItDown's PdfConverter would
+    produce it for the whole file (see assemble_pdf_chunks_task).
+    """
+    
+    def __init__(self, file_item, spool_path, page_count, chunk_pages, options=None):
+        self.file_item = file_item
+        self.options = options or WorkerOptions()
+        self.spool_path = spool_path
+        self.partial_path = spool_path + PARTIAL_SPOOL_SUFFIX
+        self.page_count = page_count
+        self.ranges = [(first, min(first + chunk_pages, page_count))
+                       for first in range(0, page_count, chunk_pages)]
+        self.submitted = 0  # Chunks handed to workers
+        self.appended = 0  # Chunks in the partial file
+        self.waiting = {}  # Chunk index -> result that finished before an earlier chunk
+        self.text_paths = {}  # Chunk index -> pdfminer text of the chunk
+        self.form_pages = 0
+        self.plumber_failed = False
+        self.timings = Counter()
+        self.duration = 0.0
+        self.profile_path = None  # Profile of the slowest profiled chunk
+        self.profile_duration = 0.0
+        self.failed = False
+        open(self.partial_path, 'wb').close()
+    
+    def chunk_path(self, index):
+        return f"{self.spool_path}.{index}.chunk"
+    
+    @property
+    def pages_done(self):
+        return self.ranges[self.appended - 1][1] if self.appended else 0
+    
+    def add_result(self, index, result):
+        """Take a converted chunk; returns True once every chunk is in the partial file"""
+        self.waiting[index] = result
+        while self.appended in self.waiting:
+            index, result = self.appended, self.waiting.pop(self.appended)
+            mark = time.perf_counter()
+            preview_path = result.text_path or result.spool_path  # Preview only, see result()
+            with open(preview_path, 'rb') as src, open(self.partial_path, 'ab') as dst:
+                shutil.copyfileobj(src, dst)
+            if result.text_path:
+                self.text_paths[index] = result.text_path
+            self.form_pages += result.form_pages
+            self.plumber_failed = self.plumber_failed or result.plumber_failed
+            self.keep_profile(result)
+            self.timings.update(result.timings)
+            self.timings["write"] += time.perf_counter() - mark
+            self.duration += result.duration
+            self.appended += 1
+        return self.appended == len(self.ranges)
+    
+    def keep_profile(self, result):
+        """Keep the profile of the slowest chunk as the file's profile"""
+        if not result.profile_path:
+            return
+        if result.duration > self.profile_duration:
+            result.profile_path, self.profile_path = self.profile_path, result.profile_path
+            self.profile_duration = result.duration
+        if result.profile_path:
+            try:
+                os.remove(result.profile_path)
+            except OSError:
+                pass
+    
+    @property
+    def complete(self):
+        """Whether every chunk is in, so the document can be assembled"""
+        return self.appended == len(self.ranges)
+    
+    def assembly_args(self):
+        """Arguments of assemble_pdf_chunks_task for this file"""
+        chunks = [(first, last, self.chunk_path(index), self.text_paths.get(index))
+                  for index, (first, last) in enumerate(self.ranges)]
+        use_pages = bool(self.form_pages) and not self.plumber_failed
+        return self.file_item.filepath, self.spool_path, chunks, use_pages, self.options
+    
+    def finish(self, result):
+        """ConversionResult of the document, from the result of its assembly task"""
+        if result.error_message:
+            self.discard()
+            return result
+        self.timings.update(result.timings)
+        result.timings = dict(self.timings)
+        result.duration = self.duration
+        result.profile_path, self.profile_path = self.profile_path, None  # Handed over to the result
+        self.discard(failed=False)
+        return result
+    
+    def discard(self, failed=True):
+        """Remove the chunk, text and partial files (and give up the conversion if failed)"""
+        self.failed = self.failed or failed
+        paths = [self.partial_path]
+        for index in range(len(self.ranges)):
+            paths += [self.chunk_path(index), self.chunk_path(index) + PDF_TEXT_SUFFIX]
+        if self.profile_path:
+            paths.append(self.profile_path)
+            self.profile_path = None
+        for path in paths:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+def process_rss(pid):
+    """Resident memory of a process in bytes, or None if it cannot be measured"""
+    if psutil is not None:
+        try:
+            return psutil.Process(pid).memory_info().rss
+        except Exception:
+            return None
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError, IndexError):
+        return None
+
+def supervised_worker_main(conn, warmup=()):
+    """Worker process loop of SupervisedProcessPool: warm up, then run (fn, args) tasks until None"""
+    warm_worker(warmup)
+    conn.send(WORKER_READY)
+    while True:
+        try:
+            task = conn.recv()
+        except (EOFError, OSError):
+            return
+        if task is None:
+            return
+        fn, args = task
+        conn.send(fn(*args))
+
+class SupervisedWorker:
+    """One worker process of a SupervisedProcessPool"""
+    def __init__(self, context, warmup=()):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=supervised_worker_main, args=(child_conn, warmup),
+                                       name='markitdown-worker', daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.spawned = time.monotonic()
+        self.ready = False  # Warm-up finished (WORKER_READY received)
+        self.future = None  # Task currently running in this worker
+        self.started = None  # When the task started running, None while still warming up
+        self.tasks = 0  # Files converted by this process
+
+class SupervisedProcessPool:
+    """Process pool whose workers are watched and can be killed one by one
+
+    Each worker runs one task at a time over its own pipe. A watchdog thread
+    kills a worker that exceeds the wall-clock or memory limit, or that is
+    cancelled, and resolves its future with a ConversionResult saying why.
+
+    Workers are started up front and warmed (MarkItDown created, parsers for
+    the warmup extensions imported) before the first task arrives. A worker
+    that has run max_tasks tasks, or sits above recycle_memory after a task,
+    is retired between tasks to contain leaks in third-party parsers. Retired,
+    killed and crashed workers are replaced right away, so the pool stays warm.
+    A task handed to a worker that is still warming up waits in its pipe; its
+    time limit starts only when the worker reports WORKER_READY.
+    """
+
+    def __init__(self, max_workers, timeout=None, memory_limit=None, mp_context=None,
+                 max_tasks=0, recycle_memory=None, warmup=()):
+        self.max_workers = max(1, int(max_workers))
+        self.timeout = timeout or None  # Seconds per task
+        self.memory_limit = memory_limit or None  # Bytes of resident memory per worker
+        self.max_tasks = max_tasks or 0  # Tasks per worker process (0 = unlimited)
+        self.recycle_memory = recycle_memory or None  # Bytes; checked between tasks
+        self.warmup = tuple(sorted(warmup))  # Extensions new workers prepare for
+        self.recycled = 0  # Workers retired by max_tasks / recycle_memory
+        self._context = mp_context or multiprocessing.get_context('spawn')
+        self._workers = []
+        self._backlog = deque()  # (future, fn, args) waiting for an idle worker
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._shutdown = False
+        if (self.memory_limit or self.recycle_memory) and process_rss(os.getpid()) is None:
+            print("⚠️ Worker memory limits not enforced: process memory cannot be measured here (install psutil)")
+            self.memory_limit = self.recycle_memory = None
+        with self._lock:
+            self._top_up()
+        self._watchdog = threading.Thread(target=self._watch, name='markitdown-watchdog', daemon=True)
+        self._watchdog.start()
+
+    def submit(self, fn, *args):
+        """Run fn(*args) in a worker process; returns a concurrent.futures.Future"""
+        future = Future()
+        with self._lock:
+            if self._shutdown:
+                raise RuntimeError("cannot submit after shutdown")
+            self._backlog.append((future, fn, args))
+            self._dispatch()
+        self._wakeup.set()
+        return future
+
+    def _top_up(self):
+        """Start warm workers until the pool is full (lock held)"""
+        while len(self._workers) < self.max_workers and not self._shutdown:
+            self._workers.append(SupervisedWorker(self._context, self.warmup))
+
+    def _dispatch(self):
+        """Hand backlog tasks to idle workers, starting workers as needed (lock held)"""
+        while self._backlog:
+            worker = next((w for w in self._workers if w.future is None), None)
+            if worker is None:
+                if len(self._workers) >= self.max_workers:
+                    return
+                worker = SupervisedWorker(self._context, self.warmup)
+                self._workers.append(worker)
+            future, fn, args = self._backlog.popleft()
+            try:
+                worker.conn.send((fn, args))
+            except Exception as e:
+                self._kill(worker)
+                future.set_result(ConversionResult(error_message=f"Could not start conversion: {e}"))
+                continue
+            worker.future = future
+            worker.started = time.monotonic() if worker.ready else None
+
+    def _kill(self, worker):
+        """Terminate a worker process and forget it (lock held)"""
+        try:
+            worker.process.kill()
+            worker.process.join(timeout=5)
+        except Exception:
+            pass
+        worker.conn.close()
+        self._workers.remove(worker)
+
+    def _finish(self, worker, result):
+        """Resolve the worker's task (lock held)"""
+        future, worker.future = worker.future, None
+        if future is not None and not future.done():
+            future.set_result(result)
+
+    def _due_for_recycling(self, worker):
+        """Whether an idle worker has reached max_tasks or the memory high-water mark"""
+        if self.max_tasks and worker.tasks >= self.max_tasks:
+            return True
+        if self.recycle_memory:
+            rss = process_rss(worker.process.pid)
+            return rss is not None and rss > self.recycle_memory
+        return False
+
+    def _watch(self):
+        """Watchdog thread: collect results, enforce limits, keep workers busy"""
+        while True:
+            with self._lock:
+                if self._shutdown:
+                    return
+                self._top_up()  # Replace recycled, killed and crashed workers
+                busy = {w.conn: w for w in self._workers if w.future is not None or not w.ready}
+            if not busy:
+                self._wakeup.wait(0.5)
+                self._wakeup.clear()
+                continue
+
+            ready = multiprocessing.connection.wait(list(busy), timeout=0.1)
+            with self._lock:
+                if self._shutdown:
+                    return
+                for conn in ready:
+                    worker = busy[conn]
+                    if worker not in self._workers:
+                        continue
+                    try:
+                        result = conn.recv()
+                        if result == WORKER_READY:
+                            worker.ready = True
+                            if worker.future is not None:
+                                worker.started = time.monotonic()
+                            continue
+                    except (EOFError, OSError):
+                        worker.process.join(timeout=1)
+                        exitcode = worker.process.exitcode
+                        self._kill(worker)
+                        result = ConversionResult(error_message=f"Worker process crashed (exit code {exitcode})")
+                    except Exception as e:
+                        result = ConversionResult(error_message=f"Could not read conversion result: {e}")
+                    self._finish(worker, result)
+                    worker.tasks += len(result) if isinstance(result, list) else 1  # Files of a batch
+                    if worker in self._workers and self._due_for_recycling(worker):
+                        self._kill(worker)  # Idle, nothing is lost
+                        self.recycled += 1
+
+                now = time.monotonic()
+                for worker in [w for w in self._workers if w.future is not None]:
+                    result = None
+                    if worker.started is None:
+                        if now - worker.spawned > WORKER_START_TIMEOUT:
+                            result = ConversionResult(
+                                error_message=f"Worker process did not start within {WORKER_START_TIMEOUT} s")
+                    elif self.timeout and now - worker.started > self.timeout:
+                        result = ConversionResult(error_message=f"Timed out after {self.timeout:g} s")
+                        result.timed_out = True
+                    if result is None and self.memory_limit:
+                        rss = process_rss(worker.process.pid)
+                        if rss is not None and rss > self.memory_limit:
+                            result = ConversionResult(
+                                error_message=f"Memory limit exceeded ({rss // (1024 * 1024)} MB > "
+                                              f"{self.memory_limit // (1024 * 1024)} MB)")
+                    if result is not None:
+                        self._kill(worker)
+                        self._finish(worker, result)
+
+                self._dispatch()
+
+    def wait_ready(self, timeout=WORKER_START_TIMEOUT):
+        """Block until every worker has warmed up; False if timeout seconds passed first"""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            with self._lock:
+                if all(worker.ready for worker in self._workers):
+                    return True
+            time.sleep(0.02)
+        return False
+
+    def cancel_running(self):
+        """Kill every busy worker and drop queued tasks; their futures report cancellation"""
+        with self._lock:
+            futures = [future for future, _, _ in self._backlog]
+            self._backlog.clear()
+            for worker in [w for w in self._workers if w.future is not None]:
+                futures.append(worker.future)
+                worker.future = None
+                self._kill(worker)
+        for future in futures:
+            if not future.done():
+                future.set_result(ConversionResult.cancelled_result())
+
+    def shutdown(self, wait=False):
+        """Stop idle workers, kill busy ones"""
+        self.cancel_running()
+        with self._lock:
+            self._shutdown = True
+            for worker in list(self._workers):
+                try:
+                    worker.conn.send(None)
+                except Exception:
+                    pass
+                if wait:
+                    worker.process.join(timeout=5)
+                self._kill(worker)
+        self._wakeup.set()
+
+class PendingFiles:
+    """Files waiting for a worker: FIFO, or a heap ordered by priority(file_item)"""
+    
+    def __init__(self, file_items, priority=None):
+        self.priority = priority
+        self._sequence = itertools.count()  # Keeps queue order among equal priorities
+        self._items = deque() if priority is None else []
+        self.extend(file_items)
+    
+    def __len__(self):
+        return len(self._items)
+    
+    def extend(self, file_items):
+        if self.priority is None:
+            self._items.extend(file_items)
+            return
+        for file_item in file_items:
+            heapq.heappush(self._items, (self.priority(file_item), next(self._sequence), file_item))
+    
+    def pop(self):
+        if self.priority is None:
+            return self._items.popleft()
+        return heapq.heappop(self._items)[2]
+    
+    def peek(self):
+        """The file pop() would return next"""
+        if self.priority is None:
+            return self._items[0]
+        return self._items[0][2]
+
+class FileBatch:
+    """Small files converted together in one worker task (micro-batch)"""
+    def __init__(self, file_items):
+        self.file_items = file_items
+
+def schedule_priority(order):
+    """Priority function for PendingFiles: 'largest' or 'smallest' estimated cost first"""
+    if order == 'largest':
+        return lambda file_item: -file_item.cost  # Long files start early: shortest makespan
+    if order == 'smallest':
+        return lambda file_item: file_item.cost  # Quick first results
+    return None
+
+class DuplicateIndex:
+    """Files of one engine run by size and content, so identical inputs are converted once
+
+    Each distinct content has one primary file that is converted; files with
+    the same content wait in waiting[primary id] for its result. Outcomes of
+    finished primaries are kept for duplicates that are discovered later.
+    Files whose size collides with another file are held in hashing until
+    their hash is known; checked files are queued from ready.
+    """
+    
+    def __init__(self, max_files=DEDUPE_MAX_FILES):
+        self.max_files = max_files
+        self.by_size = OrderedDict()  # size -> [primary FileItem], oldest size first
+        self.digests = {}  # primary id -> SHA-256, once hashed (None if unreadable)
+        self.by_content = {}  # (size, SHA-256) -> primary FileItem
+        self.waiting = {}  # primary id -> [duplicate FileItem]
+        self.outcomes = {}  # primary id -> ConversionResult of a finished primary
+        self.hashing = deque()  # Groups of [(FileItem, hash Future, held)], in arrival order
+        self.held_sizes = Counter()  # Sizes of the held files that are still being hashed
+        self.ready = []  # Files to queue: checked files and successors of lost primaries
+        self._files = 0
+    
+    def add(self, file_item, digest=None):
+        """Register a file that is converted itself"""
+        self.by_size.setdefault(file_item.filesize, []).append(file_item)
+        self._files += 1
+        if digest is not None:
+            self.set_digest(file_item, digest)
+        while self._files > self.max_files and len(self.by_size) > 1:
+            _, evicted = self.by_size.popitem(last=False)
+            self._files -= len(evicted)
+            for primary in evicted:
+                digest = self.digests.pop(primary.id, None)
+                if self.by_content.get((primary.filesize, digest)) is primary:
+                    del self.by_content[(primary.filesize, digest)]
+                self.outcomes.pop(primary.id, None)
+    
+    def set_digest(self, file_item, digest):
+        self.digests[file_item.id] = digest
+        if digest is not None:
+            self.by_content.setdefault((file_item.filesize, digest), file_item)
+    
+    def unhashed(self, size):
+        """Primaries of a size that were unique so far and never hashed (nor being hashed)"""
+        hashing = {file_item.id for group in self.hashing for file_item, _, _ in group}
+        return [item for item in self.by_size.get(size, ())
+                if item.id not in self.digests and item.id not in hashing]
+    
+    def pending_hashes(self):
+        """Unfinished hash futures of the oldest group, whose files are released first"""
+        return [future for _, future, _ in self.hashing[0] if not future.done()] if self.hashing else []
+    
+    def promote(self, primary, duplicates):
+        """Convert the first duplicate itself, for a primary whose Markdown is gone"""
+        digest = self.digests.get(primary.id)
+        if self.by_content.get((primary.filesize, digest)) is primary:
+            del self.by_content[(primary.filesize, digest)]
+        self.outcomes.pop(primary.id, None)
+        successor = duplicates[0]
+        successor.duplicate_of = None
+        self.add(successor, digest)
+        for duplicate in duplicates[1:]:
+            duplicate.duplicate_of = successor
+        if len(duplicates) > 1:
+            self.waiting[successor.id] = list(duplicates[1:])
+        self.ready.append(successor)
+    
+    def cancel(self):
+        """Drop the files that are still being hashed; returns the held ones"""
+        held = []
+        for group in self.hashing:
+            for file_item, future, is_held in group:
+                future.cancel()
+                if is_held:
+                    held.append(file_item)
+        self.hashing.clear()
+        self.held_sizes.clear()
+        return held
+
+class ConversionEngine:
+    """Worker-pool engine that converts FileItems in parallel
+
+    Modes:
+    - auto: process pool for CPU-bound formats, thread pool for I/O-bound formats
+    - process: every file is converted in a worker process
+    - thread: every file is converted in a worker thread
+    - serial: one file at a time (previous behaviour)
+
+    With a per-file timeout or memory limit every file is converted in a
+    supervised worker process, so a hung converter can be killed.
+    """
+
+    def __init__(self, workers=DEFAULT_WORKERS, mode='auto', cache_path=None,
+                 cache_max_bytes=DEFAULT_CACHE_BYTES, options_key="", result_store=None,
+                 timeout=None, memory_limit=None, profile_mode=None, profile_threshold=0.0,
+                 pdf_chunk_pages=0, max_tasks_per_worker=WORKER_MAX_TASKS, recycle_memory=None,
+                 batch_bytes=DEFAULT_BATCH_BYTES, preflight=True, deduplicate=True):
+        if mode not in ENGINE_MODES:
+            raise ValueError(f"Unknown engine mode: {mode}")
+        self.workers = max(1, int(workers))
+        self.mode = mode
+        self.cache_path = cache_path
+        self.worker_options = WorkerOptions(cache_path, cache_max_bytes, options_key,
+                                            profile_mode, profile_threshold)
+        self.result_store = result_store  # Workers spool results directly into it
+        self.timeout = timeout or None  # Seconds per file
+        self.memory_limit = memory_limit or None  # Bytes per worker process
+        self.pdf_chunk_pages = pdf_chunk_pages  # Longer PDFs are converted in chunks (0 = off)
+        self.max_tasks_per_worker = max_tasks_per_worker  # Worker process recycling (0 = never)
+        self.recycle_memory = recycle_memory or None  # Bytes, recycle worker processes above this
+        self.warmup = set()  # Extensions seen so far; new workers pre-import their parsers
+        self.batch_bytes = batch_bytes  # Byte budget of a micro-batch of small files (0 = off)
+        self._retry_alone = set()  # Ids of files whose batch failed as a whole
+        self.preflight_enabled = preflight  # Sniff files and reject unsupported ones before converting
+        self.deduplicate_enabled = deduplicate  # Convert files with identical content only once
+        self._preflight_pool = None  # Threads for sniffing and hashing inputs
+        self._recycled = 0  # Recycled workers of process pools already shut down
+        self._more_ready = threading.Event()  # Set by notify() (more_items() has new files) or a finished hash
+        self._thread_pool = None
+        self._process_pool = None
+
+    def uses_process_pool(self, filepath):
+        """Decide whether a file is converted in the process pool"""
+        if self.mode == 'process' or self.timeout or self.memory_limit:
+            return True
+        if self.mode == 'auto':
+            return os.path.splitext(filepath)[1].lower() in CPU_BOUND_EXTENSIONS
+        return False
+
+    def batchable(self, file_item):
+        """Whether a file may share a worker task with other small files"""
+        if not self.batch_bytes or self.timeout or self.memory_limit:
+            return False  # Per-file limits need one task per file
+        if file_item.filesize > BATCH_FILE_BYTES or file_item.id in self._retry_alone:
+            return False
+        return not (self.pdf_chunk_pages and file_item.file_type == 'pdf')
+
+    def take_batch(self, file_item, pending, max_in_flight):
+        """Small files to convert together with file_item, or None to convert it alone
+
+        Batches follow the pending order and stop at the first file that does
+        not fit, and they shrink as the queue runs low so that every worker
+        still gets a share of the remaining files.
+        """
+        if not self.batchable(file_item):
+            return None
+        limit = min(BATCH_MAX_FILES, (len(pending) + 1) // max_in_flight)
+        process_pool = self.uses_process_pool(file_item.filepath)
+        file_items, size = [file_item], file_item.filesize
+        while pending and len(file_items) < limit:
+            candidate = pending.peek()
+            if (not self.batchable(candidate) or size + candidate.filesize > self.batch_bytes
+                    or self.uses_process_pool(candidate.filepath) != process_pool):
+                break
+            file_items.append(pending.pop())
+            size += candidate.filesize
+        return FileBatch(file_items) if len(file_items) > 1 else None
+
+    def preflight(self, file_items, on_result=None, bulk_report=None):
+        """Classify files in bulk before they are queued; returns the ones worth converting
+
+        Files are sniffed in parallel threads (see preflight_file). The result
+        is kept on the FileItem, and the cost of a misnamed file is estimated
+        as its real format. Unsupported files are reported right away with an
+        "Unsupported" result and never reach a worker. Scanned PDFs are still
+        converted, with a warning that little text may come out.
+        """
+        if not self.preflight_enabled or not file_items:
+            return file_items
+        infos = self.preflight_pool().map(preflight_file, [file_item.filepath for file_item in file_items])
+        accepted, rejected = [], []
+        for file_item, info in zip(file_items, infos):
+            file_item.detected_type = info.kind
+            file_item.page_count = info.page_count
+            file_item.encrypted = info.encrypted
+            file_item.needs_ocr = info.needs_ocr
+            if info.problem:
+                rejected.append((file_item, info.problem))
+                continue
+            if info.needs_ocr:
+                print(f"⚠️ {file_item.filename}: scanned PDF without a text layer, "
+                      "little or no text will be extracted (needs OCR)", file=sys.stderr)
+            extension = KIND_EXTENSIONS.get(info.kind)
+            if (extension and file_item.queue is not None
+                    and extension != os.path.splitext(file_item.filepath)[1].lower()):
+                file_item.queue.reestimate(file_item, extension)
+            accepted.append(file_item)
+        if rejected and on_result:
+            with bulk_report() if bulk_report else contextlib.nullcontext():
+                for file_item, problem in rejected:
+                    result = ConversionResult(error_message=problem)
+                    result.unsupported = True
+                    file_item.timings = {}
+                    on_result(file_item, result)
+        return accepted
+
+    def preflight_pool(self):
+        """Return (lazily creating) the threads that sniff and hash inputs"""
+        if self._preflight_pool is None:
+            self._preflight_pool = ThreadPoolExecutor(max_workers=PREFLIGHT_THREADS,
+                                                      thread_name_prefix='markitdown-preflight')
+        return self._preflight_pool
+
+    def deduplicate(self, file_items, index):
+        """Hold back files that may have the same content as another file of this run
+
+        Returns the files that can be queued right away. Only files that share
+        their size with another file are hashed, in the background on the
+        pre-flight threads, and held until collect_hashes releases them; the
+        rest is converted without waiting.
+        """
+        for file_item in file_items:
+            file_item.duplicate_of = None
+        if not self.deduplicate_enabled or not file_items:
+            return file_items
+        sizes = Counter(file_item.filesize for file_item in file_items)
+        colliding = {size for size, count in sizes.items()
+                     if size and (count > 1 or size in index.by_size or size in index.held_sizes)}
+        accepted, group = [], []
+        for primary in (primary for size in colliding for primary in index.unhashed(size)):
+            group.append((primary, self.preflight_pool().submit(self.content_digest, primary.filepath), False))
+        for file_item in file_items:
+            if file_item.filesize not in colliding:
+                index.add(file_item)
+                accepted.append(file_item)
+                continue
+            index.held_sizes[file_item.filesize] += 1
+            group.append((file_item, self.preflight_pool().submit(self.content_digest, file_item.filepath), True))
+        if group:
+            for _, future, _ in group:
+                future.add_done_callback(lambda _: self._more_ready.set())
+            index.hashing.append(group)
+        return accepted
+
+    def content_digest(self, filepath):
+        """SHA-256 of a file for duplicate detection, or None if it cannot be read
+
+        With the conversion cache on, the hash remembered for the file's path,
+        size and mtime is reused, and the worker that converts the file finds
+        the hash there too.
+        """
+        options = self.worker_options
+        try:
+            if options.cache_path:
+                return get_worker_cache(options.cache_path, options.cache_max_bytes).file_hash(filepath)
+            return hash_file(filepath)
+        except (OSError, sqlite3.Error):
+            return None
+
+    def collect_hashes(self, index, on_result=None, bulk_report=None):
+        """Release held files whose hash is known, in arrival order; returns the ones to queue
+
+        A duplicate gets FileItem.duplicate_of and is reported together with
+        its primary (see report_duplicates), or right away if the primary is
+        already finished.
+        """
+        accepted, late = index.ready, []
+        index.ready = []
+        while index.hashing and not index.pending_hashes():
+            group = index.hashing.popleft()
+            for file_item, future, held in group:
+                digest = future.result()
+                if not held:
+                    index.set_digest(file_item, digest)
+                    continue
+                index.held_sizes[file_item.filesize] -= 1
+                if not index.held_sizes[file_item.filesize]:
+                    del index.held_sizes[file_item.filesize]
+                primary = index.by_content.get((file_item.filesize, digest)) if digest else None
+                outcome = index.outcomes.get(primary.id) if primary is not None else None
+                if (outcome is not None and not outcome.error_message and self.result_store is not None
+                        and not self.result_store.contains(primary.id)):
+                    # The primary's Markdown is gone (e.g. a service job that expired)
+                    del index.by_content[(file_item.filesize, digest)]
+                    primary = None
+                if primary is None:
+                    index.add(file_item, digest)
+                    accepted.append(file_item)
+                    continue
+                file_item.content_hash = digest
+                file_item.duplicate_of = primary
+                if outcome is None:
+                    index.waiting.setdefault(primary.id, []).append(file_item)
+                else:
+                    late.append((file_item, outcome))
+        if late and on_result:
+            with bulk_report() if bulk_report else contextlib.nullcontext():
+                for file_item, outcome in late:
+                    file_item.timings = {}
+                    on_result(file_item, outcome.for_duplicate())
+        return accepted
+
+    def report_duplicates(self, on_result, index, bulk_report):
+        """Wrap on_result so that a primary's result is reported for its duplicates too"""
+        def report(file_item, result):
+            on_result(file_item, result)
+            duplicates = index.waiting.pop(file_item.id, ())
+            if not result.cancelled:
+                index.outcomes[file_item.id] = result
+            if not duplicates:
+                return
+            if (not result.error_message and not result.cancelled and self.result_store is not None
+                    and not self.result_store.contains(file_item.id)):
+                index.promote(file_item, duplicates)  # No Markdown to share: convert a duplicate itself
+                return
+            with bulk_report() if bulk_report else contextlib.nullcontext():
+                for duplicate in duplicates:
+                    duplicate.timings = {}
+                    on_result(duplicate, result if result.cancelled else result.for_duplicate())
+        return report
+
+    def plan_chunks(self, file_items, checks):
+        """Hold back the PDFs that may be converted in chunks; returns the other files
+
+        Whether a PDF is chunked depends on its page count and on whether its
+        Markdown is cached, which means hashing the whole file. That is worked
+        out on the pre-flight threads (see chunk_page_count); meanwhile the
+        PDFs wait in checks, a dict Future -> FileItem.
+        """
+        if not self.pdf_chunk_pages or self.result_store is None or pdf_converter_module() is None:
+            return file_items
+        ready = []
+        for file_item in file_items:
+            if file_item.file_type != 'pdf' or (file_item.page_count is not None
+                                                and file_item.page_count <= self.pdf_chunk_pages):
+                ready.append(file_item)
+                continue
+            future = self.preflight_pool().submit(self.chunk_page_count, file_item)
+            future.add_done_callback(lambda _: self._more_ready.set())
+            checks[future] = file_item
+        return ready
+
+    def chunk_page_count(self, file_item):
+        """Page count of a PDF long enough to be converted in chunks, else None
+
+        A PDF whose Markdown is in the conversion cache is not chunked; the
+        whole-file task then returns the cached result.
+        """
+        page_count = file_item.page_count
+        if page_count is None:
+            page_count = count_pdf_pages(file_item.filepath)
+        if page_count and page_count > self.pdf_chunk_pages and not self.is_cached(file_item):
+            return page_count
+        return None
+
+    def is_cached(self, file_item):
+        """Whether the conversion cache has a result for the file's current content"""
+        options = self.worker_options
+        if not options.cache_path:
+            return False
+        try:
+            cache = get_worker_cache(options.cache_path, options.cache_max_bytes)
+            return cache.contains(cache.make_key(cache.file_hash(file_item.filepath), options.options_key))
+        except (OSError, sqlite3.Error):
+            return False
+    
+    def get_pool(self, filepath):
+        """Return (lazily creating) the executor responsible for a file"""
+        if self.uses_process_pool(filepath):
+            return self.process_pool()
+        return self.thread_pool()
+
+    def thread_pool(self):
+        """Return (lazily creating) the worker thread pool"""
+        if self._thread_pool is None:
+            thread_workers = 1 if self.mode == 'serial' else self.workers
+            self._thread_pool = ThreadPoolExecutor(max_workers=thread_workers,
+                                                   thread_name_prefix='markitdown-worker',
+                                                   initializer=warm_worker, initargs=(tuple(self.warmup),))
+        return self._thread_pool
+
+    def process_pool(self):
+        """Return (lazily creating) the supervised process pool"""
+        if self._process_pool is None:
+            # 'spawn' avoids forking a process that owns a Tk interpreter
+            self._process_pool = SupervisedProcessPool(
+                self.workers, timeout=self.timeout, memory_limit=self.memory_limit,
+                mp_context=multiprocessing.get_context('spawn'),
+                max_tasks=self.max_tasks_per_worker, recycle_memory=self.recycle_memory,
+                warmup=self.warmup)
+        return self._process_pool
+
+    def prestart(self, file_items=None):
+        """Start and warm the worker processes for these files before their first task
+
+        Without files (a service waiting for uploads), every pool some file
+        type could need is started; a worker thread imports MarkItDown.
+        """
+        if file_items is None:
+            if self.mode in ('auto', 'process') or self.timeout or self.memory_limit:
+                self.process_pool()
+            if self.mode != 'process' and not (self.timeout or self.memory_limit):
+                self.thread_pool().submit(warm_worker)
+            return
+        extensions = {os.path.splitext(file_item.filepath)[1].lower() for file_item in file_items}
+        if extensions - self.warmup:
+            self.warmup.update(extensions)
+            if self._process_pool is not None:
+                self._process_pool.warmup = tuple(sorted(self.warmup))  # For replacement workers
+        if any(self.uses_process_pool(file_item.filepath) for file_item in file_items):
+            self.process_pool()
+
+    def warm_up(self, file_items):
+        """Start every worker these files need and wait until all are warm (benchmarks)"""
+        self.prestart(file_items)
+        if self._process_pool is not None:
+            self._process_pool.wait_ready()
+        if not all(self.uses_process_pool(file_item.filepath) for file_item in file_items):
+            # Overlapping tasks make the executor start (and initialize) all of its threads
+            thread_workers = 1 if self.mode == 'serial' else self.workers
+            pool = self.thread_pool()
+            wait([pool.submit(time.sleep, 0.05) for _ in range(thread_workers)])
+
+    def recycled_workers(self):
+        """Worker processes retired so far by task count or memory high-water mark"""
+        return self._recycled + (self._process_pool.recycled if self._process_pool is not None else 0)
+
+    def run(self, file_items, on_start=None, on_result=None, should_stop=None, more_items=None,
+            priority=None, on_progress=None, bulk_report=None):
+        """Convert file_items, reporting results in completion order
+
+        on_start(file_item) is called when a file is handed to a worker,
+        on_result(file_item, conversion_result) when it finishes.
+        Both are called from the calling thread, never from a worker.
+        more_items(), if given, is polled for files discovered while the batch
+        runs (e.g. by a folder scan); it returns a list, or None when no more
+        files will come. priority(file_item), if given, orders the work (lowest
+        first, see schedule_priority); otherwise files run in queue order.
+        PDFs longer than pdf_chunk_pages are split into page-range chunks that
+        run before the next file; on_progress(file_item, pages_done, page_count)
+        is called whenever more pages are in the partial output.
+        Small files are converted in micro-batches (see take_batch); their
+        results are reported together inside bulk_report(), a context manager
+        factory such as FileQueue.bulk_update, if given.
+        Files with the same content as another file are not converted; they
+        get its result (see deduplicate and collect_hashes).
+        """
+        duplicates = DuplicateIndex()
+        if on_result and self.deduplicate_enabled:
+            on_result = self.report_duplicates(on_result, duplicates, bulk_report)
+        file_items = self.preflight(file_items, on_result, bulk_report)
+        file_items = self.deduplicate(file_items, duplicates)
+        self.prestart(file_items)
+        chunk_checks, chunk_plans = {}, {}  # See plan_chunks; file id -> page count to chunk
+        file_items = self.plan_chunks(file_items, chunk_checks)
+        pending = PendingFiles(file_items, priority)
+        chunked = deque()  # ChunkedFiles with chunks left to hand out
+        clock = time.perf_counter
+        queued_at = dict.fromkeys((file_item.id for file_item in file_items), clock())
+        submitted_at = {}
+        in_flight = {}
+        max_in_flight = 1 if self.mode == 'serial' else self.workers
+
+        while (pending or chunked or in_flight or more_items is not None
+               or duplicates.hashing or duplicates.ready or chunk_checks):
+            stopped = should_stop is not None and should_stop()
+            if stopped:
+                more_items = None
+                for future in chunk_checks:
+                    future.cancel()
+                for file_item in duplicates.cancel() + duplicates.ready + list(chunk_checks.values()):
+                    if on_result:
+                        on_result(file_item, ConversionResult.cancelled_result())
+                duplicates.ready = []
+                chunk_checks.clear()
+                if in_flight or chunked:
+                    # Abort files mid-conversion; they are reported as cancelled
+                    self.cancel_running()
+                    cancelled = {}
+                    for future, (file_item, job, _) in in_flight.items():
+                        future.cancel()
+                        if isinstance(job, FileBatch):
+                            cancelled.update((member.id, member) for member in job.file_items)
+                            continue
+                        if job is None or not job.failed:
+                            cancelled[file_item.id] = file_item
+                        if job is not None:
+                            job.discard()
+                    for job in chunked:
+                        cancelled[job.file_item.id] = job.file_item
+                        job.discard()
+                    for file_item in cancelled.values():
+                        if on_result:
+                            on_result(file_item, ConversionResult.cancelled_result())
+                    in_flight.clear()
+                    chunked.clear()
+
+            if more_items is not None and len(pending) < max_in_flight:
+                new_items = more_items()
+                if new_items is None:
+                    more_items = None
+                else:
+                    new_items = self.preflight(new_items, on_result, bulk_report)
+                    new_items = self.deduplicate(new_items, duplicates)
+                    self.prestart(new_items)
+                    new_items = self.plan_chunks(new_items, chunk_checks)
+                    queued_at.update(dict.fromkeys((file_item.id for file_item in new_items), clock()))
+                    pending.extend(new_items)
+            
+            if (duplicates.hashing or duplicates.ready) and not stopped:
+                checked = self.collect_hashes(duplicates, on_result, bulk_report)
+                self.prestart(checked)
+                checked = self.plan_chunks(checked, chunk_checks)
+                queued_at.update(dict.fromkeys((file_item.id for file_item in checked), clock()))
+                pending.extend(checked)
+            
+            planned = []
+            for future in [future for future in chunk_checks if future.done()]:
+                file_item = chunk_checks.pop(future)
+                try:
+                    chunk_plans[file_item.id] = future.result()
+                except Exception:
+                    chunk_plans[file_item.id] = None  # Converted whole; the worker reports any problem
+                planned.append(file_item)
+            queued_at.update(dict.fromkeys((file_item.id for file_item in planned), clock()))
+            pending.extend(planned)
+
+            # Keep every worker busy, but never queue more than we can convert.
+            # Chunks of a started PDF go first, so its pages arrive in order.
+            while (chunked or pending) and not stopped and len(in_flight) < max_in_flight:
+                if chunked and chunked[0].complete:
+                    # Every chunk is in: a worker assembles the document
+                    job = chunked.popleft()
+                    try:
+                        future = self.get_pool(job.file_item.filepath).submit(
+                            assemble_pdf_chunks_task, *job.assembly_args())
+                    except Exception as e:
+                        future = Future()
+                        future.set_result(ConversionResult(error_message=str(e)))
+                    in_flight[future] = (job.file_item, job, None)
+                    continue
+                if chunked:
+                    job = chunked[0]
+                    index = job.submitted
+                    job.submitted += 1
+                    if job.submitted == len(job.ranges):
+                        chunked.popleft()
+                    first_page, last_page = job.ranges[index]
+                    try:
+                        future = self.get_pool(job.file_item.filepath).submit(
+                            convert_pdf_chunk_task, job.file_item.filepath, job.chunk_path(index),
+                            first_page, last_page, self.worker_options)
+                    except Exception as e:
+                        future = Future()
+                        future.set_result(ConversionResult(error_message=str(e)))
+                    in_flight[future] = (job.file_item, job, index)
+                    continue
+                
+                file_item = pending.pop()
+                batch = self.take_batch(file_item, pending, max_in_flight)
+                if batch is not None:
+                    submitted = clock()
+                    tasks = []
+                    for member in batch.file_items:
+                        member.timings = {"queue_wait": submitted - queued_at.pop(member.id, submitted)}
+                        submitted_at[member.id] = submitted
+                        if on_start:
+                            on_start(member)
+                        tasks.append((member.filepath,
+                                      self.result_store.path_for(member.id) if self.result_store else None))
+                    try:
+                        future = self.get_pool(file_item.filepath).submit(
+                            convert_batch_task, tasks, self.worker_options)
+                    except Exception as e:
+                        future = Future()
+                        future.set_result(ConversionResult(error_message=str(e)))
+                    in_flight[future] = (file_item, batch, None)
+                    continue
+                
+                submitted = clock()
+                file_item.timings = {"queue_wait": submitted - queued_at.pop(file_item.id, submitted)}
+                if on_start:
+                    on_start(file_item)
+                try:
+                    spool_path = self.result_store.path_for(file_item.id) if self.result_store else None
+                    page_count = chunk_plans.pop(file_item.id, None) if spool_path else None
+                    if page_count:
+                        chunked.append(ChunkedFile(file_item, spool_path, page_count, self.pdf_chunk_pages,
+                                                   self.worker_options))
+                        submitted_at[file_item.id] = submitted
+                        continue
+                    future = self.get_pool(file_item.filepath).submit(
+                        convert_task, file_item.filepath, spool_path, self.worker_options)
+                except Exception as e:
+                    if on_result:
+                        on_result(file_item, ConversionResult(error_message=str(e)))
+                    continue
+                in_flight[future] = (file_item, None, None)
+                submitted_at[file_item.id] = submitted
+
+            if not in_flight:
+                if pending or (more_items is None and not duplicates.hashing and not duplicates.ready
+                               and not chunk_checks):
+                    break
+                self._more_ready.wait(0.1)  # Waiting for the next discovered or hashed files
+                self._more_ready.clear()
+                continue
+
+            done, _ = wait(list(in_flight) + duplicates.pending_hashes() + list(chunk_checks), timeout=0.5,
+                           return_when=FIRST_COMPLETED)
+            for future in done:
+                if future not in in_flight:
+                    continue  # A hash or chunk plan: its files are queued at the top of the loop
+                file_item, job, index = in_flight.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = ConversionResult(error_message=str(e))
+                if isinstance(job, FileBatch):
+                    self.collect_batch(job, result, pending, queued_at, submitted_at, on_result, bulk_report)
+                    continue
+                if job is not None:
+                    result = self.collect_chunk(job, index, result, chunked, on_progress)
+                    if result is None:
+                        continue  # More chunks to come
+                # Worker stages, and whatever the pool and IPC added on top
+                file_item.timings.update(result.timings)
+                file_item.timings["dispatch"] = max(
+                    0.0, clock() - submitted_at.pop(file_item.id) - sum(result.timings.values()))
+                if on_result:
+                    on_result(file_item, result)
+
+    def collect_batch(self, batch, results, pending, queued_at, submitted_at, on_result, bulk_report):
+        """Report the results of a micro-batch
+
+        If the task failed as a whole (worker crash), its files are queued
+        again to be converted one by one, so one bad file cannot fail the rest.
+        """
+        clock = time.perf_counter
+        if not isinstance(results, list):
+            if results.cancelled:
+                results = [results] * len(batch.file_items)
+            else:
+                for member in batch.file_items:
+                    self._retry_alone.add(member.id)
+                    submitted_at.pop(member.id, None)
+                    queued_at[member.id] = clock()
+                pending.extend(batch.file_items)
+                return
+        
+        elapsed = clock() - submitted_at[batch.file_items[0].id]
+        busy = [sum(result.timings.values()) for result in results]
+        dispatch = max(0.0, elapsed - sum(busy)) / len(results)  # Shared pool/IPC overhead
+        waited = 0.0
+        with bulk_report() if bulk_report else contextlib.nullcontext():
+            for member, result, seconds in zip(batch.file_items, results, busy):
+                # Worker stages; time spent on earlier files of the batch counts as queue wait
+                member.timings["queue_wait"] += waited
+                member.timings.update(result.timings)
+                member.timings["dispatch"] = dispatch
+                waited += seconds
+                submitted_at.pop(member.id, None)
+                if on_result:
+                    on_result(member, result)
+
+    def collect_chunk(self, job, index, result, chunked, on_progress):
+        """Handle a finished chunk; returns the file's ConversionResult once it is decided"""
+        if job.failed:
+            for path in (result.spool_path, getattr(result, "text_path", None), result.profile_path):
+                if path:
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+            return None  # The file was already reported
+        
+        if index is None:
+            return job.finish(result)  # The assembled document
+        if not result.error_message:
+            try:
+                appended = job.appended
+                if job.add_result(index, result):
+                    chunked.appendleft(job)  # Assembled next, by a worker
+                elif on_progress and job.appended > appended:
+                    on_progress(job.file_item, job.pages_done, job.page_count)
+                return None
+            except Exception as e:
+                result = ConversionResult(error_message=f"Could not assemble chunks: {e}")
+        else:
+            first_page, last_page = job.ranges[index]
+            result.error_message = f"Pages {first_page + 1}-{last_page}: {result.error_message}"
+        
+        # The first failed chunk fails the file; its other chunks are dropped
+        job.discard()
+        if job in chunked:
+            chunked.remove(job)
+        return result
+    
+    def notify(self):
+        """Wake an idle run() to poll more_items() now (any thread)"""
+        self._more_ready.set()
+
+    def cancel_running(self):
+        """Kill worker processes that are converting; worker threads cannot be
+        interrupted, their results are simply discarded"""
+        if self._process_pool is not None:
+            self._process_pool.cancel_running()
+    
+    def shutdown(self):
+        """Stop all worker pools"""
+        self._recycled = self.recycled_workers()
+        for pool in (self._thread_pool, self._process_pool, self._preflight_pool):
+            if pool is not None:
+                pool.shutdown(wait=False)
+        self._thread_pool = None
+        self._process_pool = None
+        self._preflight_pool = None
+
+# File types picked up when adding folders or directory inputs
+SUPPORTED_EXTENSIONS = {
+    '.pdf', '.docx', '.doc', '.xlsx', '.xls', '.pptx', '.ppt',
+    '.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tiff',
+    '.mp3', '.wav', '.m4a', '.flac',
+    '.html', '.htm', '.csv', '.json', '.xml',
+    '.zip', '.epub', '.txt'
+}
+
+def parse_glob_patterns(text):
+    """Split a comma/semicolon separated pattern list ("*.pdf; reports/*")"""
+    return [pattern.strip() for pattern in text.replace(';', ',').split(',') if pattern.strip()]
+
+def matches_any(patterns, name, relpath):
+    """True if a glob pattern matches the entry name or its path relative to the scan root"""
+    return any(fnmatch.fnmatch(name, pattern) or fnmatch.fnmatch(relpath, pattern)
+               for pattern in patterns)
+
+def scan_folder(folder, include=None, exclude=None, max_depth=None, cancel_event=None):
+    """Yield (filepath, stat) for all supported files below a folder
+
+    Uses os.scandir so directory entries are typed without extra stat calls;
+    the one stat per file is handed on to FileItem. include/exclude are glob
+    patterns matched against the name or the '/'-separated relative path
+    (exclude also prunes folders). max_depth 0 scans only the folder itself.
+    Unreadable folders are skipped.
+    """
+    stack = [(folder, "", 0)]
+    while stack:
+        directory, prefix, depth = stack.pop()
+        if cancel_event is not None and cancel_event.is_set():
+            return
+        try:
+            with os.scandir(directory) as iterator:
+                entries = sorted(iterator, key=lambda entry: entry.name)
+        except OSError as e:
+            print(f"⚠️ Skipping {directory}: {e}")
+            continue
+
+        subfolders = []
+        for entry in entries:
+            relpath = prefix + entry.name
+            if exclude and matches_any(exclude, entry.name, relpath):
+                continue
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if max_depth is None or depth < max_depth:
+                        subfolders.append((entry.path, relpath + "/", depth + 1))
+                    continue
+                if os.path.splitext(entry.name)[1].lower() not in SUPPORTED_EXTENSIONS:
+                    continue
+                if include and not matches_any(include, entry.name, relpath):
+                    continue
+                if entry.is_file():
+                    yield entry.path, entry.stat()
+            except OSError:
+                continue  # Vanished or unreadable entry
+
+        # Depth-first, in name order
+        stack.extend(reversed(subfolders))
+
+def iter_supported_files(folder, include=None, exclude=None, max_depth=None):
+    """Yield all supported files below a folder"""
+    for filepath, _ in scan_folder(folder, include, exclude, max_depth):
+        yield filepath
+
+class FolderScanner(threading.Thread):
+    """Scans a folder in the background and streams new files into a FileQueue
+
+    Files are added in chunks so the UI and a running batch can pick them up
+    while the scan is still going.
+    """
+    
+    def __init__(self, folder, file_queue, include=None, exclude=None, max_depth=None):
+        super().__init__(daemon=True)
+        self.folder = folder
+        self.file_queue = file_queue
+        self.include = include
+        self.exclude = exclude
+        self.max_depth = max_depth
+        self.cancel_event = threading.Event()
+        self.found = 0  # Supported files seen
+        self.added = 0  # Files that were not queued yet
+        self.error = None
+    
+    def cancel(self):
+        self.cancel_event.set()
+    
+    @property
+    def cancelled(self):
+        return self.cancel_event.is_set()
+    
+    def run(self):
+        chunk = []
+        last_flush = time.monotonic()
+        try:
+            for filepath, stat in scan_folder(self.folder, self.include, self.exclude,
+                                              self.max_depth, self.cancel_event):
+                self.found += 1
+                if filepath not in self.file_queue:
+                    chunk.append(FileItem(filepath, stat))
+                if chunk and (len(chunk) >= SCAN_CHUNK_SIZE
+                              or time.monotonic() - last_flush >= SCAN_FLUSH_SECONDS):
+                    self.added += len(self.file_queue.add_many(chunk))
+                    chunk = []
+                    last_flush = time.monotonic()
+        except Exception as e:
+            self.error = str(e)
+            print(f"❌ Folder scan failed: {e}")
+        finally:
+            if chunk:
+                self.added += len(self.file_queue.add_many(chunk))
+
+def format_duration(seconds):
+    """Format a duration as '45s', '3m 20s' or '1h 05m'"""
+    seconds = int(round(seconds))
+    if seconds < 60:
+        return f"{seconds}s"
+    if seconds < 3600:
+        return f"{seconds // 60}m {seconds % 60:02d}s"
+    return f"{seconds // 3600}h {seconds % 3600 // 60:02d}m"
+
+def format_filesize(size_bytes):
+    """Format file size in human readable format"""
+    if size_bytes == 0:
+        return "0 B"
+    size_names = ["B", "KB", "MB", "GB"]
+    i = 0
+    while size_bytes >= 1024 and i < len(size_names)-1:
+        size_bytes /= 1024
+        i += 1
+    return f"{size_bytes:.1f} {size_names[i]}"
+
+def compute_export_root(file_queue):
+    """Common directory of all queued files (computed once per export)"""
+    try:
+        return os.path.commonpath([os.path.dirname(item.filepath) for item in file_queue])
+    except ValueError:
+        return None  # Empty queue or paths on different drives
+
+def markdown_relpath(file_item, export_root, preserve_structure):
+    """Relative path of a file's markdown output inside an export"""
+    base_name = os.path.splitext(file_item.filename)[0]
+    md_filename = f"{base_name}.md"
+
+    # Preserve folder structure if enabled
+    if preserve_structure and export_root:
+        try:
+            relative_dir = os.path.dirname(os.path.relpath(file_item.filepath, export_root))
+            if relative_dir and not relative_dir.startswith(os.pardir):
+                md_filename = os.path.join(relative_dir, md_filename)
+        except ValueError:
+            pass  # Use simple filename if path calculation fails
+
+    return md_filename
+
+def profile_relpath(file_item, export_root, preserve_structure):
+    """Path of a file's profile inside an export: profiles/<markdown path><suffix>"""
+    suffix = next(suffix for suffix in PROFILE_SUFFIXES.values() if file_item.profile_path.endswith(suffix))
+    md_filename = markdown_relpath(file_item, export_root, preserve_structure).replace(os.sep, '/')
+    return "profiles/" + os.path.splitext(md_filename)[0] + suffix
+
+def export_profile(file_item, export_root, preserve_structure, export_folder=None, zipf=None):
+    """Copy a file's profile into a folder or ZIP export (if it has one)"""
+    if not file_item.profile_path or not os.path.exists(file_item.profile_path):
+        return
+    relpath = profile_relpath(file_item, export_root, preserve_structure)
+    if zipf is not None:
+        zipf.write(file_item.profile_path, relpath)
+        return
+    target = os.path.join(export_folder, relpath)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    shutil.copyfile(file_item.profile_path, target)
+
+def create_index_content(completed_files, export_root=None, preserve_structure=False):
+    """Create index/README content for export"""
+    content = f"""# MarkItDown Conversion Results
+
+Generated by MarkItDown Desktop v{APP_VERSION}
+Conversion Date: {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
+
+## Converted Files
+
+"""
+
+    for file_item in completed_files:
+        md_filename = (file_item.markdown_path
+                       or markdown_relpath(file_item, export_root, preserve_structure).replace(os.sep, '/'))
+        file_size = format_filesize(file_item.filesize)
+
+        content += f"- [{file_item.filename}]({md_filename}) ({file_size})\n"
+
+    content += f"""
+
+## Statistics
+
+- Total files processed: {len(completed_files)}
+- Total original size: {format_filesize(sum(item.filesize for item in completed_files))}
+- Processing tool: Microsoft MarkItDown
+- Desktop GUI: MarkItDown Desktop by Rudolf Wagner
+
+## Support the Project
+
+This conversion was made possible by MarkItDown Desktop, created to support a meaningful kindergarten project.
+
+🎁 **Support the Kindergarten Project**: [Donate via PayPal](https://www.paypal.com/donate/?hosted_button_id=PAGH54TWEXP54)
+
+👨‍💻 **Developer**: [Rudolf Wagner on LinkedIn](https://www.linkedin.com/in/rudolfwagner)
+
+---
+
+*Generated with ❤️ by MarkItDown Desktop*
+"""
+
+    return content
+
+def create_summary_content(file_queue, export_root=None, preserve_structure=False, sync_info=None):
+    """Create JSON summary of conversion process (doubles as incremental sync manifest)"""
+    summary = {
+        "conversion_info": {
+            "tool": f"MarkItDown Desktop v{APP_VERSION}",
+            "timestamp": datetime.now().isoformat(),
+            "total_files": len(file_queue),
+            "completed_files": len([item for item in file_queue if item.status == "Completed"]),
+            "error_files": len([item for item in file_queue if item.status == "Error"]),
+            "timeout_files": len([item for item in file_queue if item.status == "Timeout"]),
+            "unsupported_files": len([item for item in file_queue if item.status == "Unsupported"])
+        },
+        "files": []
+    }
+
+    for file_item in file_queue:
+        file_info = {
+            "original_filename": file_item.filename,
+            "original_filepath": file_item.filepath,
+            "original_size": file_item.filesize,
+            "status": file_item.status,
+            "markdown_size": file_item.markdown_size,
+            "from_cache": file_item.from_cache,
+            "mtime_ns": file_item.mtime_ns
+        }
+
+        if file_item.content_hash:
+            file_info["sha256"] = file_item.content_hash
+
+        if file_item.detected_type:
+            file_info["detected_type"] = file_item.detected_type
+        if file_item.page_count is not None:
+            file_info["page_count"] = file_item.page_count
+        if file_item.encrypted:
+            file_info["encrypted"] = True
+        if file_item.needs_ocr:
+            file_info["needs_ocr"] = True
+        if file_item.duplicate_of is not None:
+            file_info["duplicate_of"] = file_item.duplicate_of.filepath
+
+        if file_item.status in ("Completed", "Unchanged"):
+            file_info["markdown_path"] = (file_item.markdown_path
+                                          or markdown_relpath(file_item, export_root, preserve_structure).replace(os.sep, '/'))
+
+        if file_item.status in FAILED_STATUSES:
+            file_info["error_message"] = file_item.error_message
+
+        if file_item.timings:
+            file_info["timings"] = {stage: round(seconds, 4) for stage, seconds in file_item.timings.items()}
+
+        if file_item.profile_path and file_item.status == "Completed":
+            file_info["profile"] = profile_relpath(file_item, export_root, preserve_structure)
+
+        summary["files"].append(file_info)
+
+    # Stage timing histograms per file type
+    summary["timings"] = StageMetrics.from_items(
+        item for item in file_queue if item.timings and item.status != "Unchanged").to_dict()
+
+    if sync_info is not None:
+        summary["sync"] = sync_info
+
+    return json.dumps(summary, indent=2)
+
+class StageMetrics:
+    """Histograms of per-file stage timings by file type, plus file counters
+
+    Fed from FileItem.timings; rendered into conversion_summary.json and the
+    Prometheus text format. GUI refresh ticks are timed in a histogram of
+    their own, outside the per-file stages.
+    """
+    
+    def __init__(self):
+        self._histograms = {}  # (stage, file_type) -> [bucket counts..., sum, max]
+        self._ui_refresh = self._new_histogram()  # GUI refresh ticks while converting
+        self._files = Counter()  # (status, file_type) -> files
+        self._bytes = Counter()  # file_type -> input bytes
+        self._lock = threading.Lock()
+    
+    @classmethod
+    def from_items(cls, file_items):
+        metrics = cls()
+        for file_item in file_items:
+            metrics.observe_file(file_item)
+        return metrics
+    
+    @staticmethod
+    def _new_histogram():
+        return [0] * (len(METRICS_BUCKETS) + 1) + [0.0, 0.0]
+    
+    @staticmethod
+    def _add_sample(histogram, seconds):
+        histogram[bisect.bisect_left(METRICS_BUCKETS, seconds)] += 1
+        histogram[-2] += seconds
+        histogram[-1] = max(histogram[-1], seconds)
+    
+    def observe(self, stage, file_type, seconds):
+        """Add one timing sample"""
+        with self._lock:
+            histogram = self._histograms.get((stage, file_type))
+            if histogram is None:
+                histogram = self._histograms[(stage, file_type)] = self._new_histogram()
+            self._add_sample(histogram, seconds)
+    
+    def observe_ui_refresh(self, seconds):
+        """Add the duration of one GUI refresh tick"""
+        with self._lock:
+            self._add_sample(self._ui_refresh, seconds)
+    
+    def ui_refresh_summary(self):
+        """(ticks, mean, max) seconds of the GUI refresh ticks, or None if there were none"""
+        with self._lock:
+            count = sum(self._ui_refresh[:-2])
+            return (count, self._ui_refresh[-2] / count, self._ui_refresh[-1]) if count else None
+    
+    def observe_file(self, file_item):
+        """Count a finished file and add all of its stage timings"""
+        file_type = file_item.file_type
+        for stage, seconds in file_item.timings.items():
+            self.observe(stage, file_type, seconds)
+        with self._lock:
+            self._files[(file_item.status, file_type)] += 1
+            self._bytes[file_type] += file_item.filesize
+    
+    def _quantile(self, histogram, fraction):
+        """Upper bound of the bucket holding the quantile (exact max for the last bucket)"""
+        rank = fraction * sum(histogram[:-2])
+        seen = 0
+        for bound, count in zip(METRICS_BUCKETS, histogram):
+            seen += count
+            if seen >= rank:
+                return min(bound, histogram[-1])
+        return histogram[-1]
+    
+    def to_dict(self):
+        """{file_type: {stage: {count, total, mean, p50, p95, max}}} for the summary"""
+        with self._lock:
+            histograms = {key: list(value) for key, value in self._histograms.items()}
+        result = {}
+        for (stage, file_type), histogram in sorted(histograms.items()):
+            count = sum(histogram[:-2])
+            result.setdefault(file_type, {})[stage] = {
+                "count": count,
+                "total": round(histogram[-2], 4),
+                "mean": round(histogram[-2] / count, 4),
+                "p50": round(self._quantile(histogram, 0.50), 4),
+                "p95": round(self._quantile(histogram, 0.95), 4),
+                "max": round(histogram[-1], 4),
+            }
+        return result
+    
+    def to_prometheus(self):
+        """Prometheus text exposition format"""
+        with self._lock:
+            histograms = {key: list(value) for key, value in self._histograms.items()}
+            ui_refresh = list(self._ui_refresh)
+            files = dict(self._files)
+            input_bytes = dict(self._bytes)
+        lines = ["# HELP markitdown_stage_seconds Time per file and conversion stage",
+                 "# TYPE markitdown_stage_seconds histogram"]
+        for (stage, file_type), histogram in sorted(histograms.items()):
+            self._prometheus_histogram(lines, "markitdown_stage_seconds",
+                                       f'stage="{stage}",type="{file_type}"', histogram)
+        if sum(ui_refresh[:-2]):
+            lines += ["# HELP markitdown_ui_refresh_seconds Time per GUI refresh tick while converting",
+                      "# TYPE markitdown_ui_refresh_seconds histogram"]
+            self._prometheus_histogram(lines, "markitdown_ui_refresh_seconds", "", ui_refresh)
+        lines += ["# HELP markitdown_files_total Finished files by status and type",
+                  "# TYPE markitdown_files_total counter"]
+        for (status, file_type), count in sorted(files.items()):
+            lines.append(f'markitdown_files_total{{status="{status}",type="{file_type}"}} {count}')
+        lines += ["# HELP markitdown_input_bytes_total Input bytes of finished files by type",
+                  "# TYPE markitdown_input_bytes_total counter"]
+        for file_type, size in sorted(input_bytes.items()):
+            lines.append(f'markitdown_input_bytes_total{{type="{file_type}"}} {size}')
+        return "\n".join(lines) + "\n"
+    
+    @staticmethod
+    def _prometheus_histogram(lines, name, labels, histogram):
+        cumulative = 0
+        for bound, count in zip(METRICS_BUCKETS + (float('inf'),), histogram):
+            cumulative += count
+            le = "+Inf" if bound == float('inf') else f"{bound:g}"
+            lines.append(f'{name}_bucket{{{labels + "," if labels else ""}le="{le}"}} {cumulative}')
+        suffix = f"{{{labels}}}" if labels else ""
+        lines.append(f"{name}_sum{suffix} {histogram[-2]:.6f}")
+        lines.append(f"{name}_count{suffix} {cumulative}")
+    
+    def write_prometheus(self, path):
+        """Write the metrics atomically (for node_exporter's textfile collector)"""
+        write_spool_file(path, self.to_prometheus())
+    
+    def stage_totals(self):
+        """Total seconds per stage over all file types"""
+        totals = Counter()
+        with self._lock:
+            for (stage, _), histogram in self._histograms.items():
+                totals[stage] += histogram[-2]
+        return totals
+
+def start_metrics_server(metrics, port):
+    """Serve metrics.to_prometheus() on http://127.0.0.1:<port>/metrics from a daemon thread"""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] != '/metrics':
+                self.send_error(404)
+                return
+            body = metrics.to_prometheus().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        
+        def log_message(self, format, *args):
+            pass  # Keep stdout/stderr for progress output
+    
+    server = ThreadingHTTPServer(('127.0.0.1', port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name='markitdown-metrics', daemon=True).start()
+    return server
+
+def zip_compression_args(compression_level):
+    """zipfile arguments for a compression level (0 = store only)"""
+    if compression_level <= 0:
+        return {"compression": zipfile.ZIP_STORED}
+    return {"compression": zipfile.ZIP_DEFLATED, "compresslevel": min(9, compression_level)}
+
+class StreamingExporter:
+    """Writes converted files into a ZIP archive or folder as they complete
+
+    add() only queues the file; a writer thread copies the spooled Markdown
+    into the target, so exporting overlaps with conversion. finish() adds the
+    index and summary once the batch is done.
+    """
+
+    def __init__(self, target, as_zip, export_root, preserve_structure=True, create_index=True,
+                 compression_level=DEFAULT_COMPRESSION_LEVEL, metrics=None):
+        self.target = target
+        self.metrics = metrics  # Optional live StageMetrics, gets the "export" timings
+        self.as_zip = as_zip
+        self.export_root = export_root  # Computed once, not per file
+        self.preserve_structure = preserve_structure
+        self.create_index = create_index
+        self.exported = []
+        self.error = None
+        self._zipf = None
+        self._written = {}  # File id -> Markdown file written in a folder export
+
+        if as_zip:
+            os.makedirs(os.path.dirname(os.path.abspath(target)), exist_ok=True)
+            self._zipf = zipfile.ZipFile(target, 'w', **zip_compression_args(compression_level))
+        else:
+            os.makedirs(target, exist_ok=True)
+
+        self._pending = queue.Queue()
+        self._writer = threading.Thread(target=self._write_loop, name='markitdown-export', daemon=True)
+        self._writer.start()
+
+    def add(self, file_item):
+        """Queue a completed file for export"""
+        self._pending.put(file_item)
+
+    def _write_loop(self):
+        while True:
+            file_item = self._pending.get()
+            if file_item is None:
+                break
+            try:
+                started = time.perf_counter()
+                self._write(file_item)
+                file_item.timings["export"] = elapsed = time.perf_counter() - started
+                if self.metrics is not None:
+                    self.metrics.observe("export", file_item.file_type, elapsed)
+                self.exported.append(file_item)
+            except Exception as e:
+                print(f"Export error for {file_item.filename}: {e}")
+                if self.error is None:
+                    self.error = e
+
+    def _write(self, file_item):
+        md_filename = markdown_relpath(file_item, self.export_root, self.preserve_structure)
+
+        if self.as_zip:
+            # write() streams the spool file; both apply the archive's compression level
+            arcname = md_filename.replace(os.sep, '/')
+            spool_path = file_item.spool_path()
+            if spool_path is not None:
+                self._zipf.write(spool_path, arcname)
+            else:
+                self._zipf.writestr(arcname, file_item.markdown_content)
+        else:
+            with file_item.open_markdown() as src:
+                md_filepath = os.path.join(self.target, md_filename)
+                os.makedirs(os.path.dirname(md_filepath), exist_ok=True)
+                primary = file_item.duplicate_of
+                if primary is not None and primary.id in self._written:
+                    link_or_copy(self._written[primary.id], md_filepath)
+                else:
+                    remove_file(md_filepath)
+                    with open(md_filepath, 'wb') as dst:
+                        shutil.copyfileobj(src, dst)
+                self._written[file_item.id] = md_filepath
+        export_profile(file_item, self.export_root, self.preserve_structure,
+                       export_folder=self.target, zipf=self._zipf)
+
+    def finish(self, file_queue):
+        """Wait for pending writes, then add index and summary; returns the number of files exported"""
+        self._pending.put(None)
+        self._writer.join()
+
+        index_content = None
+        if self.create_index:
+            index_content = create_index_content(self.exported, self.export_root, self.preserve_structure)
+        summary_content = create_summary_content(file_queue, self.export_root, self.preserve_structure)
+
+        if self.as_zip:
+            try:
+                if index_content is not None:
+                    self._zipf.writestr("README.md", index_content)
+                self._zipf.writestr(SUMMARY_FILENAME, summary_content)
+            finally:
+                self._zipf.close()
+        else:
+            if index_content is not None:
+                with open(os.path.join(self.target, "README.md"), 'w', encoding='utf-8') as f:
+                    f.write(index_content)
+            with open(os.path.join(self.target, SUMMARY_FILENAME), 'w', encoding='utf-8') as f:
+                f.write(summary_content)
+
+        if self.error is not None:
+            raise self.error
+        return len(self.exported)
+
+def write_zip_export(zip_path, file_queue, preserve_structure=True, create_index=True,
+                     compression_level=DEFAULT_COMPRESSION_LEVEL):
+    """Write all completed files of a queue into a ZIP archive"""
+    exporter = StreamingExporter(zip_path, True, compute_export_root(file_queue), preserve_structure,
+                                 create_index, compression_level)
+    for file_item in file_queue:
+        if file_item.status == "Completed":
+            exporter.add(file_item)
+    return exporter.finish(file_queue)
+
+def write_folder_export(export_folder, file_queue, preserve_structure=True, create_index=True):
+    """Write all completed files of a queue into a folder"""
+    exporter = StreamingExporter(export_folder, False, compute_export_root(file_queue), preserve_structure,
+                                 create_index)
+    for file_item in file_queue:
+        if file_item.status == "Completed":
+            exporter.add(file_item)
+    return exporter.finish(file_queue)
+
+def load_sync_manifest(export_folder):
+    """Read the per-file manifest written by a previous folder export"""
     try:
-        from markitdown import MarkItDown
-        print("✅ MarkItDown is already installed!")
-        return True
-    except ImportError:
-        print("❌ MarkItDown not found.")
+        with open(os.path.join(export_folder, SUMMARY_FILENAME), encoding='utf-8') as f:
+            summary = json.load(f)
+    except (OSError, ValueError):
+        return {"sync": {}, "files": {}}
+
+    files = {}
+    for entry in summary.get("files", []):
+        if entry.get("markdown_path") and entry.get("status") in ("Completed", "Unchanged"):
+            files[entry["original_filepath"]] = entry
+
+    return {"sync": summary.get("sync") or {}, "files": files}
+
+def is_inside(path, folder):
+    """True if path lies below folder"""
+    try:
+        return os.path.commonpath([path, folder]) == folder
+    except ValueError:
+        return False  # Different drives
+
+def plan_incremental_sync(export_folder, file_queue, preserve_structure=True):
+    """Mark queued files whose previous export is still up to date as "Unchanged"
+
+    A file is unchanged if its size and mtime match the manifest, or - when only
+    the mtime changed - if its SHA-256 still matches. Returns the sync plan
+    used by write_incremental_export.
+    """
+    manifest = load_sync_manifest(export_folder)
+    previous = manifest["files"]
+    root = manifest["sync"].get("root")
+
+    # Output paths are only stable if the layout of the export did not change
+    layout_kept = (root is not None
+                   and manifest["sync"].get("preserve_structure") == preserve_structure
+                   and all(is_inside(item.filepath, root) for item in file_queue))
+    if not layout_kept:
+        root = compute_export_root(file_queue)
+
+    unchanged = 0
+    for file_item in file_queue:
+        entry = previous.get(file_item.filepath) if layout_kept else None
+        if entry is None or file_item.status in FAILED_STATUSES:
+            continue
+        if not os.path.exists(os.path.join(export_folder, entry["markdown_path"])):
+            continue
+        if entry.get("original_size") != file_item.filesize:
+            continue
+        if entry.get("mtime_ns") != file_item.mtime_ns:
+            # Touched but possibly not modified - compare content
+            if not entry.get("sha256") or hash_file(file_item.filepath) != entry["sha256"]:
+                continue
+
+        file_item.status = "Unchanged"
+        file_item.content_hash = entry.get("sha256")
+        file_item.markdown_path = entry["markdown_path"]
+        unchanged += 1
+
+    return {"root": root, "layout_kept": layout_kept, "previous": previous,
+            "preserve_structure": preserve_structure, "unchanged": unchanged}
+
+def remove_empty_dirs(path, stop_at):
+    """Remove path and its empty parents up to (not including) stop_at"""
+    while is_inside(path, stop_at) and path != stop_at:
+        try:
+            os.rmdir(path)
+        except OSError:
+            break  # Not empty
+        path = os.path.dirname(path)
+
+def write_incremental_export(export_folder, file_queue, plan, create_index=True):
+    """Update a folder export in place: write new/changed files, drop deleted sources
+
+    Sources from the previous manifest that still exist but are not in the
+    current queue are carried over unchanged. Returns (written, removed).
+    """
+    root = plan["root"]
+    preserve_structure = plan["preserve_structure"]
+    os.makedirs(export_folder, exist_ok=True)
+
+    written = 0
+    for file_item in file_queue:
+        if file_item.status != "Completed":
+            continue
+        file_item.markdown_path = markdown_relpath(file_item, root, preserve_structure).replace(os.sep, '/')
+        md_filepath = os.path.join(export_folder, file_item.markdown_path)
+        os.makedirs(os.path.dirname(md_filepath), exist_ok=True)
+        remove_file(md_filepath)
+        with file_item.open_markdown() as src, open(md_filepath, 'wb') as dst:
+            shutil.copyfileobj(src, dst)
+        export_profile(file_item, root, preserve_structure, export_folder=export_folder)
+        if file_item.content_hash is None:
+            file_item.content_hash = hash_file(file_item.filepath)
+        written += 1
+
+    queued = {item.filepath: item for item in file_queue}
+    live_outputs = {item.markdown_path for item in file_queue if item.status in ("Completed", "Unchanged")}
+    carried = []
+    removed = 0
+    for filepath, entry in plan["previous"].items():
+        if plan["layout_kept"] and filepath not in queued and os.path.exists(filepath):
+            carried.append(FileItem.from_manifest(entry))
+            live_outputs.add(entry["markdown_path"])
+
+    for filepath, entry in plan["previous"].items():
+        if entry["markdown_path"] in live_outputs:
+            continue
+        # Source deleted, failed to convert, or moved within the export
+        md_filepath = os.path.join(export_folder, entry["markdown_path"])
+        try:
+            os.remove(md_filepath)
+            removed += 1
+        except FileNotFoundError:
+            pass
+        remove_empty_dirs(os.path.dirname(md_filepath), export_folder)
+
+    exported_files = [item for item in list(file_queue) + carried if item.status in ("Completed", "Unchanged")]
+    sync_info = {"root": root, "preserve_structure": preserve_structure,
+                 "written": written, "unchanged": len(exported_files) - written, "removed": removed}
+
+    # Index always lists the complete export, not just this run
+    if create_index:
+        with open(os.path.join(export_folder, "README.md"), 'w', encoding='utf-8') as f:
+            f.write(create_index_content(exported_files, root, preserve_structure))
+
+    with open(os.path.join(export_folder, SUMMARY_FILENAME), 'w', encoding='utf-8') as f:
+        f.write(create_summary_content(list(file_queue) + carried, root, preserve_structure, sync_info))
+
+    return written, removed
+
+UiEvent = namedtuple('UiEvent', 'kind file_item data')
+
+class EventBus:
+    """Thread-safe channel from background threads to the Tk main loop
+
+    Engine and loader threads never touch Tk: they publish UiEvents, which
+    the main thread drains in one batch per refresh tick. The consumer
+    coalesces a batch (all status changes become one redraw of the affected
+    rows, only the latest page progress of a file is shown).
+    """
+    STARTED = "started"  # file_item handed to a worker
+    FINISHED = "finished"  # file_item has its final status
+    PAGES = "pages"  # data = (pages done, page count) of a chunked PDF
+    ERROR_PROMPT = "error_prompt"  # data = queue.Queue that receives the user's answer
+    BATCH_DONE = "batch_done"
+    SYNC_PLANNED = "sync_planned"  # data = files an incremental sync leaves unchanged
+    SYNC_DONE = "sync_done"  # data = (written, unchanged, removed)
+    SYNC_FAILED = "sync_failed"  # data = error message
+    LOAD_FAILED = "load_failed"  # MarkItDown could not be loaded
+    
+    def __init__(self):
+        self._events = queue.SimpleQueue()
+    
+    def publish(self, kind, file_item=None, data=None):
+        """Queue an event (any thread)"""
+        self._events.put(UiEvent(kind, file_item, data))
+    
+    def drain(self):
+        """All events published so far, in order (main thread)"""
+        events = []
+        while True:
+            try:
+                events.append(self._events.get_nowait())
+            except queue.Empty:
+                return events
+
+class QueueView:
+    """Virtualized view of the file queue in a ttk.Treeview
+
+    Only the rows that fit into the widget exist in Tk; scrolling re-renders
+    that window. Rows use the FileItem id as item id, status changes are
+    collected with mark_dirty() and
+    applied on the next refresh(), so the cost of a refresh depends on the
+    visible rows, not on the queue length.
+    """
+    
+    columns = ('File', 'Status', 'Size')
+    
+    def __init__(self, parent, file_queue, on_select=None):
+        self.file_queue = file_queue
+        self.on_select = on_select
+        self.offset = 0  # Queue index of the first visible row
+        self.rows = 15  # Visible rows, recomputed on resize
+        self.selected_ids = set()
+        self.selected_id = None  # Focused file last passed to on_select
+        self.visible = {}  # iid -> FileItem of rendered rows
+        self._dirty = set()
+        self._structure_changed = True
         
-        # Ask user in terminal
-        response = input("\nShould MarkItDown be installed automatically? (y/n): ").lower().strip()
+        self.tree = ttk.Treeview(parent, columns=self.columns, show='headings', height=self.rows)
         
-        if response in ['y', 'yes', 'j', 'ja', '']:
-            print("\nInstalling MarkItDown...")
-            try:
-                # Installation with visible output
-                cmd = [sys.executable, "-m", "pip", "install", "--upgrade", "markitdown[all]"]
-                print(f"Running: {' '.join(cmd)}")
-                
-                result = subprocess.run(cmd, check=True, text=True)
-                
-                print("✅ Installation completed!")
-                print("Testing installation...")
-                
-                # Test import
-                from markitdown import MarkItDown
-                print("✅ MarkItDown successfully installed and tested!")
-                return True
-                
-            except subprocess.CalledProcessError as e:
-                print(f"❌ Installation failed: {e}")
-                print("Try manually: pip install 'markitdown[all]'")
-                return False
-            except ImportError:
-                print("❌ Installation was successful, but import fails.")
-                print("Please restart the application.")
-                return False
+        # Column headers
+        self.tree.heading('File', text='Filename')
+        self.tree.heading('Status', text='Status')
+        self.tree.heading('Size', text='Size')
+        
+        # Column widths
+        self.tree.column('File', width=200)
+        self.tree.column('Status', width=80)
+        self.tree.column('Size', width=80)
+        
+        # The scrollbar moves the window over the queue, not over Tk items
+        self.scrollbar = ttk.Scrollbar(parent, orient=tk.VERTICAL, command=self.on_scrollbar)
+        
+        self.tree.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        self.scrollbar.grid(row=0, column=1, sticky=(tk.N, tk.S))
+        
+        self.tree.bind('<<TreeviewSelect>>', self.on_tree_select)
+        self.tree.bind('<Configure>', self.on_resize)
+        self.tree.bind('<MouseWheel>', self.on_mousewheel)
+        self.tree.bind('<Button-4>', lambda event: self.scroll_rows(-3))
+        self.tree.bind('<Button-5>', lambda event: self.scroll_rows(3))
+        self.tree.bind('<Prior>', lambda event: self.scroll_rows(-self.rows))
+        self.tree.bind('<Next>', lambda event: self.scroll_rows(self.rows))
+    
+    def mark_dirty(self, file_item):
+        """Schedule a row update for the next refresh()"""
+        self._dirty.add(file_item.id)
+    
+    def invalidate(self):
+        """Queue content or order changed - re-render on next refresh"""
+        self._structure_changed = True
+    
+    def refresh(self):
+        """Apply pending changes to the widget"""
+        if self._structure_changed:
+            self._structure_changed = False
+            self._dirty.clear()
+            self.render()
+            return
+        
+        if not self._dirty:
+            return
+        dirty, self._dirty = self._dirty, set()
+        for iid, file_item in self.visible.items():
+            if file_item.id in dirty:
+                self.tree.item(iid, values=self.row_values(file_item))
+    
+    def row_values(self, file_item):
+        return (file_item.filename, file_item.status, format_filesize(file_item.filesize))
+    
+    def render(self):
+        """Rebuild the visible window of rows"""
+        total = len(self.file_queue)
+        self.offset = max(0, min(self.offset, total - self.rows))
+        window = [self.file_queue[i] for i in range(self.offset, min(total, self.offset + self.rows))]
+        
+        wanted = [str(file_item.id) for file_item in window]
+        for iid in self.tree.get_children():
+            if iid not in self.visible or iid not in wanted:
+                self.tree.delete(iid)
+        
+        for position, file_item in enumerate(window):
+            iid = str(file_item.id)
+            if self.tree.exists(iid):
+                self.tree.item(iid, values=self.row_values(file_item))
+                self.tree.move(iid, '', position)
+            else:
+                self.tree.insert('', position, iid=iid, values=self.row_values(file_item))
+        
+        self.visible = {str(file_item.id): file_item for file_item in window}
+        selection = [iid for iid in wanted if int(iid) in self.selected_ids]
+        if set(selection) != set(self.tree.selection()):
+            self.tree.selection_set(selection)
+        
+        if total > 0:
+            self.scrollbar.set(self.offset / total, min(1.0, (self.offset + self.rows) / total))
         else:
-            print("❌ Installation cancelled.")
-            print("The app cannot function without MarkItDown.")
-            print("   Install it manually with: pip install 'markitdown[all]'")
-            return False
+            self.scrollbar.set(0.0, 1.0)
+    
+    def scroll_rows(self, delta):
+        """Move the visible window by delta rows"""
+        offset = max(0, min(self.offset + delta, len(self.file_queue) - self.rows))
+        if offset != self.offset:
+            self.offset = offset
+            self.render()
+        return 'break'
+    
+    def on_scrollbar(self, *args):
+        if args[0] == 'moveto':
+            self.offset = int(float(args[1]) * len(self.file_queue))
+            self.render()
+        elif args[0] == 'scroll':
+            step = self.rows if args[2] == 'pages' else 1
+            self.scroll_rows(int(args[1]) * step)
+    
+    def on_mousewheel(self, event):
+        # Windows reports multiples of 120, macOS small deltas
+        delta = event.delta // 120 if abs(event.delta) >= 120 else event.delta
+        return self.scroll_rows(-3 * delta)
+    
+    def on_resize(self, event):
+        row_height = int(ttk.Style().lookup('Treeview', 'rowheight') or 20)
+        rows = max(1, (event.height - 25) // row_height)  # Minus heading
+        if rows != self.rows:
+            self.rows = rows
+            self.tree.configure(height=rows)
+            self.render()
+    
+    def on_tree_select(self, event):
+        """Keep selection by FileItem id so it survives scrolling
 
-class FileItem:
-    """Represents a file in the processing queue"""
-    def __init__(self, filepath):
-        self.filepath = filepath
-        self.filename = os.path.basename(filepath)
-        self.status = "Pending"  # Pending, Processing, Completed, Error
-        self.markdown_content = ""
-        self.error_message = ""
-        self.filesize = os.path.getsize(filepath) if os.path.exists(filepath) else 0
+        <<TreeviewSelect>> also arrives (asynchronously) after render()
+        restores the selection of rows scrolled back into view; on_select is
+        only called when the focused file really changed.
+        """
+        selection = set(self.tree.selection())
+        for iid in self.visible:
+            if iid in selection:
+                self.selected_ids.add(int(iid))
+            else:
+                self.selected_ids.discard(int(iid))
+        file_item = self.focused_item()
+        if file_item is None or file_item.id == self.selected_id:
+            return
+        self.selected_id = file_item.id
+        if self.on_select:
+            self.on_select(event)
+    
+    def focused_item(self):
+        """FileItem of the focused/first selected visible row"""
+        iid = self.tree.focus() or next(iter(self.tree.selection()), None)
+        return self.visible.get(iid)
+    
+    def selected_items(self):
+        """All selected FileItems, including rows scrolled out of view"""
+        return [file_item for file_item in map(self.file_queue.get, self.selected_ids) if file_item is not None]
+
+class PreviewWindow:
+    """Windowed Markdown preview over a stored result file
+
+    Only PREVIEW_WINDOW_BYTES around the current position (cut at line
+    boundaries) are loaded into the Text widget. The scrollbar maps to the
+    byte position in the whole file; scrolling to the edge of the loaded
+    window re-centers it. Line lookups and search stream the file in
+    PREVIEW_SCAN_BLOCK reads, with newline counts per block memoized, so no
+    operation materializes the document.
+    """
+    
+    def __init__(self, parent, **text_options):
+        self.path = None
+        self.size = 0
+        self.start = self.end = 0  # Byte range loaded into the widget
+        self.window = b""
+        self._line_marks = [0]  # Newlines before each PREVIEW_SCAN_BLOCK boundary
+        self._recenter_pending = False
+        self.match_end = None  # Byte offset after the last search hit
+        
+        self.text = tk.Text(parent, state='disabled', yscrollcommand=self.on_yview, **text_options)
+        self.scrollbar = ttk.Scrollbar(parent, orient=tk.VERTICAL, command=self.on_scrollbar)
+        self.text.grid(row=1, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        self.scrollbar.grid(row=1, column=1, sticky=(tk.N, tk.S))
+        self.text.tag_configure('match', background='#ffe066')
+    
+    def show(self, path, keep_position=False):
+        """Preview a file (keep_position: re-read a growing file at the same place)"""
+        top = self.top_offset() if keep_position and path == self.path else 0
+        self.path = path
+        try:
+            self.size = os.path.getsize(path)
+        except OSError:
+            self.size = 0
+        self._line_marks = [0]
+        self.match_end = None
+        if top:
+            self.recenter(top)
+        else:
+            self.load(0, 0)
+    
+    def clear(self):
+        self.path = None
+        self.size = self.start = self.end = 0
+        self.window = b""
+        self._set_text("")
+        self.scrollbar.set(0.0, 1.0)
+    
+    def _read(self, offset, length):
+        try:
+            with open(self.path, 'rb') as f:
+                f.seek(offset)
+                return f.read(length)
+        except (OSError, TypeError):
+            return b""  # Replaced or removed meanwhile
+    
+    def _set_text(self, content):
+        self.text.config(state='normal')
+        self.text.delete('1.0', tk.END)
+        self.text.insert('1.0', content)
+        self.text.config(state='disabled')
+    
+    def line_start(self, offset):
+        """Offset of the start of the line containing offset"""
+        offset = max(0, min(offset, self.size))
+        back = min(offset, PREVIEW_WINDOW_BYTES // 4)
+        newline = self._read(offset - back, back).rfind(b'\n')
+        return offset - back + newline + 1 if newline >= 0 else offset - back
+    
+    def load(self, start, view_offset):
+        """Load the window starting at start and scroll view_offset's line to the top"""
+        data = self._read(start, PREVIEW_WINDOW_BYTES)
+        if start + len(data) < self.size:
+            cut = data.rfind(b'\n')
+            if cut >= 0:
+                data = data[:cut + 1]
+        self.start, self.end, self.window = start, start + len(data), data
+        self._set_text(data.decode('utf-8', errors='replace'))
+        line = data[:max(0, view_offset - start)].count(b'\n') + 1
+        self.text.yview(f"{line}.0")
+    
+    def recenter(self, offset):
+        """Load a window around offset, with offset's line at the top of the view"""
+        offset = self.line_start(offset)
+        self.load(self.line_start(max(0, offset - PREVIEW_WINDOW_BYTES // 2)), offset)
+    
+    def top_offset(self):
+        """File offset of the first visible line"""
+        line = int(self.text.index('@0,0').split('.')[0])
+        newline = -1
+        for _ in range(line - 1):
+            newline = self.window.find(b'\n', newline + 1)
+            if newline < 0:
+                break
+        return self.start + newline + 1
+    
+    def on_yview(self, first, last):
+        """Text scrolled: update the scrollbar in file coordinates, re-center at the edges"""
+        first, last = float(first), float(last)
+        if not self.size:
+            self.scrollbar.set(first, last)
+            return
+        span = self.end - self.start
+        self.scrollbar.set((self.start + first * span) / self.size, (self.start + last * span) / self.size)
+        at_edge = (last >= 1.0 and self.end < self.size) or (first <= 0.0 and self.start > 0)
+        if at_edge and not self._recenter_pending:
+            self._recenter_pending = True
+            self.text.after_idle(self._recenter_view)
+    
+    def _recenter_view(self):
+        self._recenter_pending = False
+        self.recenter(self.top_offset())
+    
+    def on_scrollbar(self, *args):
+        if args[0] == 'moveto' and self.size:
+            self.recenter(int(float(args[1]) * self.size))
+        else:
+            self.text.yview(*args)
+    
+    def _line_mark(self, block):
+        """Newlines before byte block * PREVIEW_SCAN_BLOCK (memoized)"""
+        while len(self._line_marks) <= block:
+            index = len(self._line_marks) - 1
+            data = self._read(index * PREVIEW_SCAN_BLOCK, PREVIEW_SCAN_BLOCK)
+            self._line_marks.append(self._line_marks[-1] + data.count(b'\n'))
+        return self._line_marks[block]
+    
+    def line_of(self, offset):
+        """1-based line number of a file offset"""
+        block = offset // PREVIEW_SCAN_BLOCK
+        head = self._read(block * PREVIEW_SCAN_BLOCK, offset - block * PREVIEW_SCAN_BLOCK)
+        return self._line_mark(block) + head.count(b'\n') + 1
+    
+    def offset_of_line(self, line):
+        """File offset of a 1-based line (the last line if there are fewer)"""
+        target = max(0, line - 1)  # Newlines before the line
+        block, last_block = 0, self.size // PREVIEW_SCAN_BLOCK
+        while block < last_block and self._line_mark(block + 1) <= target:
+            block += 1
+        data = self._read(block * PREVIEW_SCAN_BLOCK, PREVIEW_SCAN_BLOCK)
+        newline = -1
+        for _ in range(target - self._line_mark(block)):
+            found = data.find(b'\n', newline + 1)
+            if found < 0:
+                break
+            newline = found
+        return block * PREVIEW_SCAN_BLOCK + newline + 1
+    
+    def goto_line(self, line):
+        if self.size:
+            self.recenter(self.offset_of_line(line))
+    
+    def find(self, query, start):
+        """Byte range (begin, end) of the next case-insensitive match from start, wrapping around, or None
+
+        Blocks are decoded with surrogateescape, so a UTF-8 sequence cut at a
+        block edge cannot break decoding and text offsets map back to exact
+        byte offsets. The overlap covers matches whose case variant is
+        longer in UTF-8 than the query.
+        """
+        pattern = re.compile(re.escape(query), re.IGNORECASE)
+        overlap = 4 * len(query.encode('utf-8'))
+        for begin, stop in ((start, self.size), (0, min(start + overlap, self.size))):
+            position = begin
+            while position < stop:
+                data = self._read(position, min(PREVIEW_SCAN_BLOCK, stop - position) + overlap)
+                text = data.decode('utf-8', errors='surrogateescape')
+                match = pattern.search(text)
+                if match:
+                    hit = position + len(text[:match.start()].encode('utf-8', errors='surrogateescape'))
+                    if hit < stop:
+                        return hit, hit + len(match.group().encode('utf-8', errors='surrogateescape'))
+                position += PREVIEW_SCAN_BLOCK
+        return None
+    
+    def find_next(self, query):
+        """Scroll to and highlight the next match of query; False if there is none"""
+        if not query or not self.size:
+            return False
+        start = self.match_end if self.match_end is not None else self.top_offset()
+        found = self.find(query, start if start < self.size else 0)
+        if found is None:
+            return False
+        hit, self.match_end = found
+        self.recenter(hit)
+        
+        line_start = self.window.rfind(b'\n', 0, hit - self.start) + 1
+        line = self.window[:line_start].count(b'\n') + 1
+        column = len(self.window[line_start:hit - self.start].decode('utf-8', errors='replace'))
+        length = len(self.window[hit - self.start:self.match_end - self.start].decode('utf-8', errors='replace'))
+        self.text.tag_remove('match', '1.0', tk.END)
+        self.text.tag_add('match', f"{line}.{column}", f"{line}.{column}+{length}c")
+        self.text.see(f"{line}.{column}")
+        return True
 
 class MarkItDownApp:
     """Main application with multi-file support"""
     
-    def __init__(self, root):
+    def __init__(self, root, memory_budget=DEFAULT_MEMORY_BUDGET):
         self.root = root
-        self.file_queue = []  # List of FileItem objects
+        self.cost_model = CostModel(os.path.join(get_app_data_dir(), COST_MODEL_FILENAME))
+        self.file_queue = FileQueue(self.cost_model)
         self.processing = False
-        self.current_processing_index = 0
+        self.engine = None
         
-        # Initialize MarkItDown
-        try:
-            from markitdown import MarkItDown
-            self.markitdown = MarkItDown()
-            self.markitdown_available = True
-        except ImportError:
-            self.markitdown = None
-            self.markitdown_available = False
+        # Background threads publish events, applied to the UI on a fixed tick (see refresh_tick)
+        self.events = EventBus()
+        self.stats_dirty = False
+        self.batch_progress_start = None  # (monotonic time, done cost) for the ETA
+        self.metrics = StageMetrics()  # Stage timings of the current batch
+        self.current_item = None
+        self.shown_current_item = None
+        self.chunk_progress = None  # (file_item, pages done, page count) of a chunked PDF
+        self.shown_chunk_progress = None
         
-        self.setup_ui()
+        # Converted Markdown is spooled to disk, only recent previews stay in RAM.
+        # The spool belongs to the journaled GUI job, so a crash can be resumed.
+        self.journal = open_gui_journal(os.path.join(get_app_data_dir(), JOBS_DIRNAME))
+        self.result_store = ResultStore(spool_dir=self.journal.spool_dir, memory_budget=memory_budget)
+        FileItem.result_store = self.result_store
+        self.sync_folder = None  # Target of a running incremental sync
+        self.sync_outcome = None  # (written, unchanged, removed) of the finished sync
+        self.live_exporter = None  # Writes results while the batch is running
+        self.batch_skip_errors = True  # skip_errors of the running batch
+        self.preview_item = None  # FileItem shown in the preview panel
+        self.preview_partial = False  # Preview shows a chunked PDF that is still converting
+        self.preview_item_ids = []  # Item ids behind the preview selector entries
+        self.folder_scanner = None  # Running background FolderScanner
+        self.shown_scan_found = -1
         
+        # MarkItDown (and every converter it pulls in) is imported on a background
+        # thread, so the window appears without waiting for pdfminer & co.
+        self.markitdown_available = importlib.util.find_spec('markitdown') is not None
+        
+        self.setup_ui()
+        self.root.after(UI_REFRESH_MS, self.refresh_tick)
+        if self.journal.exists():
+            self.root.after(0, self.offer_resume)
+        else:
+            self.file_queue.attach_journal(self.journal, {})
+        if self.markitdown_available:
+            threading.Thread(target=self.load_markitdown, daemon=True).start()
+    
+    def offer_resume(self):
+        """Offer to resume the batch of a session that ended before it was finished"""
+        _, entries = self.journal.load()
+        unfinished = sum(1 for entry in entries.values() if entry.get("status") not in DONE_STATUSES)
+        if unfinished and messagebox.askyesno(
+                "Resume Job",
+                f"The last batch was interrupted with {unfinished} of {len(entries)} files "
+                f"not converted.\n\nResume it? Converted files are kept.", parent=self.root):
+            _, restored = restore_job(self.journal, self.file_queue, self.result_store)
+            self.file_queue.attach_journal(self.journal, {})
+            self.update_file_tree()
+            self.update_queue_stats()
+            self.update_buttons()
+            self.update_preview_selector()
+            self.update_status(f"Resumed job: {restored['Completed']} of {len(self.file_queue)} "
+                               f"files already converted - press Start to continue")
+            return
+        self.journal.delete()
+        self.file_queue.attach_journal(self.journal, {})
+    
+    def close_job(self):
+        """On exit: keep the journal of an unfinished batch, drop a finished one"""
+        if self.processing or any(item.status not in DONE_STATUSES for item in self.file_queue):
+            self.journal.close()
+        else:
+            self.journal.delete()
+        self.journal.release()
+    
+    def load_markitdown(self):
+        """Import MarkItDown (runs in a background thread)
+
+        Conversions create their own MarkItDown per worker; this only reports
+        a broken installation early and leaves the modules imported for the
+        worker threads of this process.
+        """
+        started = time.perf_counter()
+        try:
+            importlib.import_module('markitdown')
+            print(f"✅ MarkItDown imported in {time.perf_counter() - started:.2f}s")
+        except Exception as e:
+            print(f"❌ Could not load MarkItDown: {e}")
+            self.markitdown_available = False
+            self.events.publish(EventBus.LOAD_FAILED)
+    
     def setup_ui(self):
         """Setup user interface"""
         # Window configuration
@@ -218,9 +4234,9 @@ class MarkItDownApp:
                                   command=self.add_files)
         add_files_btn.grid(row=0, column=0, padx=(0, 5))
         
-        add_folder_btn = ttk.Button(queue_controls, text="Add Folder", 
-                                   command=self.add_folder)
-        add_folder_btn.grid(row=0, column=1, padx=(0, 5))
+        self.add_folder_btn = ttk.Button(queue_controls, text="Add Folder", 
+                                        command=self.add_folder)
+        self.add_folder_btn.grid(row=0, column=1, padx=(0, 5))
         
         clear_btn = ttk.Button(queue_controls, text="Clear All", 
                               command=self.clear_queue)
@@ -230,35 +4246,36 @@ class MarkItDownApp:
                                command=self.remove_selected)
         remove_btn.grid(row=0, column=3)
         
+        # Folder scan filters
+        scan_filters = ttk.Frame(queue_frame)
+        scan_filters.pack(fill=tk.X, pady=(0, 10))
+        scan_filters.columnconfigure(1, weight=1)
+        scan_filters.columnconfigure(3, weight=1)
+        
+        ttk.Label(scan_filters, text="Include:").grid(row=0, column=0, sticky=tk.W)
+        self.scan_include = tk.StringVar()
+        ttk.Entry(scan_filters, textvariable=self.scan_include, width=12).grid(
+            row=0, column=1, sticky=(tk.W, tk.E), padx=(5, 10))
+        
+        ttk.Label(scan_filters, text="Exclude:").grid(row=0, column=2, sticky=tk.W)
+        self.scan_exclude = tk.StringVar()
+        ttk.Entry(scan_filters, textvariable=self.scan_exclude, width=12).grid(
+            row=0, column=3, sticky=(tk.W, tk.E), padx=(5, 10))
+        
+        ttk.Label(scan_filters, text="Depth:").grid(row=0, column=4, sticky=tk.W)
+        self.scan_depth = tk.StringVar()
+        ttk.Spinbox(scan_filters, from_=0, to=99, textvariable=self.scan_depth, width=4).grid(
+            row=0, column=5, sticky=tk.W, padx=(5, 0))
+        
         # File list with scrollbar
         list_frame = ttk.Frame(queue_frame)
         list_frame.pack(fill=tk.BOTH, expand=True)
         list_frame.columnconfigure(0, weight=1)
         list_frame.rowconfigure(0, weight=1)
         
-        # Treeview for file list
-        columns = ('File', 'Status', 'Size')
-        self.file_tree = ttk.Treeview(list_frame, columns=columns, show='headings', height=15)
-        
-        # Column headers
-        self.file_tree.heading('File', text='Filename')
-        self.file_tree.heading('Status', text='Status')
-        self.file_tree.heading('Size', text='Size')
-        
-        # Column widths
-        self.file_tree.column('File', width=200)
-        self.file_tree.column('Status', width=80)
-        self.file_tree.column('Size', width=80)
-        
-        # Scrollbar for treeview
-        scrollbar = ttk.Scrollbar(list_frame, orient=tk.VERTICAL, command=self.file_tree.yview)
-        self.file_tree.configure(yscrollcommand=scrollbar.set)
-        
-        self.file_tree.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
-        scrollbar.grid(row=0, column=1, sticky=(tk.N, tk.S))
-        
-        # Bind selection event
-        self.file_tree.bind('<<TreeviewSelect>>', self.on_file_select)
+        # Virtualized treeview for file list (only visible rows exist in Tk)
+        self.file_view = QueueView(list_frame, self.file_queue, on_select=self.on_file_select)
+        self.file_tree = self.file_view.tree
         
         # Queue statistics
         self.queue_stats = ttk.Label(queue_frame, text="Files: 0 | Completed: 0 | Errors: 0", 
@@ -289,6 +4306,58 @@ class MarkItDownApp:
                                      variable=self.create_index)
         index_check.pack(anchor=tk.W)
         
+        self.use_cache = tk.BooleanVar(value=True)
+        cache_check = ttk.Checkbutton(options_frame, text="Reuse cached conversions", 
+                                     variable=self.use_cache)
+        cache_check.pack(anchor=tk.W)
+        
+        # Parallel conversion settings
+        engine_frame = ttk.Frame(options_frame)
+        engine_frame.pack(fill=tk.X, pady=(5, 0))
+        
+        ttk.Label(engine_frame, text="Workers:").grid(row=0, column=0, sticky=tk.W)
+        self.worker_count = tk.IntVar(value=DEFAULT_WORKERS)
+        workers_spin = ttk.Spinbox(engine_frame, from_=1, to=max(64, DEFAULT_WORKERS),
+                                   textvariable=self.worker_count, width=5)
+        workers_spin.grid(row=0, column=1, sticky=tk.W, padx=(5, 0))
+        
+        ttk.Label(engine_frame, text="Engine:").grid(row=1, column=0, sticky=tk.W, pady=(5, 0))
+        self.engine_mode = tk.StringVar(value='auto')
+        engine_combo = ttk.Combobox(engine_frame, textvariable=self.engine_mode,
+                                    values=ENGINE_MODES, state='readonly', width=8)
+        engine_combo.grid(row=1, column=1, sticky=tk.W, padx=(5, 0), pady=(5, 0))
+        
+        # Watchdog limits per file (0 = off); killed files get the "Timeout" status
+        ttk.Label(engine_frame, text="Timeout (s):").grid(row=2, column=0, sticky=tk.W, pady=(5, 0))
+        self.file_timeout = tk.IntVar(value=0)
+        ttk.Spinbox(engine_frame, from_=0, to=86400, increment=30, textvariable=self.file_timeout,
+                    width=7).grid(row=2, column=1, sticky=tk.W, padx=(5, 0), pady=(5, 0))
+        
+        ttk.Label(engine_frame, text="Memory (MB):").grid(row=3, column=0, sticky=tk.W, pady=(5, 0))
+        self.memory_limit = tk.IntVar(value=0)
+        ttk.Spinbox(engine_frame, from_=0, to=1048576, increment=256, textvariable=self.memory_limit,
+                    width=7).grid(row=3, column=1, sticky=tk.W, padx=(5, 0), pady=(5, 0))
+        
+        ttk.Label(engine_frame, text="Order:").grid(row=4, column=0, sticky=tk.W, pady=(5, 0))
+        self.schedule_order = tk.StringVar(value=SCHEDULE_ORDERS[0])
+        ttk.Combobox(engine_frame, textvariable=self.schedule_order, values=SCHEDULE_ORDERS,
+                     state='readonly', width=8).grid(row=4, column=1, sticky=tk.W, padx=(5, 0), pady=(5, 0))
+        
+        ttk.Label(engine_frame, text="Profile:").grid(row=5, column=0, sticky=tk.W, pady=(5, 0))
+        self.profile_mode = tk.StringVar(value=PROFILE_MODES[0])
+        ttk.Combobox(engine_frame, textvariable=self.profile_mode, values=PROFILE_MODES,
+                     state='readonly', width=8).grid(row=5, column=1, sticky=tk.W, padx=(5, 0), pady=(5, 0))
+        
+        ttk.Label(engine_frame, text="Profile above (s):").grid(row=6, column=0, sticky=tk.W, pady=(5, 0))
+        self.profile_threshold = tk.DoubleVar(value=0.0)
+        ttk.Spinbox(engine_frame, from_=0, to=3600, increment=1, textvariable=self.profile_threshold,
+                    width=7).grid(row=6, column=1, sticky=tk.W, padx=(5, 0), pady=(5, 0))
+        
+        ttk.Label(engine_frame, text="PDF chunk (pages):").grid(row=7, column=0, sticky=tk.W, pady=(5, 0))
+        self.pdf_chunk_pages = tk.IntVar(value=0)
+        ttk.Spinbox(engine_frame, from_=0, to=10000, increment=50, textvariable=self.pdf_chunk_pages,
+                    width=7).grid(row=7, column=1, sticky=tk.W, padx=(5, 0), pady=(5, 0))
+        
         # Processing buttons
         process_frame = ttk.Frame(controls_frame)
         process_frame.pack(fill=tk.X, pady=(0, 15))
@@ -313,6 +4382,25 @@ class MarkItDownApp:
                                            command=self.export_folder, state='disabled')
         self.export_folder_btn.pack(fill=tk.X, pady=(0, 5))
         
+        self.sync_folder_btn = ttk.Button(export_frame, text="Sync to Folder (incremental)", 
+                                         command=self.start_incremental_sync, state='disabled')
+        self.sync_folder_btn.pack(fill=tk.X, pady=(0, 5))
+        
+        export_options = ttk.Frame(export_frame)
+        export_options.pack(fill=tk.X, pady=(5, 0))
+        
+        ttk.Label(export_options, text="Live export:").grid(row=0, column=0, sticky=tk.W)
+        self.live_export = tk.StringVar(value=LIVE_EXPORT_MODES[0])
+        live_combo = ttk.Combobox(export_options, textvariable=self.live_export,
+                                  values=LIVE_EXPORT_MODES, state='readonly', width=14)
+        live_combo.grid(row=0, column=1, sticky=tk.W, padx=(5, 0))
+        
+        ttk.Label(export_options, text="ZIP compression:").grid(row=1, column=0, sticky=tk.W, pady=(5, 0))
+        self.zip_compression = tk.StringVar(value="Normal")
+        compression_combo = ttk.Combobox(export_options, textvariable=self.zip_compression,
+                                         values=list(ZIP_COMPRESSION_LEVELS), state='readonly', width=14)
+        compression_combo.grid(row=1, column=1, sticky=tk.W, padx=(5, 0), pady=(5, 0))
+        
         # Current processing info
         current_frame = ttk.LabelFrame(controls_frame, text="Current Processing", padding="10")
         current_frame.pack(fill=tk.X, pady=(0, 15))
@@ -374,19 +4462,34 @@ class MarkItDownApp:
         self.preview_selector.grid(row=0, column=4, padx=(5, 0))
         self.preview_selector.bind('<<ComboboxSelected>>', self.on_preview_select)
         
-        # Preview text area
-        self.preview_text = scrolledtext.ScrolledText(preview_frame, 
-                                                     wrap=tk.WORD, 
-                                                     font=('Monaco', 10) if platform.system() == 'Darwin' else ('Consolas', 9),
-                                                     state='disabled',
-                                                     bg='white',
-                                                     fg='#333333')
-        self.preview_text.grid(row=1, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        # Preview text area (windowed - only the visible part of a result is loaded)
+        self.preview_view = PreviewWindow(preview_frame,
+                                          wrap=tk.WORD,
+                                          font=('Monaco', 10) if platform.system() == 'Darwin' else ('Consolas', 9),
+                                          bg='white',
+                                          fg='#333333')
+        
+        # Search and jump to line
+        find_frame = ttk.Frame(preview_frame)
+        find_frame.grid(row=2, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=(10, 0))
+        find_frame.columnconfigure(1, weight=1)
+        ttk.Label(find_frame, text="Find:").grid(row=0, column=0, sticky=tk.W)
+        self.preview_query = tk.StringVar()
+        find_entry = ttk.Entry(find_frame, textvariable=self.preview_query)
+        find_entry.grid(row=0, column=1, sticky=(tk.W, tk.E), padx=(5, 5))
+        find_entry.bind('<Return>', lambda event: self.find_in_preview())
+        ttk.Button(find_frame, text="Next", command=self.find_in_preview).grid(row=0, column=2)
+        ttk.Label(find_frame, text="Line:").grid(row=0, column=3, sticky=tk.W, padx=(10, 0))
+        self.preview_line = tk.StringVar()
+        line_entry = ttk.Entry(find_frame, textvariable=self.preview_line, width=8)
+        line_entry.grid(row=0, column=4, padx=(5, 5))
+        line_entry.bind('<Return>', lambda event: self.goto_preview_line())
+        ttk.Button(find_frame, text="Go", command=self.goto_preview_line).grid(row=0, column=5)
         
         # Preview stats
         self.preview_stats = ttk.Label(preview_frame, text="Select a file to preview", 
                                       font=('Arial', 9))
-        self.preview_stats.grid(row=2, column=0, sticky=tk.W, pady=(10, 0))
+        self.preview_stats.grid(row=3, column=0, sticky=tk.W, pady=(10, 0))
     
     def add_files(self):
         """Add multiple files to queue"""
@@ -414,9 +4517,8 @@ class MarkItDownApp:
             if filenames:
                 added_count = 0
                 for filename in filenames:
-                    if not any(item.filepath == filename for item in self.file_queue):
-                        file_item = FileItem(filename)
-                        self.file_queue.append(file_item)
+                    if filename not in self.file_queue:
+                        self.file_queue.add(FileItem(filename))
                         added_count += 1
                 
                 self.update_file_tree()
@@ -433,31 +4535,58 @@ class MarkItDownApp:
             messagebox.showerror("Error", "MarkItDown is not available!")
             return
         
+        if self.folder_scanner is not None:
+            # The button doubles as "Cancel Scan" while a scan is running
+            self.folder_scanner.cancel()
+            return
+        
         folder = filedialog.askdirectory(title="Select folder to add files from")
         
         if folder:
-            supported_extensions = {
-                '.pdf', '.docx', '.doc', '.xlsx', '.xls', '.pptx', '.ppt',
-                '.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tiff',
-                '.mp3', '.wav', '.m4a', '.flac',
-                '.html', '.htm', '.csv', '.json', '.xml',
-                '.zip', '.epub', '.txt'
-            }
-            
-            added_count = 0
-            for root, dirs, files in os.walk(folder):
-                for file in files:
-                    if os.path.splitext(file)[1].lower() in supported_extensions:
-                        filepath = os.path.join(root, file)
-                        if not any(item.filepath == filepath for item in self.file_queue):
-                            file_item = FileItem(filepath)
-                            self.file_queue.append(file_item)
-                            added_count += 1
+            depth = self.scan_depth.get().strip()
+            try:
+                max_depth = int(depth) if depth else None
+            except ValueError:
+                messagebox.showerror("Error", f"Invalid folder depth: {depth}")
+                return
             
+            # Scan in the background; refresh_tick shows files as they are found
+            self.folder_scanner = FolderScanner(
+                folder, self.file_queue,
+                include=parse_glob_patterns(self.scan_include.get()),
+                exclude=parse_glob_patterns(self.scan_exclude.get()),
+                max_depth=max_depth)
+            self.folder_scanner.start()
+            self.shown_scan_found = -1
+            self.add_folder_btn.config(text="Cancel Scan")
+            self.update_status(f"Scanning {folder}...")
+    
+    def scanning(self):
+        """True while a background folder scan is running"""
+        return self.folder_scanner is not None and self.folder_scanner.is_alive()
+    
+    def update_scan_progress(self):
+        """Show files found by the background scan (called from refresh_tick)"""
+        scanner = self.folder_scanner
+        finished = not scanner.is_alive()
+        if scanner.found != self.shown_scan_found or finished:
+            self.shown_scan_found = scanner.found
             self.update_file_tree()
             self.update_queue_stats()
             self.update_buttons()
-            self.update_status(f"Added {added_count} files from folder")
+        
+        if not finished:
+            self.update_status(f"Scanning {scanner.folder}... {scanner.found} files found")
+            return
+        
+        self.folder_scanner = None
+        self.add_folder_btn.config(text="Add Folder")
+        if scanner.error:
+            messagebox.showerror("Error", f"Could not scan folder: {scanner.error}")
+        elif scanner.cancelled:
+            self.update_status(f"Scan cancelled - added {scanner.added} files from folder")
+        else:
+            self.update_status(f"Added {scanner.added} files from folder")
     
     def clear_queue(self):
         """Clear all files from queue"""
@@ -468,6 +4597,10 @@ class MarkItDownApp:
         if self.file_queue:
             result = messagebox.askyesno("Confirm", "Clear all files from queue?")
             if result:
+                if self.folder_scanner is not None:
+                    self.folder_scanner.cancel()
+                for item in self.file_queue:
+                    item.release()
                 self.file_queue.clear()
                 self.update_file_tree()
                 self.update_queue_stats()
@@ -482,74 +4615,206 @@ class MarkItDownApp:
             messagebox.showwarning("Warning", "Cannot remove files while processing!")
             return
         
-        selected_items = self.file_tree.selection()
+        selected_items = self.file_view.selected_items()
         if not selected_items:
             messagebox.showinfo("Info", "No files selected!")
             return
         
-        # Get indices of selected items
-        indices_to_remove = []
         for item in selected_items:
-            index = self.file_tree.index(item)
-            indices_to_remove.append(index)
-        
-        # Remove in reverse order to maintain indices
-        for index in sorted(indices_to_remove, reverse=True):
-            if 0 <= index < len(self.file_queue):
-                del self.file_queue[index]
+            item.release()
+        self.file_queue.remove(selected_items)
+        self.file_view.selected_ids.clear()
+        if self.preview_item in selected_items:
+            self.clear_preview()
         
         self.update_file_tree()
         self.update_queue_stats()
         self.update_buttons()
         self.update_preview_selector()
-        self.update_status(f"Removed {len(indices_to_remove)} files")
+        self.update_status(f"Removed {len(selected_items)} files")
     
     def update_file_tree(self):
-        """Update the file tree display"""
-        # Clear existing items
-        for item in self.file_tree.get_children():
-            self.file_tree.delete(item)
-        
-        # Add current queue items
-        for file_item in self.file_queue:
-            self.file_tree.insert('', 'end', values=(
-                file_item.filename,
-                file_item.status,
-                self.format_filesize(file_item.filesize)
-            ))
+        """Update the file tree display after the queue changed"""
+        self.file_view.invalidate()
+        self.file_view.refresh()
+    
+    def refresh_tick(self):
+        """Apply accumulated progress to the UI at a fixed rate while processing"""
+        started = time.perf_counter()
+        self.handle_events(self.events.drain())
+        self.file_view.refresh()
+        
+        if self.stats_dirty:
+            self.stats_dirty = False
+            self.update_queue_stats()
+        
+        if self.folder_scanner is not None:
+            self.update_scan_progress()
+        
+        current_item = self.current_item
+        if current_item is not None and current_item is not self.shown_current_item:
+            self.shown_current_item = current_item
+            self.update_current_processing(current_item)
+        
+        chunk_progress = self.chunk_progress
+        if chunk_progress is not None and chunk_progress is not self.shown_chunk_progress:
+            self.shown_chunk_progress = chunk_progress
+            file_item, pages_done, page_count = chunk_progress
+            self.current_file_label.config(
+                text=f"Processing: {file_item.filename} ({pages_done}/{page_count} pages)")
+            if self.preview_item is file_item and file_item.status == "Processing":
+                self.show_partial_preview(file_item)
+        if self.preview_partial and self.preview_item is not None and self.preview_item.status == "Completed":
+            self.show_preview(self.preview_item)
+        
+        if self.processing:
+            self.metrics.observe_ui_refresh(time.perf_counter() - started)
+        self.root.after(UI_REFRESH_MS, self.refresh_tick)
+    
+    def handle_events(self, events):
+        """Apply a batch of UiEvents from background threads (main thread)"""
+        for event in events:
+            if event.kind == EventBus.STARTED:
+                self.file_view.mark_dirty(event.file_item)
+                self.current_item = event.file_item
+            elif event.kind == EventBus.FINISHED:
+                self.file_view.mark_dirty(event.file_item)
+                self.stats_dirty = True
+            elif event.kind == EventBus.PAGES:
+                self.chunk_progress = (event.file_item,) + event.data
+            elif event.kind == EventBus.ERROR_PROMPT:
+                self.file_view.refresh()
+                response = messagebox.askyesnocancel(
+                    "Processing Error",
+                    f"Error processing {event.file_item.filename}:\n{event.file_item.error_message}"
+                    f"\n\nContinue with next file?")
+                event.data.put(bool(response))
+            elif event.kind == EventBus.SYNC_PLANNED:
+                self.update_file_tree()
+                self.update_status(f"Sync: {event.data} files unchanged")
+            elif event.kind == EventBus.SYNC_DONE:
+                self.sync_outcome = event.data
+            elif event.kind == EventBus.SYNC_FAILED:
+                messagebox.showerror("Sync Error", event.data)
+            elif event.kind == EventBus.BATCH_DONE:
+                self.processing_finished()
+            elif event.kind == EventBus.LOAD_FAILED:
+                self.show_error_message()
     
     def update_queue_stats(self):
         """Update queue statistics display"""
         total = len(self.file_queue)
-        completed = sum(1 for item in self.file_queue if item.status == "Completed")
-        errors = sum(1 for item in self.file_queue if item.status == "Error")
+        completed = self.file_queue.count("Completed")
+        errors = sum(self.file_queue.count(status) for status in FAILED_STATUSES)
         
-        self.queue_stats.config(text=f"Files: {total} | Completed: {completed} | Errors: {errors}")
+        stats = f"Files: {total} | Completed: {completed} | Errors: {errors}"
+        eta = self.estimate_eta()
+        if eta is not None:
+            stats += f" | ETA: {format_duration(eta)}"
+        self.queue_stats.config(text=stats)
         
-        # Update overall progress
-        if total > 0:
-            progress = (completed + errors) / total * 100
-            self.overall_progress.config(value=progress)
-        else:
-            self.overall_progress.config(value=0)
+        # Overall progress is weighted by estimated conversion cost, not file count
+        self.overall_progress.config(value=self.file_queue.progress() * 100)
+    
+    def estimate_eta(self):
+        """Seconds left in the running batch, from the cost converted so far"""
+        if not self.processing or self.batch_progress_start is None:
+            return None
+        started, done_at_start = self.batch_progress_start
+        elapsed = time.monotonic() - started
+        done = self.file_queue.cost(*DONE_STATUSES) - done_at_start
+        if elapsed < 2 or done <= 0:
+            return None
+        remaining = self.file_queue.total_cost - self.file_queue.cost(*DONE_STATUSES)
+        return max(0.0, remaining) * elapsed / done
     
     def update_buttons(self):
         """Update button states based on current state"""
         has_files = len(self.file_queue) > 0
-        has_completed = any(item.status == "Completed" for item in self.file_queue)
+        has_completed = self.file_queue.count("Completed") > 0
         
         if self.processing:
             self.start_btn.config(state='disabled')
             self.stop_btn.config(state='normal')
+            self.sync_folder_btn.config(state='disabled')
         else:
             self.start_btn.config(state='normal' if has_files else 'disabled')
             self.stop_btn.config(state='disabled')
+            self.sync_folder_btn.config(state='normal' if has_files else 'disabled')
         
         # Export buttons
         self.export_zip_btn.config(state='normal' if has_completed else 'disabled')
         self.export_folder_btn.config(state='normal' if has_completed else 'disabled')
     
-    def start_batch_processing(self):
+    def start_incremental_sync(self):
+        """Convert only new/changed files and update an existing export folder"""
+        if not self.file_queue or self.processing:
+            return
+        
+        folder_path = filedialog.askdirectory(title="Select folder to keep in sync")
+        if not folder_path:
+            return
+        
+        # The batch thread decides against the previous manifest which files
+        # need converting (hashing touched files), then writes the export
+        for item in self.file_queue:
+            if item.status != "Completed":
+                item.status = "Pending"
+        self.sync_folder = folder_path
+        self.sync_outcome = None
+        self.start_batch_processing(reset=False, live_export=False)
+    
+    def finish_incremental_sync(self):
+        """Report the outcome of an incremental sync, written by the batch thread"""
+        folder_path, outcome = self.sync_folder, self.sync_outcome
+        self.sync_folder = self.sync_outcome = None
+        if outcome is not None:
+            written, unchanged, removed = outcome
+            self.update_status(f"Synced {folder_path}: {written} updated, "
+                               f"{unchanged} unchanged, {removed} removed")
+    
+    def create_live_exporter(self):
+        """Ask for the live export target; returns a StreamingExporter, None, or False if cancelled"""
+        mode = self.live_export.get()
+        if mode == "Off":
+            return None
+        
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        if mode == "ZIP file":
+            target = filedialog.asksaveasfilename(
+                title="Export ZIP while converting",
+                defaultextension=".zip",
+                initialfile=f"markitdown_export_{timestamp}.zip",
+                filetypes=[('ZIP files', '*.zip'), ('All files', '*.*')]
+            )
+        else:
+            folder_path = filedialog.askdirectory(title="Select export folder")
+            target = os.path.join(folder_path, f"markitdown_export_{timestamp}") if folder_path else ""
+        
+        if not target:
+            return False
+        
+        try:
+            return StreamingExporter(
+                target, mode == "ZIP file", self.get_export_root(),
+                self.preserve_structure.get(), self.create_index.get(),
+                ZIP_COMPRESSION_LEVELS.get(self.zip_compression.get(), DEFAULT_COMPRESSION_LEVEL),
+                metrics=self.metrics)
+        except Exception as e:
+            messagebox.showerror("Export Error", f"Could not create export: {str(e)}")
+            return False
+    
+    def finish_live_export(self):
+        """Complete the export that was written while converting"""
+        exporter, self.live_exporter = self.live_exporter, None
+        try:
+            exported = exporter.finish(self.file_queue)
+        except Exception as e:
+            messagebox.showerror("Export Error", f"Could not complete export: {str(e)}")
+            return
+        self.update_status(f"Exported {exported} files to: {exporter.target}")
+    
+    def start_batch_processing(self, reset=True, live_export=True):
         """Start batch processing of all files in queue"""
         if not self.file_queue:
             messagebox.showinfo("Info", "No files in queue!")
@@ -558,77 +4823,165 @@ class MarkItDownApp:
         if self.processing:
             return
         
+        if live_export:
+            exporter = self.create_live_exporter()
+            if exporter is False:
+                return
+            self.live_exporter = exporter
+        
         self.processing = True
-        self.current_processing_index = 0
         self.update_buttons()
         
-        # Reset all files to pending
-        for item in self.file_queue:
-            if item.status != "Completed":
-                item.status = "Pending"
+        # Reset all files to pending (an incremental sync has already planned its queue)
+        if reset:
+            for item in self.file_queue:
+                if item.status != "Completed":
+                    item.status = "Pending"
         
+        self.batch_progress_start = (time.monotonic(), self.file_queue.cost(*DONE_STATUSES))
+        self.metrics = StageMetrics()
         self.update_file_tree()
         self.update_status("Starting batch processing...")
         
-        # Start processing in thread
-        thread = threading.Thread(target=self.process_queue_thread, daemon=True)
-        thread.start()
-    
-    def process_queue_thread(self):
-        """Process all files in queue (runs in separate thread)"""
-        for i, file_item in enumerate(self.file_queue):
-            if not self.processing:  # Check if stopped
-                break
-            
-            if file_item.status == "Completed":
-                continue  # Skip already completed files
-            
-            self.current_processing_index = i
-            
-            # Update UI in main thread
-            self.root.after(0, lambda: self.update_current_processing(file_item))
-            
+        # Reuse the worker pools unless the settings changed
+        try:
+            workers = max(1, int(self.worker_count.get()))
+        except (tk.TclError, ValueError):
+            workers = DEFAULT_WORKERS
+        mode = self.engine_mode.get()
+        cache_path = os.path.join(get_app_data_dir(), CACHE_FILENAME) if self.use_cache.get() else None
+        try:
+            timeout = max(0, int(self.file_timeout.get())) or None
+            memory_limit = max(0, int(self.memory_limit.get())) * 1024 * 1024 or None
+        except (tk.TclError, ValueError):
+            timeout = memory_limit = None
+        if (self.engine is None or self.engine.workers != workers or self.engine.mode != mode
+                or self.engine.cache_path != cache_path or self.engine.timeout != timeout
+                or self.engine.memory_limit != memory_limit):
+            if self.engine is not None:
+                self.engine.shutdown()
+            self.engine = ConversionEngine(workers=workers, mode=mode, cache_path=cache_path,
+                                           result_store=self.result_store,
+                                           timeout=timeout, memory_limit=memory_limit)
+        
+        # Profiling settings travel with every task, the pools can stay
+        profile_mode = self.profile_mode.get()
+        self.engine.worker_options.profile_mode = None if profile_mode == 'off' else profile_mode
+        try:
+            self.engine.worker_options.profile_threshold = max(0.0, float(self.profile_threshold.get()))
+        except (tk.TclError, ValueError):
+            self.engine.worker_options.profile_threshold = 0.0
+        try:
+            self.engine.pdf_chunk_pages = max(0, int(self.pdf_chunk_pages.get()))
+        except (tk.TclError, ValueError):
+            self.engine.pdf_chunk_pages = 0
+        
+        # Start processing in thread (Tk variables are only read here, in the main thread)
+        self.batch_skip_errors = self.skip_errors.get()
+        sync = None
+        if self.sync_folder:
+            sync = (self.sync_folder, self.preserve_structure.get(), self.create_index.get())
+        thread = threading.Thread(target=self.process_queue_thread,
+                                  args=(schedule_priority(self.schedule_order.get()), sync), daemon=True)
+        thread.start()
+    
+    def process_queue_thread(self, priority, sync=None):
+        """Process all files in queue (runs in separate thread)
+
+        sync, (folder, preserve_structure, create_index) of an incremental
+        sync, makes the thread plan the sync before converting and update the
+        export folder afterwards; both hash and copy files, so they stay off
+        the main thread.
+        """
+        plan = None
+        if sync is not None:
+            folder_path, preserve_structure, create_index = sync
+            try:
+                plan = plan_incremental_sync(folder_path, self.file_queue, preserve_structure)
+            except Exception as e:
+                self.events.publish(EventBus.SYNC_FAILED, data=f"Could not read previous export: {e}")
+                self.events.publish(EventBus.BATCH_DONE)
+                return
+            self.events.publish(EventBus.SYNC_PLANNED, data=plan["unchanged"])
+        
+        # Files found by a running folder scan join the batch as they arrive
+        pending = self.file_queue.open_feed()
+        
+        try:
+            self.engine.run(pending,
+                            on_start=self.on_conversion_start,
+                            on_result=self.on_conversion_result,
+                            should_stop=lambda: not self.processing,
+                            more_items=self.more_pending_items,
+                            priority=priority,
+                            on_progress=self.on_conversion_progress,
+                            bulk_report=self.file_queue.bulk_update)
+        except Exception as e:
+            print(f"Conversion engine error: {e}")
+        finally:
+            self.file_queue.close_feed()
+        
+        if plan is not None:
             try:
-                # Update status
-                file_item.status = "Processing"
-                self.root.after(0, self.update_file_tree)
-                
-                # Convert file
-                print(f"Converting: {file_item.filepath}")
-                result = self.markitdown.convert(file_item.filepath)
-                markdown_content = result.text_content
-                
-                if not markdown_content:
-                    raise Exception("No content extracted")
-                
-                file_item.markdown_content = markdown_content
-                file_item.status = "Completed"
-                print(f"Completed: {file_item.filename}")
-                
+                written, removed = write_incremental_export(folder_path, self.file_queue, plan,
+                                                            create_index=create_index)
+                self.events.publish(EventBus.SYNC_DONE, data=(written, plan["unchanged"], removed))
             except Exception as e:
-                file_item.status = "Error"
-                file_item.error_message = str(e)
-                print(f"Error processing {file_item.filename}: {e}")
-                
-                if not self.skip_errors.get():
-                    # Ask user what to do
-                    response = messagebox.askyesnocancel(
-                        "Processing Error", 
-                        f"Error processing {file_item.filename}:\n{str(e)}\n\nContinue with next file?"
-                    )
-                    if response is None:  # Cancel
-                        self.processing = False
-                        break
-                    elif not response:  # No
-                        self.processing = False
-                        break
-            
-            # Update UI
-            self.root.after(0, self.update_file_tree)
-            self.root.after(0, self.update_queue_stats)
+                self.events.publish(EventBus.SYNC_FAILED, data=f"Could not update export folder: {e}")
         
         # Processing finished
-        self.root.after(0, self.processing_finished)
+        self.events.publish(EventBus.BATCH_DONE)
+    
+    def more_pending_items(self):
+        """Files added while converting; None once no scan can add more"""
+        scanning = self.scanning()
+        added = [item for item in self.file_queue.take_added() if item.status == "Pending"]
+        if added or scanning:
+            return added
+        return None
+    
+    def on_conversion_start(self, file_item):
+        """Called by the engine when a file is handed to a worker"""
+        file_item.status = "Processing"
+        print(f"Converting: {file_item.filepath}")
+        self.events.publish(EventBus.STARTED, file_item)
+    
+    def on_conversion_result(self, file_item, result):
+        """Called by the engine, in completion order, when a file is finished"""
+        if result.cancelled:
+            file_item.status = "Pending"
+            print(f"Cancelled: {file_item.filename}")
+        elif result.error_message:
+            file_item.error_message = result.error_message
+            file_item.status = result.failed_status
+            print(f"Error processing {file_item.filename}: {result.error_message}")
+            
+            if not self.batch_skip_errors and self.processing and file_item.duplicate_of is None:
+                # Ask user what to do - the dialog runs in the main thread, the engine waits.
+                # Duplicates fail with their primary, whose prompt answered for the group.
+                reply = queue.Queue(maxsize=1)
+                self.events.publish(EventBus.ERROR_PROMPT, file_item, reply)
+                if not reply.get():  # No or Cancel
+                    self.processing = False
+        else:
+            file_item.set_result(result)
+            file_item.from_cache = result.cached
+            file_item.content_hash = result.content_hash or file_item.content_hash
+            file_item.status = "Completed"
+            if not result.cached and file_item.duplicate_of is None:
+                self.cost_model.record(file_item.filepath, file_item.filesize, result.duration)
+            print(f"Completed: {file_item.filename}" + (" (cached)" if result.cached else ""))
+        
+        if not result.cancelled:
+            self.metrics.observe_file(file_item)
+            if self.live_exporter is not None:
+                self.live_exporter.add(file_item)
+        
+        self.events.publish(EventBus.FINISHED, file_item)
+    
+    def on_conversion_progress(self, file_item, pages_done, page_count):
+        """Called by the engine when more pages of a chunked PDF are converted"""
+        self.events.publish(EventBus.PAGES, file_item, (pages_done, page_count))
     
     def update_current_processing(self, file_item):
         """Update current processing display"""
@@ -638,17 +4991,38 @@ class MarkItDownApp:
     def processing_finished(self):
         """Called when batch processing is finished"""
         self.processing = False
+        self.current_item = self.shown_current_item = None
+        self.chunk_progress = self.shown_chunk_progress = None
+        self.batch_progress_start = None
+        self.cost_model.save()
+        stage_totals = self.metrics.stage_totals()
+        if stage_totals:
+            print("⏱️ Stage totals: " + ", ".join(
+                f"{stage} {seconds:.2f}s" for stage, seconds in stage_totals.most_common()))
+        ui_refresh = self.metrics.ui_refresh_summary()
+        if ui_refresh:
+            ticks, mean, longest = ui_refresh
+            print(f"⏱️ UI refresh: {ticks} ticks, mean {mean * 1000:.1f} ms, max {longest * 1000:.1f} ms")
+        self.file_view.refresh()
+        self.update_queue_stats()
         self.current_progress.stop()
         self.current_file_label.config(text="Processing completed")
         self.update_buttons()
         self.update_preview_selector()
         
         # Show summary
-        completed = sum(1 for item in self.file_queue if item.status == "Completed")
-        errors = sum(1 for item in self.file_queue if item.status == "Error")
+        completed = self.file_queue.count("Completed")
+        errors = sum(self.file_queue.count(status) for status in FAILED_STATUSES)
         
         self.update_status(f"Batch processing completed: {completed} successful, {errors} errors")
         
+        if self.sync_folder:
+            self.finish_incremental_sync()
+            return
+        
+        if self.live_exporter is not None:
+            self.finish_live_export()
+        
         messagebox.showinfo("Processing Complete", 
                            f"Batch processing finished!\n\n"
                            f"Successfully converted: {completed} files\n"
@@ -660,6 +5034,7 @@ class MarkItDownApp:
         if self.processing:
             result = messagebox.askyesno("Confirm", "Stop batch processing?")
             if result:
+                # The engine kills the conversions that are still running
                 self.processing = False
                 self.update_status("Processing stopped by user")
     
@@ -686,36 +5061,11 @@ class MarkItDownApp:
             return
         
         try:
-            with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-                # Add individual markdown files
-                for file_item in completed_files:
-                    # Create markdown filename
-                    base_name = os.path.splitext(file_item.filename)[0]
-                    md_filename = f"{base_name}.md"
-                    
-                    # Preserve folder structure if enabled
-                    if self.preserve_structure.get():
-                        # Try to preserve relative path structure
-                        try:
-                            common_path = os.path.commonpath([item.filepath for item in self.file_queue])
-                            relative_path = os.path.relpath(file_item.filepath, common_path)
-                            relative_dir = os.path.dirname(relative_path)
-                            if relative_dir:
-                                md_filename = os.path.join(relative_dir, f"{base_name}.md")
-                        except:
-                            pass  # Use simple filename if path calculation fails
-                    
-                    # Add markdown content to ZIP
-                    zipf.writestr(md_filename, file_item.markdown_content)
-                
-                # Create index file if enabled
-                if self.create_index.get():
-                    index_content = self.create_index_content(completed_files)
-                    zipf.writestr("README.md", index_content)
-                
-                # Add conversion summary
-                summary_content = self.create_summary_content()
-                zipf.writestr("conversion_summary.json", summary_content)
+            write_zip_export(zip_path, self.file_queue,
+                             preserve_structure=self.preserve_structure.get(),
+                             create_index=self.create_index.get(),
+                             compression_level=ZIP_COMPRESSION_LEVELS.get(self.zip_compression.get(),
+                                                                          DEFAULT_COMPRESSION_LEVEL))
             
             self.update_status(f"ZIP exported: {os.path.basename(zip_path)}")
             messagebox.showinfo("Export Complete", 
@@ -745,42 +5095,9 @@ class MarkItDownApp:
             export_folder = os.path.join(folder_path, f"markitdown_export_{timestamp}")
             os.makedirs(export_folder, exist_ok=True)
             
-            # Save individual markdown files
-            for file_item in completed_files:
-                base_name = os.path.splitext(file_item.filename)[0]
-                md_filename = f"{base_name}.md"
-                
-                # Preserve folder structure if enabled
-                if self.preserve_structure.get():
-                    try:
-                        common_path = os.path.commonpath([item.filepath for item in self.file_queue])
-                        relative_path = os.path.relpath(file_item.filepath, common_path)
-                        relative_dir = os.path.dirname(relative_path)
-                        if relative_dir:
-                            target_dir = os.path.join(export_folder, relative_dir)
-                            os.makedirs(target_dir, exist_ok=True)
-                            md_filepath = os.path.join(target_dir, f"{base_name}.md")
-                        else:
-                            md_filepath = os.path.join(export_folder, md_filename)
-                    except:
-                        md_filepath = os.path.join(export_folder, md_filename)
-                else:
-                    md_filepath = os.path.join(export_folder, md_filename)
-                
-                # Write markdown file
-                with open(md_filepath, 'w', encoding='utf-8') as f:
-                    f.write(file_item.markdown_content)
-            
-            # Create index file if enabled
-            if self.create_index.get():
-                index_content = self.create_index_content(completed_files)
-                with open(os.path.join(export_folder, "README.md"), 'w', encoding='utf-8') as f:
-                    f.write(index_content)
-            
-            # Create summary file
-            summary_content = self.create_summary_content()
-            with open(os.path.join(export_folder, "conversion_summary.json"), 'w', encoding='utf-8') as f:
-                f.write(summary_content)
+            write_folder_export(export_folder, self.file_queue,
+                                preserve_structure=self.preserve_structure.get(),
+                                create_index=self.create_index.get())
             
             self.update_status(f"Files exported to: {export_folder}")
             messagebox.showinfo("Export Complete", 
@@ -790,94 +5107,47 @@ class MarkItDownApp:
         except Exception as e:
             messagebox.showerror("Export Error", f"Could not export files: {str(e)}")
     
+    def get_export_root(self):
+        """Common directory of the current queue"""
+        root = compute_export_root(self.file_queue)
+        scanner = self.folder_scanner
+        if root and scanner is not None:
+            # Files still to be found by the scan must fit below the export root
+            try:
+                root = os.path.commonpath([root, os.path.abspath(scanner.folder)])
+            except ValueError:
+                pass
+        return root
+    
     def create_index_content(self, completed_files):
         """Create index/README content for export"""
-        content = f"""# MarkItDown Conversion Results
-
-Generated by MarkItDown Desktop v{APP_VERSION}
-Conversion Date: {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
-
-## Converted Files
-
-"""
-        
-        for file_item in completed_files:
-            base_name = os.path.splitext(file_item.filename)[0]
-            md_filename = f"{base_name}.md"
-            file_size = self.format_filesize(file_item.filesize)
-            
-            content += f"- [{file_item.filename}]({md_filename}) ({file_size})\n"
-        
-        content += f"""
-
-## Statistics
-
-- Total files processed: {len(completed_files)}
-- Total original size: {self.format_filesize(sum(item.filesize for item in completed_files))}
-- Processing tool: Microsoft MarkItDown
-- Desktop GUI: MarkItDown Desktop by Rudolf Wagner
-
-## Support the Project
-
-This conversion was made possible by MarkItDown Desktop, created to support a meaningful kindergarten project.
-
-🎁 **Support the Kindergarten Project**: [Donate via PayPal](https://www.paypal.com/donate/?hosted_button_id=PAGH54TWEXP54)
-
-👨‍💻 **Developer**: [Rudolf Wagner on LinkedIn](https://www.linkedin.com/in/rudolfwagner)
-
----
-
-*Generated with ❤️ by MarkItDown Desktop*
-"""
-        
-        return content
+        return create_index_content(completed_files, self.get_export_root(),
+                                    self.preserve_structure.get())
     
     def create_summary_content(self):
         """Create JSON summary of conversion process"""
-        summary = {
-            "conversion_info": {
-                "tool": f"MarkItDown Desktop v{APP_VERSION}",
-                "timestamp": datetime.now().isoformat(),
-                "total_files": len(self.file_queue),
-                "completed_files": len([item for item in self.file_queue if item.status == "Completed"]),
-                "error_files": len([item for item in self.file_queue if item.status == "Error"])
-            },
-            "files": []
-        }
-        
-        for file_item in self.file_queue:
-            file_info = {
-                "original_filename": file_item.filename,
-                "original_filepath": file_item.filepath,
-                "original_size": file_item.filesize,
-                "status": file_item.status,
-                "markdown_size": len(file_item.markdown_content) if file_item.markdown_content else 0
-            }
-            
-            if file_item.status == "Error":
-                file_info["error_message"] = file_item.error_message
-            
-            summary["files"].append(file_info)
-        
-        return json.dumps(summary, indent=2)
+        return create_summary_content(self.file_queue, self.get_export_root(),
+                                      self.preserve_structure.get())
     
     def on_file_select(self, event):
         """Handle file selection in tree"""
-        selected_items = self.file_tree.selection()
-        if selected_items:
-            index = self.file_tree.index(selected_items[0])
-            if 0 <= index < len(self.file_queue):
-                file_item = self.file_queue[index]
-                if file_item.status == "Completed":
-                    self.show_preview(file_item)
-                else:
-                    self.clear_preview()
+        file_item = self.file_view.focused_item()
+        if file_item is not None:
+            if file_item.status == "Completed":
+                self.show_preview(file_item)
+            elif (file_item.status == "Processing"
+                  and os.path.exists(self.result_store.partial_path_for(file_item.id))):
+                self.show_partial_preview(file_item)
+            else:
+                self.clear_preview()
     
     def update_preview_selector(self):
         """Update the preview file selector"""
         completed_files = [item for item in self.file_queue if item.status == "Completed"]
         filenames = [item.filename for item in completed_files]
         
+        # Filenames are not unique - map combobox positions to item ids
+        self.preview_item_ids = [item.id for item in completed_files]
         self.preview_selector['values'] = filenames
         if filenames:
             self.preview_selector.set(filenames[0])
@@ -888,37 +5158,55 @@ This conversion was made possible by MarkItDown Desktop, created to support a me
     
     def on_preview_select(self, event):
         """Handle preview file selection"""
-        selected_filename = self.preview_selector.get()
-        if selected_filename:
-            file_item = next((item for item in self.file_queue 
-                            if item.filename == selected_filename and item.status == "Completed"), None)
-            if file_item:
+        index = self.preview_selector.current()
+        if 0 <= index < len(self.preview_item_ids):
+            file_item = self.file_queue.get(self.preview_item_ids[index])
+            if file_item is not None and file_item.status == "Completed":
                 self.show_preview(file_item)
     
     def show_preview(self, file_item):
         """Show markdown preview for a file"""
-        self.preview_text.config(state='normal')
-        self.preview_text.delete(1.0, tk.END)
-        self.preview_text.insert(1.0, file_item.markdown_content)
-        self.preview_text.config(state='disabled')
-        
-        # Update stats
-        lines = len(file_item.markdown_content.split('\n'))
-        words = len(file_item.markdown_content.split())
-        chars = len(file_item.markdown_content)
+        if not self.result_store.contains(file_item.id):
+            self.clear_preview()
+            return
+        self.preview_item = file_item
+        self.preview_partial = False
+        self.preview_view.show(self.result_store.path_for(file_item.id))
         
-        self.preview_stats.config(text=f"{file_item.filename}: {lines} lines, {words} words, {chars} characters")
+        # Stats were counted when the file was converted
+        stats = [f"{file_item.markdown_size:,} characters"]
+        if file_item.word_count is not None:
+            stats.insert(0, f"{file_item.word_count:,} words")
+        if file_item.line_count is not None:
+            stats.insert(0, f"{file_item.line_count:,} lines")
+        self.preview_stats.config(text=f"{file_item.filename}: " + ", ".join(stats))
         
         # Enable preview buttons
         self.copy_btn.config(state='normal')
         self.save_btn.config(state='normal')
         self.preview_btn.config(state='normal')
     
+    def show_partial_preview(self, file_item):
+        """Show the pages converted so far of a chunked PDF (read-only, no export buttons)"""
+        partial_path = self.result_store.partial_path_for(file_item.id)
+        if not os.path.exists(partial_path):
+            return  # Finished (or failed) in the meantime
+        self.preview_view.show(partial_path, keep_position=self.preview_item is file_item)
+        self.preview_item = file_item
+        self.preview_partial = True
+        
+        progress = self.chunk_progress
+        pages = f"{progress[1]}/{progress[2]} pages" if progress and progress[0] is file_item else "first pages"
+        self.preview_stats.config(text=f"{file_item.filename}: converting - {pages} so far")
+        self.copy_btn.config(state='disabled')
+        self.save_btn.config(state='disabled')
+        self.preview_btn.config(state='disabled')
+    
     def clear_preview(self):
         """Clear preview area"""
-        self.preview_text.config(state='normal')
-        self.preview_text.delete(1.0, tk.END)
-        self.preview_text.config(state='disabled')
+        self.preview_item = None
+        self.preview_partial = False
+        self.preview_view.clear()
         
         self.preview_stats.config(text="Select a completed file to preview")
         
@@ -927,50 +5215,56 @@ This conversion was made possible by MarkItDown Desktop, created to support a me
         self.save_btn.config(state='disabled')
         self.preview_btn.config(state='disabled')
     
+    def find_in_preview(self):
+        """Jump to the next match of the search text in the previewed file"""
+        query = self.preview_query.get()
+        if self.preview_item is not None and query and not self.preview_view.find_next(query):
+            self.update_status(f"'{query}' not found in {self.preview_item.filename}")
+    
+    def goto_preview_line(self):
+        """Scroll the preview to the entered line number"""
+        try:
+            line = int(self.preview_line.get())
+        except ValueError:
+            return
+        if self.preview_item is not None:
+            self.preview_view.goto_line(line)
+    
     def copy_current(self):
         """Copy current preview to clipboard"""
-        selected_filename = self.preview_selector.get()
-        if selected_filename:
-            file_item = next((item for item in self.file_queue 
-                            if item.filename == selected_filename and item.status == "Completed"), None)
-            if file_item:
-                self.root.clipboard_clear()
-                self.root.clipboard_append(file_item.markdown_content)
-                self.update_status(f"Copied {file_item.filename} to clipboard")
+        file_item = self.preview_item
+        if file_item is not None:
+            self.root.clipboard_clear()
+            self.root.clipboard_append(file_item.markdown_content)
+            self.update_status(f"Copied {file_item.filename} to clipboard")
     
     def save_current(self):
         """Save current preview as file"""
-        selected_filename = self.preview_selector.get()
-        if selected_filename:
-            file_item = next((item for item in self.file_queue 
-                            if item.filename == selected_filename and item.status == "Completed"), None)
-            if file_item:
-                base_name = os.path.splitext(file_item.filename)[0]
-                default_name = f"{base_name}.md"
-                
-                filename = filedialog.asksaveasfilename(
-                    title="Save Markdown File",
-                    defaultextension=".md",
-                    initialvalue=default_name,
-                    filetypes=[('Markdown Files', '*.md'), ('Text Files', '*.txt'), ('All Files', '*.*')]
-                )
-                
-                if filename:
-                    try:
-                        with open(filename, 'w', encoding='utf-8') as f:
-                            f.write(file_item.markdown_content)
-                        self.update_status(f"Saved {os.path.basename(filename)}")
-                    except Exception as e:
-                        messagebox.showerror("Save Error", f"Could not save file: {str(e)}")
+        file_item = self.preview_item
+        if file_item is not None:
+            base_name = os.path.splitext(file_item.filename)[0]
+            default_name = f"{base_name}.md"
+            
+            filename = filedialog.asksaveasfilename(
+                title="Save Markdown File",
+                defaultextension=".md",
+                initialvalue=default_name,
+                filetypes=[('Markdown Files', '*.md'), ('Text Files', '*.txt'), ('All Files', '*.*')]
+            )
+            
+            if filename:
+                try:
+                    with file_item.open_markdown() as src, open(filename, 'wb') as dst:
+                        shutil.copyfileobj(src, dst)
+                    self.update_status(f"Saved {os.path.basename(filename)}")
+                except Exception as e:
+                    messagebox.showerror("Save Error", f"Could not save file: {str(e)}")
     
     def preview_current(self):
         """Open HTML preview of current file"""
-        selected_filename = self.preview_selector.get()
-        if selected_filename:
-            file_item = next((item for item in self.file_queue 
-                            if item.filename == selected_filename and item.status == "Completed"), None)
-            if file_item:
-                self.open_html_preview(file_item.markdown_content, file_item.filename)
+        file_item = self.preview_item
+        if file_item is not None:
+            self.open_html_preview(file_item.markdown_content, file_item.filename)
     
     def open_html_preview(self, markdown_content, filename):
         """Open HTML preview in browser"""
@@ -1115,6 +5409,14 @@ PROCESSING OPTIONS:
 • Preserve Folder Structure: Maintain original directory layout
 • Skip Errors: Continue processing even if some files fail
 • Create Index: Generate README.md with file listing
+• Sync to Folder: Only new or modified files are converted; outputs of
+  deleted source files are removed and the index is rewritten
+• Reuse Cached Conversions: Unchanged files are taken from the on-disk cache
+• Live Export: Write the ZIP/folder while files are converted
+• ZIP Compression: Store (fastest) to Best (smallest)
+• Workers: Number of files converted in parallel (default: CPU cores)
+• Engine: auto (processes for PDF/Office, threads for text formats),
+  process, thread or serial
 
 DEVELOPED BY:
 Rudolf Wagner
@@ -1167,18 +5469,1215 @@ github.com/microsoft/markitdown
     
     def format_filesize(self, size_bytes):
         """Format file size in human readable format"""
-        if size_bytes == 0:
-            return "0 B"
-        size_names = ["B", "KB", "MB", "GB"]
-        i = 0
-        while size_bytes >= 1024 and i < len(size_names)-1:
-            size_bytes /= 1024
-            i += 1
-        return f"{size_bytes:.1f} {size_names[i]}"
+        return format_filesize(size_bytes)
+
+
+# Headless batch mode (no display server required)
+
+def expand_input_paths(inputs, include=None, exclude=None, max_depth=None):
+    """Expand CLI inputs (files, folders, glob patterns) into unique file paths"""
+    seen = set()
+    filepaths = []
+
+    for pattern in inputs:
+        if any(char in pattern for char in '*?['):
+            matches = sorted(glob.glob(pattern, recursive=True))
+        else:
+            matches = [pattern]
+
+        for path in matches:
+            if os.path.isdir(path):
+                candidates = iter_supported_files(path, include, exclude, max_depth)
+            elif os.path.isfile(path):
+                candidates = [path]
+            else:
+                print(f"Warning: input not found: {path}", file=sys.stderr)
+                continue
+
+            for filepath in candidates:
+                filepath = os.path.abspath(filepath)
+                if filepath not in seen:
+                    seen.add(filepath)
+                    filepaths.append(filepath)
+
+    return filepaths
+
+class HeadlessRunner:
+    """Runs the MarkItDownApp batch pipeline without Tk
+
+    Progress is printed to stdout as one JSON object per line, human-readable
+    messages go to stderr.
+    """
+
+    def __init__(self, args):
+        self.args = args
+        self.cost_model = CostModel(os.path.join(args.cache_dir or get_app_data_dir(), COST_MODEL_FILENAME))
+        self.file_queue = FileQueue(self.cost_model)
+        self.processing = False
+        self.completed = 0
+        self.errors = 0
+        self.duplicates = 0  # Files that got the result of an identical file
+        self.start_time = None
+        self.sync_plan = None
+        self.exporter = None  # Streaming export (everything except --incremental)
+        self.metrics = StageMetrics()
+        self.metrics_written = 0.0
+        self.metrics_server = None
+        cache_path = None
+        if args.cache:
+            cache_path = os.path.join(args.cache_dir or get_app_data_dir(), CACHE_FILENAME)
+        self.journal = JobJournal(args.job) if args.job else None
+        self.result_store = ResultStore(spool_dir=self.journal.spool_dir if self.journal else None,
+                                        memory_budget=args.memory_budget * 1024 * 1024)
+        FileItem.result_store = self.result_store
+        self.engine = ConversionEngine(workers=args.workers, mode=args.engine, cache_path=cache_path,
+                                       cache_max_bytes=args.cache_size * 1024 * 1024,
+                                       result_store=self.result_store, timeout=args.timeout,
+                                       memory_limit=(args.memory_limit or 0) * 1024 * 1024,
+                                       profile_mode=None if args.profile == 'off' else args.profile,
+                                       profile_threshold=args.profile_threshold,
+                                       pdf_chunk_pages=args.pdf_chunk_pages,
+                                       max_tasks_per_worker=args.worker_max_tasks,
+                                       recycle_memory=(args.worker_recycle_memory or 0) * 1024 * 1024,
+                                       batch_bytes=args.batch_kb * 1024, preflight=args.preflight,
+                                       deduplicate=args.dedupe)
+
+    def emit(self, event, **fields):
+        """Print one machine-readable progress record"""
+        record = {"event": event}
+        record.update(fields)
+        print(json.dumps(record, ensure_ascii=False), flush=True)
+
+    def run(self):
+        """Convert and export; returns the process exit code"""
+        if self.journal is not None and not self.journal.acquire():
+            print(f"❌ Job folder is in use by another process: {self.args.job}", file=sys.stderr)
+            return 1
+        if self.journal is not None and self.journal.exists():
+            _, restored = restore_job(self.journal, self.file_queue, self.result_store)
+            self.completed = restored["Completed"]
+            self.emit("resumed", job=os.path.abspath(self.args.job), files=sum(restored.values()),
+                      completed=restored["Completed"], pending=restored["Pending"])
+        for filepath in expand_input_paths(self.args.inputs, self.args.include,
+                                           self.args.exclude, self.args.max_depth):
+            self.file_queue.add(FileItem(filepath))
+        if not self.file_queue:
+            print("❌ No supported input files found.", file=sys.stderr)
+            return 1
+        if self.journal is not None:
+            self.file_queue.attach_journal(self.journal, job_settings(self.args))
+
+        self.emit("queued", total=len(self.file_queue),
+                  total_size=sum(item.filesize for item in self.file_queue))
+
+        if self.args.incremental:
+            if self.args.zip or self.args.output.lower().endswith('.zip'):
+                print("❌ --incremental requires a folder as --output.", file=sys.stderr)
+                return 1
+            self.sync_plan = plan_incremental_sync(self.args.output, self.file_queue,
+                                                   self.args.preserve_structure)
+            self.emit("sync_plan", unchanged=self.sync_plan["unchanged"],
+                      to_convert=len(self.file_queue) - self.sync_plan["unchanged"])
+
+        if self.sync_plan is None:
+            try:
+                self.exporter = StreamingExporter(
+                    self.args.output, self.args.zip or self.args.output.lower().endswith('.zip'),
+                    compute_export_root(self.file_queue), self.args.preserve_structure,
+                    self.args.create_index, self.args.compression_level, metrics=self.metrics)
+            except OSError as e:
+                print(f"❌ Cannot write export: {e}", file=sys.stderr)
+                return 1
+            for file_item in self.file_queue:
+                if file_item.status == "Completed":  # Restored from the job journal
+                    self.exporter.add(file_item)
+
+        if self.args.metrics_port:
+            try:
+                self.metrics_server = start_metrics_server(self.metrics, self.args.metrics_port)
+                print(f"📈 Metrics on http://127.0.0.1:{self.args.metrics_port}/metrics", file=sys.stderr)
+            except OSError as e:
+                print(f"⚠️ Cannot serve metrics on port {self.args.metrics_port}: {e}", file=sys.stderr)
+        
+        self.processing = True
+        self.start_time = time.time()
+        try:
+            self.engine.run([item for item in self.file_queue if item.status == "Pending"],
+                            on_start=self.on_conversion_start,
+                            on_result=self.on_conversion_result,
+                            should_stop=lambda: not self.processing,
+                            priority=schedule_priority(self.args.schedule),
+                            on_progress=self.on_conversion_progress,
+                            bulk_report=self.file_queue.bulk_update)
+        except KeyboardInterrupt:
+            self.processing = False
+            print("\n👋 Batch interrupted", file=sys.stderr)
+        finally:
+            self.engine.shutdown()
+            self.cost_model.save()
+
+        try:
+            exported = self.export()
+        finally:
+            self.result_store.cleanup()
+            if self.journal is not None:
+                self.journal.close()
+                self.journal.release()
+            self.write_metrics(force=True)
+            if self.metrics_server is not None:
+                self.metrics_server.shutdown()
+        self.emit("finished", total=len(self.file_queue), completed=self.completed,
+                  errors=self.errors, exported=exported, duplicates=self.duplicates,
+                  workers_recycled=self.engine.recycled_workers(), elapsed=round(time.time() - self.start_time, 3))
+
+        return 0 if self.errors == 0 else 2
+
+    def on_conversion_start(self, file_item):
+        """Called by the engine when a file is handed to a worker"""
+        file_item.status = "Processing"
+        self.emit("start", file=file_item.filepath)
 
+    def on_conversion_progress(self, file_item, pages_done, page_count):
+        """Called by the engine when more pages of a chunked PDF are converted"""
+        self.emit("pages", file=file_item.filepath, done=pages_done, total=page_count)
 
-def main():
+    def on_conversion_result(self, file_item, result):
+        """Called by the engine, in completion order, when a file is finished"""
+        if result.cancelled:
+            file_item.status = "Pending"
+        elif result.error_message:
+            file_item.error_message = result.error_message
+            file_item.status = result.failed_status
+            self.errors += 1
+            if not self.args.skip_errors:
+                self.processing = False  # Stop at the first error
+        else:
+            file_item.set_result(result)
+            file_item.from_cache = result.cached
+            file_item.content_hash = result.content_hash or file_item.content_hash
+            file_item.status = "Completed"
+            if not result.cached and file_item.duplicate_of is None:
+                self.cost_model.record(file_item.filepath, file_item.filesize, result.duration)
+            self.completed += 1
+            if self.exporter is not None:
+                self.exporter.add(file_item)
+
+        if not result.cancelled:
+            if file_item.duplicate_of is not None:
+                self.duplicates += 1
+            self.metrics.observe_file(file_item)
+            self.write_metrics()
+        
+        self.emit("result", file=file_item.filepath, status=file_item.status,
+                  error=file_item.error_message or None, cached=result.cached,
+                  duplicate_of=file_item.duplicate_of.filepath if file_item.duplicate_of else None,
+                  completed=self.completed, errors=self.errors, total=len(self.file_queue),
+                  progress=round(self.file_queue.progress(), 4),
+                  elapsed=round(time.time() - self.start_time, 3))
+
+    def write_metrics(self, force=False):
+        """Rewrite --metrics-file (at most every METRICS_WRITE_SECONDS unless forced)"""
+        if not self.args.metrics_file:
+            return
+        now = time.monotonic()
+        if not force and now - self.metrics_written < METRICS_WRITE_SECONDS:
+            return
+        self.metrics_written = now
+        try:
+            self.metrics.write_prometheus(self.args.metrics_file)
+        except OSError as e:
+            print(f"⚠️ Cannot write metrics file: {e}", file=sys.stderr)
+    
+    def export(self):
+        """Export completed files to the requested ZIP file or folder"""
+        output = self.args.output
+        try:
+            if self.sync_plan is not None:
+                written, removed = write_incremental_export(output, self.file_queue, self.sync_plan,
+                                                            create_index=self.args.create_index)
+                self.emit("exported", output=os.path.abspath(output), files=written,
+                          unchanged=self.sync_plan["unchanged"], removed=removed)
+                return written
+            exported = self.exporter.finish(self.file_queue)
+        except Exception as e:
+            print(f"❌ Export failed: {e}", file=sys.stderr)
+            self.emit("export_error", output=output, error=str(e))
+            self.errors += 1
+            return 0
+
+        self.emit("exported", output=os.path.abspath(output), files=exported)
+        return exported
+
+class HttpError(Exception):
+    """Request that is answered with an HTTP error status"""
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+class HttpRequest:
+    """One request read by ConversionService; the body is streamed with iter_body()"""
+
+    def __init__(self, method, target, headers, reader, writer):
+        from urllib.parse import parse_qsl, urlsplit
+        parts = urlsplit(target)
+        self.method = method
+        self.path = parts.path
+        self.query = dict(parse_qsl(parts.query))
+        self.headers = headers  # Lower-case names
+        self.reader = reader
+        self.writer = writer
+        self.chunked = headers.get('transfer-encoding', '').lower() == 'chunked'
+        try:
+            self.content_length = int(headers.get('content-length', 0))
+        except ValueError:
+            raise HttpError(400, "Invalid Content-Length")
+        self.body_consumed = not (self.chunked or self.content_length)
+
+    @property
+    def keep_alive(self):
+        return self.headers.get('connection', '').lower() != 'close'
+
+    async def iter_body(self, limit):
+        """Body blocks (Content-Length or chunked); HttpError 413 beyond limit bytes"""
+        if self.body_consumed:
+            return
+        if self.headers.get('expect', '').lower() == '100-continue':
+            self.writer.write(b"HTTP/1.1 100 Continue\r\n\r\n")
+        if not self.chunked and self.content_length > limit:
+            raise HttpError(413, f"Upload larger than {limit} bytes")
+        total = 0
+        while True:
+            if self.chunked:
+                try:
+                    remaining = int((await self.reader.readline()).split(b';')[0].strip(), 16)
+                except ValueError:
+                    raise HttpError(400, "Invalid chunked encoding")
+                if remaining == 0:
+                    while (await self.reader.readline()) not in (b"\r\n", b"\n", b""):
+                        pass  # Trailers
+                    break
+            else:
+                remaining = self.content_length
+            total += remaining
+            if total > limit:
+                raise HttpError(413, f"Upload larger than {limit} bytes")
+            while remaining:
+                block = await self.reader.read(min(remaining, SERVICE_IO_CHUNK))
+                if not block:
+                    raise ConnectionError("Client closed the connection during the upload")
+                remaining -= len(block)
+                yield block
+            if not self.chunked:
+                break
+            await self.reader.readline()  # CRLF after the chunk
+        self.body_consumed = True
+
+class ConversionService:
+    """Local HTTP API over the conversion pipeline (--serve)
+
+    A single asyncio event loop serves all connections (keep-alive, streamed
+    uploads and downloads), so hundreds of clients cost no threads. Uploads
+    are fed to one ConversionEngine run through the FileQueue feed, like the
+    GUI's background folder scan. More than max_queue unfinished jobs are
+    refused with 503 and Retry-After instead of queueing without bound.
+
+      POST   /jobs?filename=NAME   upload a file (raw body) -> 202 {"id": ...}
+      GET    /jobs                 queue counts
+      GET    /jobs/ID[?wait=S]     job status, optionally waiting for the result
+      GET    /jobs/ID/result       converted Markdown
+      DELETE /jobs/ID              drop a finished job
+      GET    /batch.zip?ids=1,2    ZIP export of completed jobs (default: all)
+      GET    /health, /metrics     liveness, Prometheus metrics
+    """
+
+    def __init__(self, args):
+        self.args = args
+        self.cost_model = CostModel(os.path.join(args.cache_dir or get_app_data_dir(), COST_MODEL_FILENAME))
+        self.file_queue = FileQueue(self.cost_model)
+        self.result_store = ResultStore(memory_budget=args.memory_budget * 1024 * 1024)
+        FileItem.result_store = self.result_store
+        self.upload_dir = tempfile.mkdtemp(prefix="markitdown_uploads_")
+        self.metrics = StageMetrics()
+        cache_path = None
+        if args.cache:
+            cache_path = os.path.join(args.cache_dir or get_app_data_dir(), CACHE_FILENAME)
+        self.engine = ConversionEngine(workers=args.workers, mode=args.engine, cache_path=cache_path,
+                                       cache_max_bytes=args.cache_size * 1024 * 1024,
+                                       result_store=self.result_store, timeout=args.timeout,
+                                       memory_limit=(args.memory_limit or 0) * 1024 * 1024,
+                                       pdf_chunk_pages=args.pdf_chunk_pages,
+                                       max_tasks_per_worker=args.worker_max_tasks,
+                                       recycle_memory=(args.worker_recycle_memory or 0) * 1024 * 1024,
+                                       batch_bytes=args.batch_kb * 1024, preflight=args.preflight,
+                                       deduplicate=args.dedupe)
+        self.max_queue = args.max_queue or self.engine.workers * 16
+        self.max_upload = args.max_upload * 1024 * 1024
+        self.finished_at = {}  # Job id -> time.monotonic() of its result
+        self.waiters = {}  # Job id -> futures of ?wait= requests (event loop only)
+        self.loop = None
+        self.stopping = False
+        self.engine_thread = None
+
+    async def serve(self):
+        """Listen until cancelled (Ctrl+C, or SIGTERM where supported)"""
+        import asyncio
+        import signal
+        self.loop = asyncio.get_running_loop()
+        try:
+            self.loop.add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+        except (NotImplementedError, AttributeError):
+            pass  # Windows event loops have no signal handlers
+        server = await asyncio.start_server(self.handle_connection, self.args.host, self.args.port)
+        self.engine.prestart()  # Warm workers before the first upload
+        self.engine_thread = threading.Thread(target=self.run_engine, name='markitdown-engine', daemon=True)
+        self.engine_thread.start()
+        print(f"🌐 Conversion service on http://{self.args.host}:{self.args.port}/ "
+              f"({self.engine.workers} workers, up to {self.max_queue} queued jobs)", file=sys.stderr)
+        async with server:
+            while True:
+                await asyncio.sleep(60)
+                self.purge_finished()
+
+    def close(self):
+        """Stop the engine and remove uploads and results"""
+        self.stopping = True
+        if self.engine_thread is not None:
+            self.engine_thread.join(timeout=10)
+        self.engine.shutdown()
+        self.cost_model.save()
+        self.result_store.cleanup()
+        shutil.rmtree(self.upload_dir, ignore_errors=True)
+
+    # Conversion (engine thread)
+
+    def run_engine(self):
+        pending = self.file_queue.open_feed()
+        try:
+            self.engine.run(pending, on_start=self.on_conversion_start, on_result=self.on_conversion_result,
+                            should_stop=lambda: self.stopping, more_items=self.more_items,
+                            priority=schedule_priority(self.args.schedule),
+                            bulk_report=self.file_queue.bulk_update)
+        finally:
+            self.file_queue.close_feed()
+
+    def more_items(self):
+        """Uploads since the last poll, None once the service stops"""
+        if self.stopping:
+            return None
+        return self.file_queue.take_added()
+
+    def on_conversion_start(self, file_item):
+        file_item.status = "Processing"
+
+    def on_conversion_result(self, file_item, result):
+        if result.cancelled:
+            file_item.status = "Pending"
+            return
+        if result.error_message:
+            file_item.error_message = result.error_message
+            file_item.status = result.failed_status
+        else:
+            file_item.set_result(result)
+            file_item.from_cache = result.cached
+            file_item.content_hash = result.content_hash or file_item.content_hash
+            file_item.status = "Completed"
+            if not result.cached and file_item.duplicate_of is None:
+                self.cost_model.record(file_item.filepath, file_item.filesize, result.duration)
+        self.metrics.observe_file(file_item)
+        self.loop.call_soon_threadsafe(self.job_finished, file_item.id)
+
+    # Job bookkeeping (event loop)
+
+    def job_finished(self, item_id):
+        self.finished_at[item_id] = time.monotonic()
+        for waiter in self.waiters.pop(item_id, ()):
+            if not waiter.done():
+                waiter.set_result(None)
+
+    def purge_finished(self):
+        """Drop jobs whose result is older than SERVICE_RESULT_TTL"""
+        expired = time.monotonic() - SERVICE_RESULT_TTL
+        for item_id, finished in list(self.finished_at.items()):
+            if finished < expired:
+                self.drop_job(self.file_queue.get(item_id))
+
+    def drop_job(self, file_item):
+        self.finished_at.pop(file_item.id, None)
+        self.file_queue.remove([file_item])
+        file_item.release()
+        self.loop.run_in_executor(None, shutil.rmtree, os.path.dirname(file_item.filepath), True)
+
+    def job(self, item_id):
+        """FileItem of a job id from the URL, or HttpError 404"""
+        file_item = self.file_queue.get(int(item_id)) if item_id.isdigit() else None
+        if file_item is None:
+            raise HttpError(404, f"No job {item_id}")
+        return file_item
+
+    def job_status(self, file_item):
+        status = {"id": file_item.id, "filename": file_item.filename, "status": file_item.status,
+                  "size": file_item.filesize}
+        if file_item.status == "Completed":
+            status.update(markdown_size=file_item.markdown_size, lines=file_item.line_count,
+                          words=file_item.word_count, cached=file_item.from_cache,
+                          result=f"/jobs/{file_item.id}/result")
+        elif file_item.error_message:
+            status["error"] = file_item.error_message
+        if file_item.id in self.finished_at:
+            status["timings"] = {stage: round(seconds, 4) for stage, seconds in file_item.timings.items()}
+        return status
+
+    def unfinished(self):
+        return self.file_queue.count("Pending") + self.file_queue.count("Processing")
+
+    # HTTP
+
+    async def handle_connection(self, reader, writer):
+        """Serve requests of one keep-alive connection"""
+        import asyncio
+        try:
+            while True:
+                try:
+                    request = await asyncio.wait_for(self.read_request(reader, writer), SERVICE_IDLE_SECONDS)
+                except asyncio.TimeoutError:
+                    break
+                except HttpError as e:
+                    await self.send_json(writer, e.status, {"error": str(e)}, keep_alive=False)
+                    break
+                if request is None:
+                    break
+                try:
+                    await self.dispatch(request)
+                except HttpError as e:
+                    keep_alive = request.keep_alive and request.body_consumed
+                    await self.send_json(writer, e.status, {"error": str(e)}, keep_alive=keep_alive)
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    break
+                except Exception as e:
+                    await self.send_json(writer, 500, {"error": str(e)}, keep_alive=False)
+                    break
+                if not (request.keep_alive and request.body_consumed):
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def read_request(self, reader, writer):
+        """Request line and headers; None when the client closed the connection"""
+        try:
+            request_line = await reader.readline()
+            if not request_line:
+                return None
+            method, target, _ = request_line.decode('latin-1').split(' ', 2)
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                if len(headers) >= SERVICE_MAX_HEADERS:
+                    raise HttpError(431, "Too many headers")
+                name, _, value = line.decode('latin-1').partition(':')
+                headers[name.strip().lower()] = value.strip()
+        except ValueError:  # Malformed request line or a line over the stream limit
+            raise HttpError(400, "Malformed request")
+        return HttpRequest(method.upper(), target, headers, reader, writer)
+
+    async def dispatch(self, request):
+        parts = [part for part in request.path.split('/') if part]
+        method = request.method
+        if parts == ["jobs"] and method == "POST":
+            await self.submit(request)
+        elif parts == ["jobs"] and method == "GET":
+            counts = {status.lower(): self.file_queue.count(status)
+                      for status in ("Pending", "Processing", "Completed") + FAILED_STATUSES}
+            await self.send_json(request.writer, 200, dict(counts, total=len(self.file_queue),
+                                                           max_queue=self.max_queue))
+        elif len(parts) == 2 and parts[0] == "jobs" and method == "GET":
+            await self.status(request, self.job(parts[1]))
+        elif len(parts) == 2 and parts[0] == "jobs" and method == "DELETE":
+            file_item = self.job(parts[1])
+            if file_item.id not in self.finished_at:
+                raise HttpError(409, "Job is not finished")
+            self.drop_job(file_item)
+            await self.send(request.writer, 204, keep_alive=request.keep_alive)
+        elif len(parts) == 3 and parts[0] == "jobs" and parts[2] == "result" and method == "GET":
+            await self.result(request, self.job(parts[1]))
+        elif parts == ["batch.zip"] and method == "GET":
+            await self.batch_zip(request)
+        elif parts == ["health"] and method == "GET":
+            await self.send_json(request.writer, 200, {"status": "ok", "workers": self.engine.workers,
+                                                       "unfinished": self.unfinished(),
+                                                       "workers_recycled": self.engine.recycled_workers()})
+        elif parts == ["metrics"] and method == "GET":
+            await self.send(request.writer, 200, self.metrics.to_prometheus().encode('utf-8'),
+                            'text/plain; version=0.0.4; charset=utf-8', keep_alive=request.keep_alive)
+        else:
+            raise HttpError(404 if method in ("GET", "POST", "DELETE") else 405,
+                            f"No route for {method} {request.path}")
+
+    async def submit(self, request):
+        """Stream an upload to disk and queue it"""
+        if self.stopping:
+            raise HttpError(503, "Service is shutting down")
+        if self.unfinished() >= self.max_queue:
+            await self.send_json(request.writer, 503, {"error": "Queue is full", "unfinished": self.unfinished()},
+                                 headers=[("Retry-After", "1")], keep_alive=False)
+            return
+        filename = os.path.basename((request.query.get("filename")
+                                     or request.headers.get("x-filename") or "").replace('\\', '/'))
+        if not filename or filename in (os.curdir, os.pardir):
+            raise HttpError(400, "Missing ?filename=")
+
+        # File system calls run in the executor: a slow disk must not stall other connections
+        run_io = self.loop.run_in_executor
+        incoming = await run_io(None, lambda: tempfile.mkdtemp(prefix="incoming-", dir=self.upload_dir))
+        try:
+            f = await run_io(None, open, os.path.join(incoming, filename), 'wb')
+            try:
+                async for block in request.iter_body(self.max_upload):
+                    await run_io(None, f.write, block)
+            finally:
+                await run_io(None, f.close)
+            file_item = await run_io(None, FileItem, os.path.join(incoming, filename))
+            # One folder per job, so exports keep same-named uploads apart
+            job_dir = os.path.join(self.upload_dir, str(file_item.id))
+            await run_io(None, os.rename, incoming, job_dir)
+        except BaseException:
+            run_io(None, shutil.rmtree, incoming, True)
+            raise
+        file_item.filepath = os.path.join(job_dir, filename)
+        self.file_queue.add(file_item)
+        self.engine.notify()
+        await self.send_json(request.writer, 202, self.job_status(file_item),
+                             headers=[("Location", f"/jobs/{file_item.id}")], keep_alive=request.keep_alive)
+
+    async def status(self, request, file_item):
+        """Job status; with ?wait=S hold the request until the job finishes (at most S seconds)"""
+        import asyncio
+        try:
+            wait_seconds = min(float(request.query.get("wait", 0)), SERVICE_MAX_WAIT)
+        except ValueError:
+            raise HttpError(400, "Invalid ?wait=")
+        if wait_seconds > 0 and file_item.id not in self.finished_at:
+            waiter = self.loop.create_future()
+            self.waiters.setdefault(file_item.id, []).append(waiter)
+            try:
+                await asyncio.wait_for(waiter, wait_seconds)
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                waiters = self.waiters.get(file_item.id)
+                if waiters and waiter in waiters:
+                    waiters.remove(waiter)
+        await self.send_json(request.writer, 200, self.job_status(file_item), keep_alive=request.keep_alive)
+
+    async def result(self, request, file_item):
+        if file_item.status != "Completed":
+            raise HttpError(409 if file_item.id not in self.finished_at else 422,
+                            file_item.error_message or f"Job is {file_item.status.lower()}")
+        with file_item.open_markdown() as stream:
+            await self.send_stream(request.writer, stream, 'text/markdown; charset=utf-8',
+                                   keep_alive=request.keep_alive)
+
+    async def batch_zip(self, request):
+        """ZIP export of completed jobs, built in a worker thread and streamed"""
+        ids = request.query.get("ids")
+        if ids:
+            file_items = [self.job(item_id.strip()) for item_id in ids.split(',') if item_id.strip()]
+        else:
+            file_items = [item for item in self.file_queue if item.status == "Completed"]
+        zip_fd, zip_path = tempfile.mkstemp(suffix=".zip", dir=self.upload_dir)
+        os.close(zip_fd)
+        try:
+            await self.loop.run_in_executor(None, write_zip_export, zip_path, file_items, True,
+                                            True, self.args.compression_level)
+            with open(zip_path, 'rb') as stream:
+                await self.send_stream(request.writer, stream, 'application/zip',
+                                       headers=[("Content-Disposition", 'attachment; filename="batch.zip"')],
+                                       keep_alive=request.keep_alive)
+        finally:
+            os.remove(zip_path)
+
+    def response_head(self, status, content_type, length, headers, keep_alive):
+        from http import HTTPStatus
+        lines = [f"HTTP/1.1 {status} {HTTPStatus(status).phrase}",
+                 f"Content-Length: {length}",
+                 "Connection: " + ("keep-alive" if keep_alive else "close")]
+        if content_type:
+            lines.append(f"Content-Type: {content_type}")
+        lines += [f"{name}: {value}" for name, value in headers]
+        return ("\r\n".join(lines) + "\r\n\r\n").encode('latin-1')
+
+    async def send(self, writer, status, body=b"", content_type=None, headers=(), keep_alive=True):
+        writer.write(self.response_head(status, content_type, len(body), headers, keep_alive) + body)
+        await writer.drain()
+
+    async def send_json(self, writer, status, data, headers=(), keep_alive=True):
+        await self.send(writer, status, json.dumps(data, ensure_ascii=False).encode('utf-8'),
+                        'application/json', headers, keep_alive)
+
+    async def send_stream(self, writer, stream, content_type, headers=(), keep_alive=True):
+        """Send a seekable binary stream in SERVICE_IO_CHUNK blocks, waiting for the client to keep up"""
+        length = stream.seek(0, io.SEEK_END)
+        stream.seek(0)
+        writer.write(self.response_head(200, content_type, length, headers, keep_alive))
+        while True:
+            block = stream.read(SERVICE_IO_CHUNK)
+            if not block:
+                break
+            writer.write(block)
+            await writer.drain()
+        await writer.drain()
+
+def run_service(args):
+    """Entry point for --serve; returns the process exit code"""
+    if importlib.util.find_spec('markitdown') is None:
+        print("❌ MarkItDown not found. Install it with: pip install 'markitdown[all]'", file=sys.stderr)
+        return 1
+
+    import asyncio
+    service = ConversionService(args)
+    try:
+        asyncio.run(service.serve())
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        print("\n👋 Service stopped", file=sys.stderr)
+    except OSError as e:
+        print(f"❌ Cannot listen on {args.host}:{args.port}: {e}", file=sys.stderr)
+        return 1
+    finally:
+        service.close()
+    return 0
+
+def job_settings(args):
+    """Export settings recorded in a job journal, so --job can resume without repeating them"""
+    return {"output": os.path.abspath(args.output), "zip": args.zip, "incremental": args.incremental,
+            "preserve_structure": args.preserve_structure, "create_index": args.create_index}
+
+def build_arg_parser():
+    """Command line interface of the desktop app"""
+    parser = argparse.ArgumentParser(
+        description=f"{APP_NAME} v{APP_VERSION} - batch convert files to Markdown. "
+                    "Starts the GUI unless --headless is given.")
+    parser.add_argument('inputs', nargs='*',
+                        help="Files, folders or glob patterns (e.g. 'docs/**/*.pdf') to convert")
+    parser.add_argument('--headless', action='store_true',
+                        help="Run the batch without a window and print JSON progress lines")
+    parser.add_argument('--serve', action='store_true',
+                        help="Run a local HTTP conversion service instead of the GUI (see README)")
+    parser.add_argument('--host', default="127.0.0.1",
+                        help="Address of the --serve service (default: 127.0.0.1)")
+    parser.add_argument('--port', type=int, default=SERVICE_PORT,
+                        help=f"Port of the --serve service (default: {SERVICE_PORT})")
+    parser.add_argument('--max-queue', type=int, metavar='N',
+                        help="Unfinished jobs the service accepts before answering 503 "
+                             "(default: 16 per worker)")
+    parser.add_argument('--max-upload', type=int, default=512, metavar='MB',
+                        help="Largest upload the service accepts (default: 512)")
+    parser.add_argument('-o', '--output',
+                        help="Export target: a folder, or a .zip file (headless mode)")
+    parser.add_argument('--zip', action='store_true',
+                        help="Export as ZIP even if --output does not end with .zip")
+    parser.add_argument('--incremental', action='store_true',
+                        help="Update an existing export folder: convert only new/modified files, "
+                             "remove outputs of deleted sources")
+    parser.add_argument('--job', metavar='DIR',
+                        help="Journal the batch in DIR; if DIR holds an interrupted job, resume it "
+                             "(inputs and --output may then be omitted)")
+    parser.add_argument('--compression-level', type=int, default=DEFAULT_COMPRESSION_LEVEL,
+                        choices=range(0, 10), metavar='0-9',
+                        help=f"ZIP deflate level, 0 = store only (default: {DEFAULT_COMPRESSION_LEVEL})")
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS,
+                        help=f"Number of parallel conversions (default: {DEFAULT_WORKERS})")
+    parser.add_argument('--schedule', choices=SCHEDULE_ORDERS, default=SCHEDULE_ORDERS[0],
+                        help="Convert the largest files first (shortest total time), the smallest "
+                             "first (quick first results) or in queue order (default: largest)")
+    parser.add_argument('--timeout', type=float, metavar='SECONDS',
+                        help="Kill a conversion that runs longer than this (status 'Timeout')")
+    parser.add_argument('--memory-limit', type=int, metavar='MB',
+                        help="Kill a conversion whose worker process uses more memory than this")
+    parser.add_argument('--worker-max-tasks', type=int, default=WORKER_MAX_TASKS, metavar='N',
+                        help=f"Replace a worker process after N files (default: {WORKER_MAX_TASKS}, 0 = never)")
+    parser.add_argument('--worker-recycle-memory', type=int, metavar='MB',
+                        help="Replace a worker process that uses more memory than this after a file "
+                             "(unlike --memory-limit, never interrupts a conversion)")
+    parser.add_argument('--no-preflight', dest='preflight', action='store_false',
+                        help="Do not sniff inputs before converting (unsupported files then fail in the converter)")
+    parser.add_argument('--no-dedupe', dest='dedupe', action='store_false',
+                        help="Convert every file, even if another queued file has identical content")
+    parser.add_argument('--batch-kb', type=int, default=DEFAULT_BATCH_BYTES // 1024, metavar='KB',
+                        help=f"Convert files up to {BATCH_FILE_BYTES // 1024} KB in batches of up to this many KB "
+                             f"per worker task (default: {DEFAULT_BATCH_BYTES // 1024}, 0 = off)")
+    parser.add_argument('--pdf-chunk-pages', type=int, default=0, metavar='N',
+                        help="Convert PDFs longer than N pages in N-page chunks, in parallel and "
+                             "streamed to disk, with the same Markdown as a whole-file conversion "
+                             "(cached; default: off)")
+    parser.add_argument('--engine', choices=ENGINE_MODES, default='auto',
+                        help="Worker pool type (default: auto)")
+    parser.add_argument('--no-cache', dest='cache', action='store_false',
+                        help="Do not use the persistent conversion cache")
+    parser.add_argument('--cache-dir',
+                        help="Directory of the conversion cache (default: per-user cache folder)")
+    parser.add_argument('--cache-size', type=int, default=DEFAULT_CACHE_BYTES // (1024 * 1024),
+                        help="Maximum cache size in MB before least-recently-used entries are evicted")
+    parser.add_argument('--memory-budget', type=int, default=DEFAULT_MEMORY_BUDGET // (1024 * 1024),
+                        help="MB of converted Markdown kept in RAM; everything else is spooled to disk")
+    parser.add_argument('--no-preserve-structure', dest='preserve_structure', action='store_false',
+                        help="Flatten the folder structure in the export")
+    parser.add_argument('--no-index', dest='create_index', action='store_false',
+                        help="Do not create README.md index file")
+    parser.add_argument('--no-skip-errors', dest='skip_errors', action='store_false',
+                        help="Stop the batch at the first conversion error")
+    parser.add_argument('--include', action='append', metavar='GLOB',
+                        help="Only take files from input folders matching this pattern (repeatable)")
+    parser.add_argument('--exclude', action='append', metavar='GLOB',
+                        help="Skip files and folders matching this pattern (repeatable)")
+    parser.add_argument('--max-depth', type=int, metavar='N',
+                        help="Folder levels to descend into below each input folder (0 = top level only)")
+    parser.add_argument('--profile', choices=PROFILE_MODES, default='off',
+                        help="Profile conversions with cProfile (.prof) or a stack sampler "
+                             "(collapsed stacks); profiles are exported under profiles/")
+    parser.add_argument('--profile-threshold', type=float, default=0.0, metavar='SECONDS',
+                        help="Only keep profiles of conversions slower than this (default: all)")
+    parser.add_argument('--metrics-file', metavar='FILE',
+                        help="Keep per-stage timing histograms in this Prometheus text file (headless)")
+    parser.add_argument('--metrics-port', type=int, metavar='PORT',
+                        help="Serve Prometheus metrics on http://127.0.0.1:PORT/metrics while converting (headless)")
+    parser.add_argument('--startup-report', action='store_true',
+                        help="Show an import-time breakdown of the cold start and exit")
+    parser.add_argument('--benchmark', action='store_true',
+                        help="Convert a generated corpus per format and report throughput, latency and memory")
+    parser.add_argument('--bench-formats', default=",".join(BENCHMARK_FORMATS),
+                        help="Formats to benchmark (default: all)")
+    parser.add_argument('--bench-sizes', default="20,200", metavar='KB,...',
+                        help="Approximate content size of the generated files (default: 20,200)")
+    parser.add_argument('--bench-files', type=int, default=10, metavar='N',
+                        help="Files per format and size (default: 10)")
+    parser.add_argument('--bench-dir',
+                        help="Keep the generated corpus here and reuse it on the next run")
+    parser.add_argument('--bench-json', metavar='FILE',
+                        help="Write the results as JSON")
+    parser.add_argument('--bench-compare', metavar='FILE',
+                        help="Show files/s changes against an earlier --bench-json result")
+    return parser
+
+# Runs in a fresh interpreter under -X importtime; prints phase timings as JSON
+STARTUP_PROBE = """
+import importlib.util, json, sys, time
+phases = {}
+started = time.perf_counter()
+spec = importlib.util.spec_from_file_location("markitdown_desktop_app", sys.argv[1])
+spec.loader.exec_module(importlib.util.module_from_spec(spec))
+phases["app module"] = time.perf_counter() - started
+started = time.perf_counter()
+from markitdown import MarkItDown
+phases["import markitdown"] = time.perf_counter() - started
+started = time.perf_counter()
+MarkItDown()
+phases["MarkItDown()"] = time.perf_counter() - started
+print(json.dumps(phases))
+"""
+
+def parse_importtime(lines):
+    """Sum -X importtime self times (us) per top-level package"""
+    totals = Counter()
+    for line in lines:
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        fields = line[len("import time:"):].split("|")
+        try:
+            self_us = int(fields[0])
+        except ValueError:
+            continue  # Header line
+        totals[fields[2].strip().split(".")[0]] += self_us
+    return totals
+
+def run_startup_report(top=15):
+    """Print where cold-start time goes (app module, MarkItDown import, instantiation)"""
+    print("⏱️ Measuring cold start in a fresh interpreter (python -X importtime)...")
+    try:
+        probe = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", STARTUP_PROBE, os.path.abspath(__file__)],
+            capture_output=True, text=True, timeout=300)
+    except (OSError, subprocess.TimeoutExpired) as e:
+        print(f"❌ Startup probe failed: {e}")
+        return 1
+    if probe.returncode != 0:
+        error_lines = probe.stderr.strip().splitlines()
+        print(f"❌ Startup probe failed: {error_lines[-1] if error_lines else probe.returncode}")
+        return 1
+    
+    phases = json.loads(probe.stdout.strip().splitlines()[-1])
+    print("\nPhase                       Seconds")
+    for phase, seconds in phases.items():
+        print(f"  {phase:<25} {seconds:8.3f}")
+    
+    totals = parse_importtime(probe.stderr.splitlines())
+    print(f"\nImport time by package (self, top {top} of {len(totals)}): {sum(totals.values()) / 1e6:.3f}s total")
+    for package, self_us in totals.most_common(top):
+        print(f"  {package:<25} {self_us / 1e6:8.3f}")
+    print("\nThe window only pays for 'app module'; MarkItDown is loaded in the background.")
+    return 0
+
+# Benchmark corpus: format -> file writer(path, approximate payload bytes, random.Random)
+BENCHMARK_FORMATS = ('csv', 'json', 'html', 'docx', 'xlsx', 'pptx', 'pdf')
+BENCHMARK_WORDS = ("alpha beta gamma delta markdown convert desktop batch export queue "
+                   "archive report table value summary quarter revenue office document").split()
+
+def bench_sentence(rng, words=12):
+    return " ".join(rng.choice(BENCHMARK_WORDS) for _ in range(words)).capitalize() + "."
+
+def write_bench_csv(path, size, rng):
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        f.write("id,name,quarter,amount,comment\n")
+        written, row = 0, 0
+        while written < size:
+            line = (f"{row},{rng.choice(BENCHMARK_WORDS)},Q{rng.randint(1, 4)},"
+                    f"{rng.uniform(0, 10000):.2f},{bench_sentence(rng, 6)}\n")
+            f.write(line)
+            written += len(line)
+            row += 1
+
+def write_bench_json(path, size, rng):
+    records, written = [], 0
+    while written < size:
+        record = {"id": len(records), "name": rng.choice(BENCHMARK_WORDS),
+                  "tags": rng.sample(BENCHMARK_WORDS, 3), "text": bench_sentence(rng)}
+        records.append(record)
+        written += 120
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({"records": records}, f, indent=1)
+
+def write_bench_html(path, size, rng):
+    parts, written = ["<html><head><title>Benchmark</title></head><body>"], 0
+    while written < size:
+        block = (f"<h2>{bench_sentence(rng, 4)}</h2><p>{bench_sentence(rng, 40)}</p>"
+                 f"<ul>{''.join(f'<li>{bench_sentence(rng, 6)}</li>' for _ in range(4))}</ul>"
+                 "<table><tr><th>Key</th><th>Value</th></tr>"
+                 f"{''.join(f'<tr><td>{rng.choice(BENCHMARK_WORDS)}</td><td>{rng.randint(0, 999)}</td></tr>' for _ in range(5))}"
+                 "</table>")
+        parts.append(block)
+        written += len(block)
+    parts.append("</body></html>")
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write("".join(parts))
+
+def write_bench_docx(path, size, rng):
+    """Minimal WordprocessingML package (no python-docx needed)"""
+    paragraphs, written = [], 0
+    while written < size:
+        if len(paragraphs) % 10 == 0:
+            text = bench_sentence(rng, 4)
+            paragraphs.append(f'<w:p><w:pPr><w:pStyle w:val="Heading1"/></w:pPr><w:r><w:t>{text}</w:t></w:r></w:p>')
+        else:
+            text = bench_sentence(rng, 40)
+            paragraphs.append(f'<w:p><w:r><w:t>{text}</w:t></w:r></w:p>')
+        written += len(text)
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as package:
+        package.writestr('[Content_Types].xml',
+                         '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                         '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+                         '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+                         '<Default Extension="xml" ContentType="application/xml"/>'
+                         '<Override PartName="/word/document.xml" ContentType="application/'
+                         'vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/></Types>')
+        package.writestr('_rels/.rels',
+                         '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                         '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+                         '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/'
+                         'relationships/officeDocument" Target="word/document.xml"/></Relationships>')
+        package.writestr('word/document.xml',
+                         '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                         '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+                         f'<w:body>{"".join(paragraphs)}</w:body></w:document>')
+
+def write_bench_xlsx(path, size, rng):
+    from openpyxl import Workbook  # Dependency of the XLSX converter itself
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Data")
+    sheet.append(["id", "name", "quarter", "amount", "comment"])
+    for row in range(max(1, size // 60)):
+        sheet.append([row, rng.choice(BENCHMARK_WORDS), f"Q{rng.randint(1, 4)}",
+                      round(rng.uniform(0, 10000), 2), bench_sentence(rng, 4)])
+    workbook.save(path)
+
+def write_bench_pptx(path, size, rng):
+    from pptx import Presentation  # Dependency of the PPTX converter itself
+    presentation = Presentation()
+    layout = presentation.slide_layouts[1]  # Title and content
+    for _ in range(max(1, size // 400)):
+        slide = presentation.slides.add_slide(layout)
+        slide.shapes.title.text = bench_sentence(rng, 4)
+        body = slide.placeholders[1].text_frame
+        body.text = bench_sentence(rng, 10)
+        for _ in range(4):
+            body.add_paragraph().text = bench_sentence(rng, 12)
+    presentation.save(path)
+
+def write_bench_pdf(path, size, rng):
+    """PDF with a real text layer (Helvetica), written without a PDF library"""
+    pages, written = [], 0
+    while written < size or not pages:
+        lines = [bench_sentence(rng, 10) for _ in range(50)]
+        written += sum(len(line) for line in lines)
+        text = "".join(f"({line}) Tj T* " for line in lines)
+        pages.append(f"BT /F1 10 Tf 14 TL 50 780 Td {text}ET".encode('ascii'))
+
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None,
+               b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    page_ids = []
+    for content in pages:
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(content), content))
+        objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+                       b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % len(objects))
+        page_ids.append(len(objects))
+    kids = b" ".join(b"%d 0 R" % page_id for page_id in page_ids)
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(page_ids))
+
+    with open(path, 'wb') as f:
+        f.write(b"%PDF-1.4\n")
+        offsets = []
+        for number, body in enumerate(objects, 1):
+            offsets.append(f.tell())
+            f.write(b"%d 0 obj\n%s\nendobj\n" % (number, body))
+        xref = f.tell()
+        f.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+        for offset in offsets:
+            f.write(b"%010d 00000 n \n" % offset)
+        f.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
+
+BENCHMARK_GENERATORS = {
+    'csv': write_bench_csv, 'json': write_bench_json, 'html': write_bench_html,
+    'docx': write_bench_docx, 'xlsx': write_bench_xlsx, 'pptx': write_bench_pptx, 'pdf': write_bench_pdf,
+}
+
+def generate_benchmark_corpus(folder, formats, sizes_kb, files_per_size, seed=42):
+    """Write a reproducible synthetic corpus; returns {format: [filepaths]}"""
+    corpus = {}
+    for fmt in formats:
+        rng = random.Random(f"{seed}-{fmt}")
+        format_folder = os.path.join(folder, fmt)
+        os.makedirs(format_folder, exist_ok=True)
+        paths = []
+        try:
+            for size_kb in sizes_kb:
+                for index in range(files_per_size):
+                    path = os.path.join(format_folder, f"{fmt}_{size_kb}kb_{index:03d}.{fmt}")
+                    if not os.path.exists(path):
+                        BENCHMARK_GENERATORS[fmt](path, size_kb * 1024, rng)
+                    paths.append(path)
+        except ImportError as e:
+            print(f"⚠️ Skipping {fmt}: {e}", file=sys.stderr)
+            continue
+        corpus[fmt] = paths
+    return corpus
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a non-empty list"""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(fraction * len(ordered)) - 1))]
+
+class RssSampler(threading.Thread):
+    """Samples the resident memory of this process plus its worker processes"""
+    
+    def __init__(self, engine, interval=0.05):
+        super().__init__(daemon=True)
+        self.engine = engine
+        self.interval = interval
+        self.peak = None
+        self._stop_event = threading.Event()
+    
+    def run(self):
+        while not self._stop_event.is_set():
+            pids = [os.getpid()]
+            pool = self.engine._process_pool
+            if pool is not None:
+                pids.extend(worker.process.pid for worker in list(pool._workers))
+            sizes = [process_rss(pid) for pid in pids]
+            if sizes[0] is not None:
+                total = sum(size for size in sizes if size is not None)
+                self.peak = total if self.peak is None else max(self.peak, total)
+            self._stop_event.wait(self.interval)
+    
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+def benchmark_format(filepaths, args, export_folder):
+    """Convert and export one format through the batch pipeline; returns its metrics"""
+    file_queue = FileQueue()
+    for filepath in filepaths:
+        file_queue.add(FileItem(filepath))
+    FileItem.result_store = result_store = ResultStore()
+    # A fresh engine per format: worker start-up and peak memory belong to that format
+    engine = ConversionEngine(workers=args.workers, mode=args.engine, result_store=result_store,
+                              timeout=args.timeout, batch_bytes=args.batch_kb * 1024)
+    exporter = StreamingExporter(export_folder, args.zip, compute_export_root(file_queue), True,
+                                 True, args.compression_level)
+    latencies, errors = [], []
+    
+    def on_start(file_item):
+        file_item.status = "Processing"
+    
+    def on_result(file_item, result):
+        # From hand-off to a worker until this file's own result: its worker
+        # stages plus dispatch overhead. Files of a micro-batch each get their
+        # own share instead of the latency of the whole batch.
+        latencies.append(sum(seconds for stage, seconds in file_item.timings.items() if stage != "queue_wait"))
+        if result.error_message:
+            file_item.status = result.failed_status
+            errors.append(f"{file_item.filename}: {result.error_message}")
+            return
+        file_item.set_result(result)
+        file_item.status = "Completed"
+        exporter.add(file_item)
+    
+    sampler = RssSampler(engine)
+    sampler.start()
+    # Worker start-up and imports are reported separately, not in throughput or latency
+    warmup_started = time.perf_counter()
+    started = None
+    try:
+        engine.warm_up(list(file_queue))
+        started = time.perf_counter()
+        engine.run(list(file_queue), on_start=on_start, on_result=on_result,
+                   priority=schedule_priority(args.schedule))
+        exporter.finish(file_queue)
+    finally:
+        finished = time.perf_counter()
+        warmup_seconds = (started or finished) - warmup_started
+        elapsed = finished - (started or finished)
+        sampler.stop()
+        engine.shutdown()
+        result_store.cleanup()
+    
+    total_bytes = sum(item.filesize for item in file_queue)
+    return {
+        "files": len(file_queue),
+        "errors": len(errors),
+        "error_samples": errors[:3],
+        "input_mb": round(total_bytes / (1024 * 1024), 3),
+        "seconds": round(elapsed, 3),
+        "files_per_sec": round(len(file_queue) / elapsed, 2),
+        "mb_per_sec": round(total_bytes / (1024 * 1024) / elapsed, 3),
+        "latency_p50": round(percentile(latencies, 0.50), 4),
+        "latency_p95": round(percentile(latencies, 0.95), 4),
+        "latency_p99": round(percentile(latencies, 0.99), 4),
+        "warmup_seconds": round(warmup_seconds, 3),
+        "peak_rss_mb": round(sampler.peak / (1024 * 1024), 1) if sampler.peak is not None else None,
+    }
+
+def run_benchmark(args):
+    """Entry point for --benchmark; returns the process exit code"""
+    if importlib.util.find_spec('markitdown') is None:
+        print("❌ MarkItDown not found. Install it with: pip install 'markitdown[all]'", file=sys.stderr)
+        return 1
+    formats = [fmt.strip().lower() for fmt in args.bench_formats.split(',') if fmt.strip()]
+    unknown = [fmt for fmt in formats if fmt not in BENCHMARK_GENERATORS]
+    if unknown:
+        print(f"❌ Unknown benchmark formats: {', '.join(unknown)}", file=sys.stderr)
+        return 1
+    try:
+        sizes_kb = [int(size) for size in args.bench_sizes.split(',') if size.strip()]
+    except ValueError:
+        print(f"❌ Invalid --bench-sizes: {args.bench_sizes}", file=sys.stderr)
+        return 1
+    
+    work_dir = tempfile.mkdtemp(prefix="markitdown_bench_")
+    corpus_dir = args.bench_dir or os.path.join(work_dir, "corpus")
+    try:
+        print(f"📦 Generating corpus in {corpus_dir}...", file=sys.stderr)
+        corpus = generate_benchmark_corpus(corpus_dir, formats, sizes_kb, args.bench_files)
+        
+        results = {}
+        for fmt, filepaths in corpus.items():
+            print(f"⏱️ {fmt}: {len(filepaths)} files...", file=sys.stderr)
+            export_target = os.path.join(work_dir, f"export_{fmt}" + (".zip" if args.zip else ""))
+            results[fmt] = benchmark_format(filepaths, args, export_target)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    
+    report = {
+        "app_version": APP_VERSION,
+        "markitdown_version": get_markitdown_version(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "timestamp": datetime.now().isoformat(),
+        "settings": {"workers": args.workers, "engine": args.engine, "schedule": args.schedule,
+                     "batch_kb": args.batch_kb, "sizes_kb": sizes_kb, "files_per_size": args.bench_files,
+                     "export": "zip" if args.zip else "folder", "cache": False},
+        "formats": results,
+    }
+    
+    baseline = None
+    if args.bench_compare:
+        try:
+            with open(args.bench_compare, 'r', encoding='utf-8') as f:
+                baseline = json.load(f).get("formats", {})
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Cannot read baseline {args.bench_compare}: {e}", file=sys.stderr)
+    
+    print(f"\n{'Format':<7}{'Files':>6}{'Files/s':>9}{'MB/s':>8}{'p50 ms':>9}{'p95 ms':>9}"
+          f"{'p99 ms':>9}{'RSS MB':>9}{'Errors':>8}" + ("  vs. baseline" if baseline else ""))
+    for fmt, metrics in results.items():
+        rss = metrics["peak_rss_mb"]
+        line = (f"{fmt:<7}{metrics['files']:>6}{metrics['files_per_sec']:>9.1f}{metrics['mb_per_sec']:>8.2f}"
+                f"{metrics['latency_p50'] * 1000:>9.1f}{metrics['latency_p95'] * 1000:>9.1f}"
+                f"{metrics['latency_p99'] * 1000:>9.1f}{rss if rss is not None else '-':>9}{metrics['errors']:>8}")
+        previous = (baseline or {}).get(fmt)
+        if previous and previous.get("files_per_sec"):
+            change = (metrics["files_per_sec"] / previous["files_per_sec"] - 1) * 100
+            line += f"  {change:+.1f}% files/s"
+        print(line)
+    
+    if args.bench_json:
+        with open(args.bench_json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"\n💾 Results written to {args.bench_json}")
+    return 0 if all(metrics["errors"] == 0 for metrics in results.values()) else 2
+
+def run_headless(args):
+    """Entry point for --headless; returns the process exit code"""
+    resuming = args.job is not None and os.path.exists(os.path.join(args.job, JOURNAL_FILENAME))
+    if resuming and not args.output:
+        settings, _ = JobJournal(args.job).load()
+        args.output = settings.get("output")
+        args.zip = settings.get("zip", args.zip)
+        args.incremental = settings.get("incremental", args.incremental)
+        args.preserve_structure = settings.get("preserve_structure", args.preserve_structure)
+        args.create_index = settings.get("create_index", args.create_index)
+    if not (args.inputs or resuming) or not args.output:
+        print("❌ --headless requires input paths and --output (or a --job to resume).", file=sys.stderr)
+        return 1
+
+    if importlib.util.find_spec('markitdown') is None:
+        print("❌ MarkItDown not found. Install it with: pip install 'markitdown[all]'", file=sys.stderr)
+        return 1
+
+    return HeadlessRunner(args).run()
+
+
+def main(argv=None):
     """Main function"""
+    args = build_arg_parser().parse_args(argv)
+    
+    if args.startup_report:
+        sys.exit(run_startup_report())
+    
+    if args.benchmark:
+        sys.exit(run_benchmark(args))
+    
+    if args.serve:
+        sys.exit(run_service(args))
+    
+    if args.headless:
+        sys.exit(run_headless(args))
+    
+    if tk is None:
+        print("❌ tkinter is not available - use --headless for batch conversion.")
+        sys.exit(1)
+    
     print(f"""
 ╔══════════════════════════════════════════════════════════════╗
 ║                {APP_NAME} v{APP_VERSION} - Multi-File           ║
@@ -1205,7 +6704,7 @@ def main():
     try:
         # Create GUI
         root = tk.Tk()
-        app = MarkItDownApp(root)
+        app = MarkItDownApp(root, memory_budget=args.memory_budget * 1024 * 1024)
         
         # Window centering
         root.update_idletasks()
@@ -1214,6 +6713,8 @@ def main():
         x = (root.winfo_screenwidth() // 2) - (width // 2)
         y = (root.winfo_screenheight() // 2) - (height // 2)
         root.geometry(f'{width}x{height}+{x}+{y}')
+        root.after_idle(lambda: print(
+            f"⏱️ Window ready after {time.perf_counter() - _PROCESS_START:.2f}s"))
         
         print("✅ Multi-File GUI started successfully!")
         print("📋 You can now add multiple files for batch conversion.")
@@ -1223,6 +6724,11 @@ def main():
         # Start main loop
         root.mainloop()
         
+        if app.engine is not None:
+            app.engine.shutdown()
+        app.result_store.cleanup()
+        app.close_job()
+        
     except KeyboardInterrupt:
         print("\n👋 Application terminated")
     except Exception as e: